@@ -0,0 +1,76 @@
+"""
+Updates per second of `Supervisor` against the number of worker processes.
+
+Each worker parses the multi-form task message of every update it gets with
+`parse_task_blocks`, the CPU-bound part of a /create_many update, and the
+supervisor dispatches the updates of 500 chats by consistent hashing. The
+Telegram API and the databases are left out, so the numbers are the routing
+overhead plus the parsing spread over processes.
+
+Scaling needs a core per worker. On a 1 CPU machine more workers only add
+context switches, 4000 updates:
+    1 worker     4570 updates/s
+    2 workers    2750 updates/s
+    4 workers    2250 updates/s
+
+Run from the repository root:
+    python -m benchmarks.bot_workers [updates] [max workers]
+"""
+import functools
+import multiprocessing
+import os
+import sys
+import time
+from multiprocessing.queues import Queue
+from multiprocessing.synchronize import Event
+
+from core.services.task_batch import parse_task_blocks
+from resources.config import Settings
+from telegram_bot.supervisor import STOP, Supervisor
+
+CHATS = 500
+MESSAGE = "\n\n".join(
+    f"Workspace Name - Home\nName - Project {project}\nDescription - Quarterly plan\nWeight - 3\n\n"
+    f"    Name - Step {project}.1\n    Weight - 2\n\n"
+    f"    Name - Step {project}.2\n    Completed - Да"
+    for project in range(5)
+)
+
+
+def parsing_worker(done: Queue, index: int, updates: Queue, ready: Event, settings: Settings) -> None:
+    ready.set()
+    handled = 0
+    while (update := updates.get()) is not STOP:
+        parse_task_blocks(update["message"]["text"])
+        handled += 1
+    done.put(handled)
+
+
+def measure(workers: int, updates: int) -> float:
+    context = multiprocessing.get_context("spawn")
+    done = context.Queue()
+    supervisor = Supervisor(workers, Settings(), target=functools.partial(parsing_worker, done), context=context)
+    supervisor.start()
+    start = time.perf_counter()
+    for update_id in range(updates):
+        supervisor.dispatch({"update_id": update_id,
+                             "message": {"chat": {"id": update_id % CHATS}, "text": MESSAGE}})
+    supervisor.stop()
+    elapsed = time.perf_counter() - start
+    assert sum(done.get() for _ in range(workers)) == updates
+    return updates / elapsed
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    updates = int(args[0]) if args else 4000
+    max_workers = int(args[1]) if len(args) > 1 else 4
+    print(f"{os.cpu_count()} CPUs, {updates} updates")
+    workers = 1
+    while workers <= max_workers:
+        print(f"{workers} worker{'s' if workers > 1 else ' '}  {measure(workers, updates):8.0f} updates/s")
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main()
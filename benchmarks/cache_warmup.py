@@ -0,0 +1,87 @@
+"""
+Cache miss rate in the first minutes after a deploy, with and without warm-up.
+
+Needs the Redis configured for `RedisDatabaseManager`, which is flushed.
+Users, workspaces and tasks are written to an SQLite file, then a deploy is
+replayed: the cache starts empty and every simulated minute a batch of
+requests arrives, each reading a user's state and workspace like a message
+handler does. Users are picked with a Zipf-like skew, so few users send most
+messages; warm-up loads the most recently active users. The per-minute miss
+rate of the cached repository methods is printed for both runs.
+
+5000 users, 2000 requests per simulated minute, 1000 warmed users (0.4 s):
+    cold       40.5%  24.6%  18.9%  15.6%  12.0%
+    warmed     17.1%  15.4%  13.9%  11.6%   9.9%
+
+Run from the repository root:
+    python -m benchmarks.cache_warmup [users] [warmed users]
+"""
+import os
+import random
+import sys
+import tempfile
+
+from sqlalchemy import insert
+
+from core.models_sql_alchemy.models import Task, User, UserState, Workspace
+from database.cache_warmup import WarmUpLimits, warm_up_cache
+from database.database_manager import RedisDatabaseManager, SQLDatabaseManager
+from database.repositories.base_repository import BaseRepository, cache_stats
+
+MINUTES = 5
+REQUESTS_PER_MINUTE = 2000
+
+
+def populate(manager: SQLDatabaseManager, users: int) -> list[str]:
+    """Users ordered from most to least active, the most active created the newest tasks."""
+    usernames = [f"user{index}" for index in range(users)]
+    with manager.get_session() as session:
+        session.execute(insert(User), [{"username": name, "telegram_username": name} for name in usernames])
+        session.execute(insert(UserState), [{"telegram_username": name} for name in usernames])
+        session.execute(insert(Workspace), [{"id": index + 1, "name": "Home", "owner_name": name}
+                                            for index, name in enumerate(usernames)])
+        # Least active first, so the most active own the highest task ids
+        session.execute(insert(Task), [{"name": f"Task {task}", "workspace_id": index + 1, "owner_name": name,
+                                        "completed": task % 2 == 0, "weight": 1}
+                                       for index, name in reversed(list(enumerate(usernames))) for task in range(5)])
+        session.commit()
+    return usernames
+
+
+def replay(repository: BaseRepository, usernames: list[str], seed: int = 0) -> list[float]:
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(usernames))]
+    miss_rates = []
+    for _ in range(MINUTES):
+        cache_stats.reset()
+        for username in rng.choices(usernames, weights, k=REQUESTS_PER_MINUTE):
+            repository.get_by_id(UserState, username)
+            repository.get_by_custom_fields(Workspace, name="Home", owner_name=username)
+        miss_rates.append(cache_stats.miss_rate())
+    return miss_rates
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    users = int(args[0]) if args else 5000
+    warmed = int(args[1]) if len(args) > 1 else 1000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = SQLDatabaseManager(f"sqlite:///{os.path.join(tmp, 'bench.db')}", echo=False)
+        redis_manager = RedisDatabaseManager()
+        repository = BaseRepository(manager, redis_manager)
+        usernames = populate(manager, users)
+        print(f"{users} users, {REQUESTS_PER_MINUTE} requests per minute, miss rate per minute:")
+
+        redis_manager.get_connection().flushdb()
+        print(f"{'cold':<28}" + " ".join(f"{rate:6.1%}" for rate in replay(repository, usernames)))
+
+        redis_manager.get_connection().flushdb()
+        report = warm_up_cache(manager, redis_manager, WarmUpLimits(users=warmed, max_keys=10 * warmed))
+        print(f"{f'warmed, {report.users} users':<28}" + " ".join(f"{rate:6.1%}" for rate in replay(repository, usernames)))
+        print(report)
+        manager.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
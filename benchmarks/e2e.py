@@ -0,0 +1,284 @@
+"""
+End-to-end throughput and latency of the bot against a fake Telegram API.
+
+Starts `FakeTelegramServer`, a fresh SQLite file and an in-process fakeredis
+cache, then runs the real `Bot` polling the fake server while simulated users
+each go through a script: registration, /create_workspace, /create_Task
+forms, a deep task tree sent with /create_Tasks and /view of that tree. A user
+sends their next message once the bot answered the previous one, and every
+step's latency is the time from queueing the update to the bot's reply.
+
+Reports messages/s, p50/p95/p99 latency per scenario, and SQL statements,
+commits and cache operations (commands, pipelined ones included) per
+message. --json writes the report with the run's settings, commit and
+machine, --compare prints the change against an earlier report.
+
+The fake server and the users share the bot's event loop, so latencies
+include their, small, share of it. Needs fakeredis (pip install fakeredis).
+
+Run from the repository root:
+    python -m benchmarks.e2e [--users 50] [--json e2e.json] [--compare old.json]
+    python -m benchmarks.e2e --compare benchmarks/baselines/e2e.json
+
+benchmarks/baselines/e2e.json is the default run (50 users) on 1 CPU with
+Python 3.13: 131 messages/s, p50/p95/p99 of 309/1221/2071 ms. Per message,
+it counts 4.9 SQL statements, 0.71 commits, 6.9 cache operations and 5.05
+cache round trips. A run with --users 2 answers in 11/49/83 ms.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from collections import Counter, defaultdict
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from typing import Any
+
+from benchmarks.fake_telegram import FakeTelegramServer
+
+
+@dataclass
+class Step:
+    scenario: str
+    text: str
+    replies: int = 1
+
+
+@dataclass
+class Sample:
+    scenario: str
+    seconds: float
+    ok: bool
+
+
+def tree_text(depth: int, fanout: int) -> str:
+    """A /create_Tasks message of a full tree, "Root" with `fanout` children per task down to `depth` levels."""
+    blocks = ["Workspace Name - Home\nName - Root\nWeight - 1"]
+
+    def add_children(path: str, level: int) -> None:
+        if level == depth:
+            return
+        for child in range(fanout):
+            child_path = f"{path}.{child}"
+            indent = "    " * (level + 1)
+            blocks.append(f"{indent}Name - Node {child_path}\n{indent}Completed - {'Да' if child % 2 else 'Нет'}")
+            add_children(child_path, level + 1)
+
+    add_children("0", 0)
+    return "\n\n".join(blocks)
+
+
+def user_script(tasks: int, tree_depth: int, tree_fanout: int, views: int) -> list[Step]:
+    steps = [Step("registration", "/create_user"),
+             Step("create_workspace", "/create_workspace"),
+             Step("create_workspace", "Home")]
+    for index in range(tasks):
+        steps += [Step("create_task", "/create_Task"),
+                  Step("create_task", f"Workspace Name - Home\nName - Task {index}\nDescription - Step {index}\n"
+                                      f"Weight - {index % 5 + 1}\nCompleted - {'Да' if index % 2 else 'Нет'}")]
+    steps += [Step("create_tree", "/create_Tasks"), Step("create_tree", tree_text(tree_depth, tree_fanout))]
+    steps += [Step("view", "/view Task Root") for _ in range(views // 2)]
+    steps += [Step("view", "/view Workspace Home") for _ in range(views - views // 2)]
+    return steps
+
+
+async def replay(server: FakeTelegramServer, scripts: dict[str, list[Step]],
+                 timeout: float = 30.0) -> list[Sample]:
+    """Runs every user's script concurrently, each user waits for the reply before the next message."""
+    samples: list[Sample] = []
+
+    async def run_user(chat_id: int, username: str, steps: list[Step]) -> None:
+        for step in steps:
+            start = time.perf_counter()
+            try:
+                await server.send(chat_id, username, step.text, replies=step.replies, timeout=timeout)
+                ok = True
+            except TimeoutError:
+                ok = False
+            samples.append(Sample(step.scenario, time.perf_counter() - start, ok))
+
+    await asyncio.gather(*(run_user(chat_id, username, steps)
+                           for chat_id, (username, steps) in enumerate(scripts.items(), start=1000)))
+    return samples
+
+
+def _percentile(values: list[float], percent: int) -> float:
+    if len(values) <= 1:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+def summarize(samples: list[Sample], seconds: float, counters: Counter[str] | None = None) -> dict[str, Any]:
+    """Throughput, latency percentiles in milliseconds and per message counts of a replay."""
+    counters = counters or Counter()
+    by_scenario: defaultdict[str, list[Sample]] = defaultdict(list)
+    for sample in samples:
+        by_scenario[sample.scenario].append(sample)
+
+    def latency(group: list[Sample]) -> dict[str, Any]:
+        times = [sample.seconds * 1000 for sample in group if sample.ok]
+        return {"messages": len(group),
+                "errors": sum(not sample.ok for sample in group),
+                "p50_ms": round(_percentile(times, 50), 2),
+                "p95_ms": round(_percentile(times, 95), 2),
+                "p99_ms": round(_percentile(times, 99), 2)}
+
+    messages = len(samples)
+    return {
+        "messages": messages,
+        "seconds": round(seconds, 3),
+        "messages_per_second": round(messages / seconds, 1) if seconds else 0.0,
+        "latency": latency(samples),
+        "scenarios": {name: latency(group) for name, group in by_scenario.items()},
+        "per_message": {name: round(count / messages, 2) if messages else 0.0
+                        for name, count in sorted(counters.items())},
+    }
+
+
+def count_queries(engine, counters: Counter[str]) -> None:
+    from sqlalchemy import event  # noqa: PLC0415
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count(*_):
+        counters["sql_statements"] += 1
+
+    @event.listens_for(engine, "commit")
+    def count_commit(*_):
+        counters["sql_commits"] += 1
+
+
+def count_cache_ops(client, counters: Counter[str]) -> None:
+    from redis.client import Pipeline  # noqa: PLC0415
+
+    execute_command = client.execute_command
+
+    def counted_command(*args, **kwargs):
+        counters["cache_ops"] += 1
+        counters["cache_round_trips"] += 1
+        return execute_command(*args, **kwargs)
+
+    pipeline_execute = Pipeline.execute
+
+    def counted_pipeline(pipeline, *args, **kwargs):
+        counters["cache_ops"] += len(pipeline.command_stack)
+        counters["cache_round_trips"] += 1
+        return pipeline_execute(pipeline, *args, **kwargs)
+
+    client.execute_command = counted_command
+    Pipeline.execute = counted_pipeline
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    # Imported here: --help and --compare work without the bot's dependencies
+    import fakeredis  # noqa: PLC0415
+
+    from database.database_manager import RedisDatabaseManager, SQLDatabaseManager, use_managers  # noqa: PLC0415
+    from resources.config import Settings  # noqa: PLC0415
+    from telegram_bot.bot import Bot  # noqa: PLC0415
+
+    counters: Counter[str] = Counter()
+    server = FakeTelegramServer()
+    await server.start()
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{os.path.join(tmp, 'e2e.db')}"
+        sql_manager = SQLDatabaseManager(database_url, echo=False, create_schema=True)
+        redis_manager = RedisDatabaseManager(client=fakeredis.FakeRedis(decode_responses=True))
+        use_managers(sql_manager, redis_manager)
+        count_queries(sql_manager.engine, counters)
+        count_cache_ops(redis_manager.get_connection(), counters)
+        settings = Settings(token="123456:E2E", database_url=database_url, telegram_api_url=server.api_url,
+                            cache_warm_up_users=0, offload_workers=args.offload_workers,
+                            monitor_report_seconds=3600, log_level="WARNING")
+        telegram_bot = None
+        polling = None
+        try:
+            telegram_bot = Bot(settings=settings)
+            polling = asyncio.create_task(telegram_bot.start_polling())
+            scripts = {f"user{index}": user_script(args.tasks, args.tree_depth, args.tree_fanout, args.views)
+                       for index in range(args.users)}
+            start = time.perf_counter()
+            samples = await replay(server, scripts, timeout=args.timeout)
+            seconds = time.perf_counter() - start
+        finally:
+            if polling is not None:
+                polling.cancel()
+                await asyncio.gather(polling, return_exceptions=True)
+            if telegram_bot is not None:
+                await telegram_bot.bot.close_session()
+                telegram_bot.offloader.shutdown()
+            await server.stop()
+            use_managers()
+            sql_manager.engine.dispose()
+
+    report = summarize(samples, seconds, counters)
+    report["run"] = run_info(args)
+    return report
+
+
+def run_info(args: argparse.Namespace) -> dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"started_at": datetime.now(UTC).isoformat(timespec="seconds"),
+            "commit": commit,
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "options": {name: value for name, value in vars(args).items() if name not in ("json", "compare")}}
+
+
+def print_report(report: dict[str, Any], previous: dict[str, Any] | None = None) -> None:
+    def change(path: Callable[[dict[str, Any]], float], value: float) -> str:
+        if previous is None:
+            return ""
+        try:
+            before = path(previous)
+        except KeyError:
+            return ""
+        return f" ({(value - before) / before:+.0%})" if before else ""
+
+    print(f"{report['messages']} messages in {report['seconds']}s, "
+          f"{report['messages_per_second']} messages/s{change(lambda r: r['messages_per_second'], report['messages_per_second'])}")
+    print(f"{'scenario':<18}{'messages':>9}{'errors':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for name, stats in [("all", report["latency"]), *report["scenarios"].items()]:
+        print(f"{name:<18}{stats['messages']:>9}{stats['errors']:>7}{stats['p50_ms']:>9}{stats['p95_ms']:>9}"
+              f"{stats['p99_ms']:>9}"
+              + change(lambda r, name=name: (r["latency"] if name == "all" else r["scenarios"][name])["p95_ms"],
+                       stats["p95_ms"]))
+    for name, value in report["per_message"].items():
+        print(f"{name} per message: {value}{change(lambda r, name=name: r['per_message'][name], value)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="End-to-end benchmark of the bot against a fake Telegram API")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--tasks", type=int, default=5, help="/create_Task forms per user")
+    parser.add_argument("--tree-depth", type=int, default=5, help="levels below the root of the /create_Tasks tree")
+    parser.add_argument("--tree-fanout", type=int, default=2)
+    parser.add_argument("--views", type=int, default=6, help="/view messages per user")
+    parser.add_argument("--offload-workers", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for a reply")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--compare", help="earlier --json report to compare with")
+    args = parser.parse_args()
+
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            previous = json.load(file)
+    report = asyncio.run(run(args))
+    print_report(report, previous)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+A local stand-in for the Telegram Bot API, for driving the bot end to end.
+
+Serves getUpdates with long polling from updates queued by `send`, records
+sendMessage/sendDocument calls as replies to the chat they are sent to, and
+answers every other method with `true`. Point telebot at it with
+`asyncio_helper.API_URL = server.api_url` (the TELEGRAM_API_URL setting).
+
+The server runs on the event loop it is started on; `send` must be awaited on
+that loop too.
+"""
+import asyncio
+import itertools
+import time
+from collections import defaultdict
+from typing import Any
+from urllib.parse import parse_qsl
+
+from aiohttp import web
+
+REPLY_METHODS = frozenset({"sendMessage", "sendDocument", "sendPhoto", "editMessageText"})
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Progresser", "username": "progresser_bot"}
+
+
+class FakeTelegramServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self.updates: list[dict[str, Any]] = []
+        self.requests: defaultdict[str, int] = defaultdict(int)
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._new_update = asyncio.Condition()
+        self._replies: defaultdict[int, asyncio.Queue[dict[str, Any]]] = defaultdict(asyncio.Queue)
+        self._runner: web.AppRunner | None = None
+
+    @property
+    def api_url(self) -> str:
+        return f"http://{self.host}:{self.port}/bot{{0}}/{{1}}"
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # The port the OS picked when 0 was asked for
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def send(self, chat_id: int, username: str, text: str,
+                   replies: int = 1, timeout: float = 10.0) -> list[dict[str, Any]]:
+        """
+        Queues a message from a user and returns the first `replies` messages the bot sends to their chat.
+
+        Raises:
+            TimeoutError: If the bot sends fewer replies within `timeout` seconds.
+        """
+        user = {"id": chat_id, "is_bot": False, "first_name": username, "username": username}
+        update = {
+            "update_id": next(self._update_ids),
+            "message": {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private", "username": username, "first_name": username},
+                "from": user,
+                "text": text,
+            },
+        }
+        async with self._new_update:
+            self.updates.append(update)
+            self._new_update.notify_all()
+        queue = self._replies[chat_id]
+        async with asyncio.timeout(timeout):
+            return [await queue.get() for _ in range(replies)]
+
+    async def _params(self, request: web.Request) -> dict[str, Any]:
+        params: dict[str, Any] = dict(request.query)
+        if request.method in ("POST", "PUT", "PATCH"):
+            params.update(await request.post())
+        elif request.can_read_body:
+            # telebot sends form fields in the body of GET requests too
+            params.update(parse_qsl(await request.text()))
+        return params
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.requests[method] += 1
+        params = await self._params(request)
+        if method == "getUpdates":
+            result: Any = await self._get_updates(int(params.get("offset") or 0), float(params.get("timeout") or 0))
+        elif method in REPLY_METHODS:
+            result = self._reply(params)
+        elif method == "getMe":
+            result = BOT_USER
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    async def _get_updates(self, offset: int, timeout: float) -> list[dict[str, Any]]:
+        async with self._new_update:
+            # Updates before the offset are confirmed, Telegram forgets them
+            self.updates = [update for update in self.updates if update["update_id"] >= offset]
+            if not self.updates and timeout:
+                try:
+                    await asyncio.wait_for(self._new_update.wait(), timeout)
+                except TimeoutError:
+                    pass
+            return list(self.updates)
+
+    def _reply(self, params: dict[str, Any]) -> dict[str, Any]:
+        chat_id = int(params["chat_id"])
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+            "text": str(params.get("text", "")),
+        }
+        self._replies[chat_id].put_nowait(message)
+        return message
@@ -0,0 +1,66 @@
+"""
+Throughput of form parsing on large multi-line Cyrillic and Latin inputs.
+
+"legacy" is the previous `Bot.parse_message` body: an uncompiled `re.match` per
+line and a boolean table rebuilt on every call. "schema" is the compiled
+`FormSchema` for the Pydantic `Task` model.
+
+Run from the repository root:
+    python -m benchmarks.form_parser
+"""
+import random
+import re
+import time
+
+from core.schemas_pydantic.schemas import Task
+from core.services.form_parser import compile_form_schema
+
+LABELS = ["Name", "Workspace Name", "Parent Name", "Description", "Weight", "Completed"]
+WORDS = ["задача", "прогресс", "план", "workspace", "milestone", "отчёт", "неделя", "review"]
+
+
+def legacy_parse(text: str) -> dict[str, str]:
+    result = {}
+    boolean_dict = {
+        "Да": True, "Нет": False, "1": True, "0": False, "Y": True,
+        "N": False, "True": True, "False": False, "Yes": True, "No": False,
+    }
+    for line in text.splitlines():
+        match = re.match(r"^(.*?)\s*-\s*(.*)$", line)
+        if match:
+            field = match.group(1).strip()
+            value = match.group(2).strip()
+            if field == "Completed":
+                value = boolean_dict[value]
+            result[field] = str(value)
+    return result
+
+
+def make_form(rng: random.Random, lines: int) -> str:
+    rows = []
+    for _ in range(lines):
+        label = rng.choice(LABELS)
+        value = "Да" if label == "Completed" else " ".join(rng.choices(WORDS, k=rng.randint(1, 30)))
+        rows.append(f"{label} - {value}")
+    return "\n".join(rows)
+
+
+def measure(parse, forms: list[str]) -> float:
+    start = time.perf_counter()
+    for form in forms:
+        parse(form)
+    return len(forms) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    rng = random.Random(0)
+    schema = compile_form_schema(Task)
+    for lines in (6, 100, 5000):
+        forms = [make_form(rng, lines) for _ in range(max(20, 20000 // lines))]
+        legacy = measure(legacy_parse, forms)
+        compiled = measure(schema.parse, forms)
+        print(f"{lines:>5} lines: legacy {legacy:10.0f} forms/s, schema {compiled:10.0f} forms/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+"""
+Micro-benchmarks of the repository and caching hot paths, with a regression check.
+
+Every case is timed call by call after its per-call setup (e.g. deleting the
+cache key of a miss), the fastest tenth of the calls is kept, and the best of
+--repeat runs of the suite is reported. Timings are also divided by the time
+of a fixed pure Python workload measured in the same run, so a baseline
+recorded on one machine can be checked on another one: --check compares
+those normalized numbers and exits with 1 when a case got slower than the
+baseline by more than --threshold.
+
+Runs offline against an in-memory SQLite and an in-process fakeredis cache
+(pip install fakeredis), or the configured Redis with --redis.
+
+Run from the repository root:
+    python -m benchmarks.hot_paths              # print the timings
+    python -m benchmarks.hot_paths --check      # compare with benchmarks/baselines/hot_paths.json
+    python -m benchmarks.hot_paths --save       # record a new baseline, after a reviewed change
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from collections.abc import Callable
+from typing import Any
+
+from sqlalchemy import insert
+
+from core.models_sql_alchemy.models import Task, User
+from database.database_manager import RedisDatabaseManager, SQLDatabaseManager
+from database.repositories.base_repository import BaseRepository, cache_key
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "hot_paths.json")
+# A case this much slower than its baseline fails --check
+THRESHOLD = 0.25
+CALLS = 200
+REPEAT = 3
+TABLE_SIZES = (10, 100, 1000)
+
+Case = tuple[Callable[[], object] | None, Callable[[], object]]
+
+
+def calibrate() -> float:
+    """Seconds of a fixed pure Python workload, the unit the normalized results are expressed in."""
+    def workload() -> int:
+        return sum(len(str(number)) for number in range(20_000))
+
+    return min(_time_once(workload) for _ in range(21))
+
+
+def _time_once(call: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    call()
+    return time.perf_counter() - start
+
+
+def measure(setup: Callable[[], object] | None, call: Callable[[], object], calls: int = CALLS) -> float:
+    """Fastest tenth of the seconds of `call`, `setup` runs before each call and isn't timed."""
+    timings = []
+    for _ in range(calls):
+        if setup is not None:
+            setup()
+        timings.append(_time_once(call))
+    return statistics.quantiles(timings, n=10)[0]
+
+
+def build_cases(repository: BaseRepository) -> dict[str, Case]:
+    redis_conn = repository.redis_db_manager.get_connection()
+    manager = repository.db_manager
+    with manager.get_session() as session:
+        session.execute(insert(User), [{"username": f"user{index}", "telegram_username": f"user{index}"}
+                                       for index in range(10)])
+        session.commit()
+    usernames = itertools.count()
+    names = itertools.cycle(["alice", "bob"])
+
+    def forget(key: str) -> Callable[[], object]:
+        return lambda: redis_conn.delete(key)
+
+    def warm_user_queries() -> None:
+        # The entries `update` has to invalidate
+        repository.get_by_id(User, "user0")
+        repository.get_by_custom_fields(User, telegram_username="user0")
+        repository.get_all(User)
+
+    cases: dict[str, Case] = {
+        "create": (None, lambda: repository.create(User, username=f"new{next(usernames)}",
+                                                   telegram_username="new")),
+        "get_by_id hit": (lambda: repository.get_by_id(User, "user1"),
+                          lambda: repository.get_by_id(User, "user1")),
+        "get_by_id miss": (forget(cache_key("get_by_id", User, "user1")),
+                           lambda: repository.get_by_id(User, "user1")),
+        "get_by_custom_fields hit": (lambda: repository.get_by_custom_fields(User, telegram_username="user2"),
+                                     lambda: repository.get_by_custom_fields(User, telegram_username="user2")),
+        "get_by_custom_fields miss": (forget(cache_key("get_by_custom_fields", User, telegram_username="user2")),
+                                      lambda: repository.get_by_custom_fields(User, telegram_username="user2")),
+        "update with invalidation": (warm_user_queries,
+                                     lambda: repository.update(User, "user0", telegram_username=next(names))),
+    }
+
+    for size in TABLE_SIZES:
+        # A database of its own per size, get_all reads the whole table
+        sized = BaseRepository(SQLDatabaseManager("sqlite:///:memory:", echo=False), repository.redis_db_manager)
+        with sized.db_manager.get_session() as session:
+            session.execute(insert(User), [{"username": f"user{index}", "telegram_username": f"user{index}"}
+                                           for index in range(size)])
+            session.commit()
+        cases[f"get_all {size} rows miss"] = (forget(cache_key("get_all", User)),
+                                              lambda sized=sized: sized.get_all(User))
+        cases[f"get_all {size} rows hit"] = (lambda sized=sized: sized.get_all(User),
+                                             lambda sized=sized: sized.get_all(User))
+
+    task = Task(id=1, name="Task", description="Description", workspace_id=1, owner_name="user0",
+                completed=False, weight=1)
+    cases["Base.to_dict"] = (None, task.to_dict)
+    return cases
+
+
+def run(redis_manager: RedisDatabaseManager, calls: int = CALLS) -> dict[str, Any]:
+    manager = SQLDatabaseManager("sqlite:///:memory:", echo=False)
+    repository = BaseRepository(manager, redis_manager)
+    redis_manager.get_connection().flushdb()
+    try:
+        results = {}
+        # Calibrated between the cases too, so a slow phase of the machine shows up in the unit as well
+        units = [calibrate()]
+        for name, (setup, call) in build_cases(repository).items():
+            results[name] = measure(setup, call, calls)
+            units.append(calibrate())
+        unit = statistics.median(units)
+    finally:
+        redis_manager.get_connection().flushdb()
+        manager.engine.dispose()
+    return {"calibration_seconds": unit,
+            "python": platform.python_version(),
+            "cases": {name: {"seconds": seconds, "normalized": seconds / unit} for name, seconds in results.items()}}
+
+
+def best_of(runs: list[dict[str, Any]]) -> dict[str, Any]:
+    """Per case, the run where it was fastest; noise on a shared machine only ever adds time."""
+    best = dict(runs[0], cases={})
+    for name in runs[0]["cases"]:
+        best["cases"][name] = min((run["cases"][name] for run in runs), key=lambda stats: stats["normalized"])
+    return best
+
+
+def compare(current: dict[str, Any], baseline: dict[str, Any]) -> dict[str, float]:
+    """Relative change of the normalized time of every case in both runs, e.g. 0.3 for 30% slower."""
+    return {name: current["cases"][name]["normalized"] / stats["normalized"] - 1
+            for name, stats in baseline["cases"].items() if name in current["cases"]}
+
+
+def regressions(changes: dict[str, float], threshold: float = THRESHOLD) -> list[str]:
+    return [name for name, change in changes.items() if change > threshold]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--check", action="store_true", help="fail on regressions against the baseline")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--calls", type=int, default=CALLS)
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="runs of the suite, the best one of each case counts")
+    parser.add_argument("--redis", action="store_true", help="use the configured Redis instead of fakeredis")
+    args = parser.parse_args()
+
+    if args.redis:
+        redis_manager = RedisDatabaseManager()
+    else:
+        import fakeredis  # noqa: PLC0415
+        redis_manager = RedisDatabaseManager(client=fakeredis.FakeRedis(decode_responses=True))
+    current = best_of([run(redis_manager, args.calls) for _ in range(args.repeat)])
+
+    baseline = None
+    if args.check or os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+    changes = compare(current, baseline) if baseline else {}
+    print(f"{'case':<36}{'time':>12}{'vs baseline':>13}")
+    for name, stats in current["cases"].items():
+        change = f"{changes[name]:+.0%}" if name in changes else "-"
+        print(f"{name:<36}{stats['seconds'] * 1e6:>10.1f}us{change:>13}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(current, file, indent=2)
+        print(f"Saved the baseline to {args.baseline}")
+    if args.check:
+        slower = regressions(changes, args.threshold)
+        if slower:
+            print(f"Slower than the baseline by more than {args.threshold:.0%}: {', '.join(slower)}")
+            sys.exit(1)
+        print(f"No case is slower than the baseline by more than {args.threshold:.0%}")
+
+
+if __name__ == '__main__':
+    main()
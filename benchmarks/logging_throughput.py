@@ -0,0 +1,73 @@
+"""
+Messages/second of a handler-like hot path with logging enabled.
+
+"before" is the old setup: `logging.basicConfig` with a synchronous file handler
+and f-strings that render the whole message object on every call.
+"after" is `setup_logging`: a QueueHandler in front of a rotating file handler
+and lazy %-style arguments.
+
+Run from the repository root:
+    python -m benchmarks.logging_throughput
+"""
+import logging
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+from resources.logging_config import DEFAULT_FORMAT, setup_logging
+
+MESSAGES = 20000
+
+
+def make_message(i: int) -> SimpleNamespace:
+    chat = SimpleNamespace(id=i, username=f"user_{i % 100}")
+    return SimpleNamespace(chat=chat, text="Name - Task\nWorkspace Name - Home\nWeight - 5", json={"update": i})
+
+
+def handle_eager(logger: logging.Logger, message: SimpleNamespace) -> None:
+    logger.info(f"User {message.chat.username} triggered parse_message message - {message.text}")
+    logger.debug(f"Parsed message - {message}")
+    logger.info(f"User {message.chat.username} finished parse_message - successfully")
+
+
+def handle_lazy(logger: logging.Logger, message: SimpleNamespace) -> None:
+    logger.info("User %s triggered parse_message message - %s", message.chat.username, message.text)
+    logger.debug("Parsed message - %s", message)
+    logger.info("User %s finished parse_message - successfully", message.chat.username)
+
+
+def reset_root() -> None:
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+
+
+def run(handle, logger: logging.Logger) -> float:
+    messages = [make_message(i) for i in range(MESSAGES)]
+    start = time.perf_counter()
+    for message in messages:
+        handle(logger, message)
+    return MESSAGES / (time.perf_counter() - start)
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        reset_root()
+        logging.basicConfig(format=DEFAULT_FORMAT, level=logging.INFO,
+                            filename=os.path.join(tmp, "before.log"), filemode='w', encoding='utf-8')
+        before = run(handle_eager, logging.getLogger("benchmark"))
+        reset_root()
+
+        listener = setup_logging(filename=os.path.join(tmp, "after.log"))
+        after = run(handle_lazy, logging.getLogger("benchmark"))
+        listener.stop()
+        reset_root()
+
+    print(f"before (basicConfig, f-strings): {before:10.0f} messages/s")
+    print(f"after  (queue listener, lazy):   {after:10.0f} messages/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Progress of random task forests with 1k, 100k and 1M tasks.
+
+"recursive" is the previous `Bot._calculate_progress` body: one Python call
+per task with a dictionary cache. "vectorized" is `compute_progress`, one
+NumPy pass per tree level. The recursive version runs with a raised recursion
+limit and is skipped for the largest size.
+
+Run from the repository root:
+    python -m benchmarks.progress_engine
+"""
+import sys
+import time
+
+import numpy as np
+
+from core.services.progress_engine import NO_PARENT, compute_progress
+
+RECURSIVE_LIMIT = 100_000
+# Shares of the tasks that are roots and that are completed
+ROOT_SHARE = 0.001
+COMPLETED_SHARE = 0.6
+
+
+def make_forest(rng: np.random.Generator, size: int) -> tuple[np.ndarray, ...]:
+    ids = np.arange(1, size + 1)
+    # Every task hangs off one of the previous few hundred tasks, which gives deep, bushy trees
+    offsets = rng.integers(1, 300, size)
+    parent_ids = np.where(ids - offsets >= 1, ids - offsets, NO_PARENT)
+    parent_ids[rng.random(size) < ROOT_SHARE] = NO_PARENT
+    workspace_ids = np.ones(size, dtype=np.int64)
+    weights = rng.choice([0.5, 1.0, 5.0, 10.0], size)
+    completed = rng.random(size) < COMPLETED_SHARE
+    return ids, parent_ids, workspace_ids, weights, completed
+
+
+def recursive_progress(ids, parent_ids, weights, completed) -> dict[int, float]:
+    children: dict[int, list[int]] = {}
+    for task_id, parent_id in zip(ids.tolist(), parent_ids.tolist()):
+        children.setdefault(parent_id, []).append(task_id)
+    weight_of = dict(zip(ids.tolist(), weights.tolist()))
+    completed_of = dict(zip(ids.tolist(), completed.tolist()))
+    cache: dict[int, float] = {}
+
+    def calculate(task_id: int) -> float:
+        if task_id in cache:
+            return cache[task_id]
+        child_records = children.get(task_id)
+        if not child_records:
+            cache[task_id] = completed_of[task_id] * 100
+            return cache[task_id]
+        sum_completed = 0
+        sum_all = 0
+        for child in child_records:
+            child_progress = calculate(child) / 100
+            sum_all += weight_of[child]
+            if completed_of[child]:
+                sum_completed += child_progress * weight_of[child]
+        cache[task_id] = sum_completed / sum_all * 100 if sum_all > 0 else 0
+        return cache[task_id]
+
+    for task_id in children[NO_PARENT]:
+        calculate(task_id)
+    return cache
+
+
+def main() -> None:
+    sys.setrecursionlimit(RECURSIVE_LIMIT)
+    rng = np.random.default_rng(0)
+    for size in (1_000, 100_000, 1_000_000):
+        ids, parent_ids, workspace_ids, weights, completed = make_forest(rng, size)
+
+        start = time.perf_counter()
+        result = compute_progress(ids, parent_ids, workspace_ids, weights, completed)
+        vectorized = time.perf_counter() - start
+
+        if size <= RECURSIVE_LIMIT:
+            start = time.perf_counter()
+            expected = recursive_progress(ids, parent_ids, weights, completed)
+            recursive = f"{time.perf_counter() - start:8.3f} s"
+            assert np.allclose([expected[task_id] for task_id in result.task_ids.tolist()], result.task_progress)
+        else:
+            recursive = "skipped"
+        print(f"{size:>9} tasks: recursive {recursive:>10}, vectorized {vectorized:8.3f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Redis round trips of repository writes and reads.
+
+Counts the commands sent on their own and the pipelines sent (each pipeline
+is one round trip) while a user is created, updated and deleted with cached
+entries present, and while cached records are read one by one.
+
+Needs the Redis configured for `RedisDatabaseManager`, which is flushed.
+
+                          before  after
+    create                     3      2
+    update                     4      2
+    delete                     6      3
+    99 cached get_by_id      198     99   (EXISTS + GET per hit before)
+    get_many_by_id of 99       -      1
+
+Run from the repository root:
+    python -m benchmarks.redis_round_trips
+"""
+from collections import Counter
+from collections.abc import Callable
+
+import redis
+from redis.client import Pipeline
+
+from core.models_sql_alchemy.models import User
+from database.database_manager import RedisDatabaseManager, SQLDatabaseManager
+from database.repositories.base_repository import BaseRepository
+
+READS = 100
+round_trips: Counter[str] = Counter()
+
+
+def count(name: str, method: Callable) -> Callable:
+    def wrapper(*args, **kwargs):
+        round_trips[name] += 1
+        return method(*args, **kwargs)
+    return wrapper
+
+
+def measure(name: str, step: Callable[[], object]) -> None:
+    round_trips.clear()
+    step()
+    print(f"{name:<28} {round_trips['command'] + round_trips['pipeline']:5} round trips "
+          f"({round_trips['command']} commands, {round_trips['pipeline']} pipelines)")
+
+
+def main() -> None:
+    redis.Redis.execute_command = count("command", redis.Redis.execute_command)
+    Pipeline.execute = count("pipeline", Pipeline.execute)
+
+    repository = BaseRepository(SQLDatabaseManager("sqlite:///:memory:", echo=False), RedisDatabaseManager())
+    redis_conn = repository.redis_db_manager.get_connection()
+    redis_conn.flushdb()
+    for index in range(READS):
+        repository.create(User, username=str(index), telegram_username=str(index))
+
+    def warm() -> None:
+        repository.get_all(User)
+        repository.get_by_custom_fields(User, active=True)
+        repository.get_by_id(User, "0")
+
+    warm()
+    measure("create", lambda: repository.create(User, username="new", telegram_username="new"))
+    warm()
+    measure("update", lambda: repository.update(User, "0", telegram_username="changed"))
+    warm()
+    measure("delete", lambda: repository.delete(User, "0"))
+    for index in range(1, READS):
+        repository.get_by_id(User, str(index))
+    measure(f"{READS - 1} cached get_by_id", lambda: [repository.get_by_id(User, str(index))
+                                                     for index in range(1, READS)])
+    if hasattr(repository, "get_many_by_id"):
+        measure(f"get_many_by_id of {READS - 1}",
+                lambda: repository.get_many_by_id(User, [str(index) for index in range(1, READS)]))
+    redis_conn.flushdb()
+
+
+if __name__ == '__main__':
+    main()
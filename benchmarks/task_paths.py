@@ -0,0 +1,110 @@
+"""
+Subtree and ancestor queries on a deep and on a wide task tree.
+
+"walk" follows `parent_id` one level at a time, one query per level, which is
+what finding descendants took before `tasks.path`. "path" is one range scan of
+the path index. Both run against an SQLite file with ~10k tasks per tree:
+a chain 50 levels deep with 200 leaves on every level, and one task with 10k children.
+
+Run from the repository root:
+    python -m benchmarks.task_paths
+"""
+import os
+import tempfile
+import time
+from collections.abc import Callable
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from core.models_sql_alchemy.models import Base, Task, User, Workspace
+from core.services.task_tree import path_ids, path_segment, subtree_bounds
+
+REPEATS = 20
+
+
+def build(session: Session, shape: str) -> tuple[int, int]:
+    """Inserts a tree, returns the id of its root and of its deepest task."""
+    rows = []
+    next_id = 1
+
+    def add(parent: dict | None) -> dict:
+        nonlocal next_id
+        row = {"id": next_id, "parent_id": parent["id"] if parent else None,
+               "path": (parent["path"] if parent else "") + path_segment(next_id),
+               "name": str(next_id), "workspace_id": 1, "owner_name": "bench", "completed": False, "weight": 1}
+        next_id += 1
+        rows.append(row)
+        return row
+
+    root = add(None)
+    deepest = root
+    if shape == "depth 50":
+        for _ in range(49):
+            for _ in range(200):
+                add(deepest)
+            deepest = add(deepest)
+    else:
+        for _ in range(10_000):
+            deepest = add(root)
+    session.execute(insert(Task), rows)
+    session.commit()
+    return root["id"], deepest["id"]
+
+
+def walk_descendants(session: Session, task_id: int) -> int:
+    count, level = 0, [task_id]
+    while level:
+        level = list(session.scalars(select(Task.id).where(Task.parent_id.in_(level))))
+        count += len(level)
+    return count
+
+
+def path_descendants(session: Session, task_id: int) -> int:
+    low, high = subtree_bounds(session.scalar(select(Task.path).where(Task.id == task_id)))
+    return len(session.execute(select(Task.id).where(Task.path > low, Task.path < high)).all())
+
+
+def walk_ancestors(session: Session, task_id: int) -> int:
+    count = 0
+    parent_id = session.scalar(select(Task.parent_id).where(Task.id == task_id))
+    while parent_id is not None:
+        count += 1
+        parent_id = session.scalar(select(Task.parent_id).where(Task.id == parent_id))
+    return count
+
+
+def path_ancestors(session: Session, task_id: int) -> int:
+    ids = path_ids(session.scalar(select(Task.path).where(Task.id == task_id)))
+    return len(session.execute(select(Task.id).where(Task.id.in_(ids[:-1]))).all())
+
+
+def measure(query: Callable[[Session, int], int], session: Session, task_id: int) -> tuple[float, int]:
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        result = query(session, task_id)
+    return (time.perf_counter() - start) / REPEATS * 1000, result
+
+
+def main() -> None:
+    for shape in ("depth 50", "breadth 10k"):
+        with tempfile.TemporaryDirectory() as directory:
+            engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+            Base.metadata.create_all(engine)
+            with Session(engine) as session:
+                session.add(User(username="bench"))
+                session.add(Workspace(id=1, name="bench", owner_name="bench"))
+                session.commit()
+                root_id, deepest_id = build(session, shape)
+                for label, walk, path, task_id in (
+                        ("descendants", walk_descendants, path_descendants, root_id),
+                        ("ancestors", walk_ancestors, path_ancestors, deepest_id)):
+                    walk_ms, walk_count = measure(walk, session, task_id)
+                    path_ms, path_count = measure(path, session, task_id)
+                    assert walk_count == path_count
+                    print(f"{shape:>11} {label:<11} ({walk_count:>5}): walk {walk_ms:7.2f} ms, path {path_ms:7.2f} ms")
+            engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
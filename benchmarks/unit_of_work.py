@@ -0,0 +1,129 @@
+"""
+Commits per message with a transaction per repository call and with a unit of work per update.
+
+Replays the repository calls the bot's handlers make for each message of a
+user's script (registration, creating a workspace and a task through their
+forms, /view of the task) against an SQLite file with its default durable
+settings and an in-process fakeredis cache (pip install fakeredis). Handler
+filters, which check the user's state before a handler is picked, run outside
+of the update's unit of work in the bot and do so here as well.
+
+Counts commits, and the durable ones among them: commits of a transaction
+that wrote, each of which syncs the journal and the database file to disk.
+Commits of transactions that only read write nothing but still cost a round
+trip, read-only units skip them. 200 users on one machine:
+
+                                     per call  per update
+    commits per message                  1.50        0.83
+    durable commits per message          1.17        0.83
+    ms per message                        3.3         3.4
+
+Handler filters read the state through the cache and only a user without a
+state row is written, so messages of the script that only pick a handler by
+state commit nothing outside of their unit of work.
+
+Run from the repository root:
+    python -m benchmarks.unit_of_work [--users 200]
+"""
+import argparse
+import os
+import tempfile
+import time
+from collections import Counter
+from collections.abc import Callable
+from contextlib import nullcontext
+from dataclasses import dataclass
+
+import fakeredis
+from sqlalchemy import event
+
+from core.models_sql_alchemy.models import Task, Workspace
+from database.database_manager import RedisDatabaseManager, SQLDatabaseManager
+from database.repositories.all_repositories import TaskRepository, UserRepository
+from database.unit_of_work import unit_of_work
+
+
+@dataclass
+class Message:
+    name: str
+    handle: Callable[[str], object]
+    read_only: bool = False
+    # Runs before the handler is picked, outside of its unit of work
+    state_filter: bool = False
+
+
+def script(users: UserRepository, tasks: TaskRepository) -> list[Message]:
+    def clear_state(username: str) -> None:
+        users.set_state(username, None)
+
+    def create_workspace(username: str) -> None:
+        tasks.create(Workspace, name="Home", owner_name=username)
+        clear_state(username)
+
+    def create_task(username: str) -> None:
+        workspace_id = tasks.resolve_name_id(Workspace, username, "Home")
+        tasks.create(Task, name="Task", workspace_id=workspace_id, owner_name=username, weight=1)
+        clear_state(username)
+
+    def view(username: str) -> None:
+        [task] = tasks.get_by_custom_fields(Task, name="Task", owner_name=username)
+        tasks.subtree_progress(task["id"])
+
+    return [
+        Message("/create_user", users.create),
+        Message("/create_workspace", lambda username: users.set_state(username, "creating workspace")),
+        Message("workspace name", create_workspace, state_filter=True),
+        Message("/create_Task", lambda username: users.set_state(username, "/create_Task")),
+        Message("task form", create_task, state_filter=True),
+        Message("/view Task", view, read_only=True),
+    ]
+
+
+def count_commits(manager: SQLDatabaseManager, counters: Counter[str]) -> None:
+    @event.listens_for(manager.engine, "commit")
+    def count(connection):
+        counters["commits"] += 1
+        # sqlite3 only begins a transaction before a statement that writes
+        if connection.connection.dbapi_connection.in_transaction:
+            counters["durable commits"] += 1
+
+
+def run(users: int, per_update: bool) -> tuple[Counter[str], float]:
+    counters: Counter[str] = Counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = SQLDatabaseManager(f"sqlite:///{os.path.join(tmp, 'bench.db')}", echo=False)
+        redis_manager = RedisDatabaseManager(client=fakeredis.FakeRedis(decode_responses=True))
+        user_repository = UserRepository(manager, redis_manager)
+        messages = script(user_repository, TaskRepository(manager, redis_manager))
+        count_commits(manager, counters)
+        start = time.perf_counter()
+        for index in range(users):
+            username = f"user{index}"
+            for message in messages:
+                if message.state_filter:
+                    user_repository.get_or_create_state(username)
+                scope = unit_of_work(manager, read_only=message.read_only) if per_update else nullcontext()
+                with scope:
+                    message.handle(username)
+                counters["messages"] += 1
+        seconds = time.perf_counter() - start
+        manager.engine.dispose()
+    return counters, seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Commits per message with and without a unit of work per update")
+    parser.add_argument("--users", type=int, default=200)
+    args = parser.parse_args()
+
+    results = {mode: run(args.users, per_update) for mode, per_update in (("per call", False), ("per update", True))}
+    print(f"{'':<30}{'per call':>12}{'per update':>12}")
+    for name in ("commits", "durable commits"):
+        print(f"{name + ' per message':<30}" + "".join(f"{counters[name] / counters['messages']:>12.2f}"
+                                                      for counters, _ in results.values()))
+    print(f"{'ms per message':<30}" + "".join(f"{seconds * 1000 / counters['messages']:>12.1f}"
+                                              for counters, seconds in results.values()))
+
+
+if __name__ == '__main__':
+    main()
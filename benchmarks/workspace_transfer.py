@@ -0,0 +1,86 @@
+"""
+Import and export of a 50k-task workspace through the streaming JSON/CSV paths.
+
+Needs the Redis configured for `RedisDatabaseManager` (cache invalidation on import).
+Reports wall time and peak Python memory (tracemalloc) of each step, timings
+include the tracing overhead (roughly 2x).
+
+Run from the repository root:
+    python -m benchmarks.workspace_transfer [tasks]
+"""
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+
+from core.models_sql_alchemy.models import User, Workspace
+from core.services.workspace_transfer import (
+    iter_csv_export,
+    iter_csv_import,
+    iter_json_export,
+    iter_json_import,
+)
+from database.database_manager import RedisDatabaseManager, SQLDatabaseManager
+from database.repositories.all_repositories import TaskRepository
+
+# Share of the generated tasks that are completed
+COMPLETED_SHARE = 0.3
+
+
+def generate_document(tasks: int, branching: int = 5, seed: int = 0) -> str:
+    """Tasks in the order `iter_workspace_tree` exports them: level by level."""
+    rng = random.Random(seed)
+    workspace = {"name": "Source", "description": "Generated"}
+    rows = []
+    for task_id in range(1, tasks + 1):
+        parent_id = (task_id - 2) // branching + 1 if task_id > branching else None
+        rows.append({"id": task_id, "parent_id": parent_id, "name": f"Задача {task_id}",
+                     "description": None, "completed": rng.random() < COMPLETED_SHARE, "weight": rng.randint(1, 10)})
+    return "".join(iter_json_export(workspace, rows))
+
+
+def measure(name: str, step: Callable[[], object]) -> object:
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = step()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<12} {elapsed:8.2f} s   peak {peak / 1024 / 1024:8.1f} MiB")
+    return result
+
+
+def main() -> None:
+    tasks = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    document = generate_document(tasks)
+    print(f"{tasks} tasks, JSON document {len(document) / 1024 / 1024:.1f} MiB")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = SQLDatabaseManager(f"sqlite:///{os.path.join(tmp, 'bench.db')}", echo=False)
+        repository = TaskRepository(manager, RedisDatabaseManager())
+        repository.create(User, username="bench", telegram_username="bench")
+
+        measure("import json", lambda: repository.import_tree("bench", iter_json_import(io.StringIO(document))))
+        [workspace] = repository.get_by_custom_fields(Workspace, name="Source", owner_name="bench")
+
+        def export(serializer: Callable) -> int:
+            size = 0
+            for chunk in serializer(workspace, repository.iter_workspace_tree(workspace["id"])):
+                size += len(chunk)
+            return size
+
+        measure("export json", lambda: export(iter_json_export))
+        measure("export csv", lambda: export(iter_csv_export))
+
+        csv_document = "".join(iter_csv_export(workspace, repository.iter_workspace_tree(workspace["id"])))
+        repository.update(Workspace, workspace["id"], name="Source (json)")
+        measure("import csv", lambda: repository.import_tree("bench", iter_csv_import(io.StringIO(csv_document))))
+        repository.redis_db_manager.get_connection().flushdb()
+
+
+if __name__ == '__main__':
+    main()
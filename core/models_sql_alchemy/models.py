@@ -1,4 +1,4 @@
-from typing import Any, List, Optional, Union
+from typing import Any, Optional
 
 from sqlalchemy import Boolean, Float, ForeignKey, String, inspect
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
@@ -18,10 +18,10 @@ class Workspace(Base):
     __tablename__ = "workspaces"
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(255))
-    description: Mapped[Optional[str]] = mapped_column(String(1000),nullable=True)
+    description: Mapped[str | None] = mapped_column(String(1000),nullable=True)
     owner_name: Mapped[str] = mapped_column(ForeignKey("users.username"))
     owner: Mapped["User"] = relationship(back_populates="workspace")
-    child_tasks: Mapped[List["Task"]] = relationship("Task", back_populates="workspace", cascade="all, delete-orphan")
+    child_tasks: Mapped[list["Task"]] = relationship("Task", back_populates="workspace", cascade="all, delete-orphan")
     def __repr__(self) -> str:
         return f"Item(Name={self.name!r}, Owner={self.owner_name!r}, Description={self.description!r})"
 
@@ -31,10 +31,10 @@ class User(Base):
     # password: Mapped[str] = mapped_column(String())
     active: Mapped[bool] = mapped_column(Boolean, default=True)
     telegram_username: Mapped[str] = mapped_column(String, nullable=True)
-    workspace: Mapped[List["Workspace"]] = relationship(
+    workspace: Mapped[list["Workspace"]] = relationship(
         back_populates="owner", cascade="all, delete-orphan", lazy="select"
     )
-    user_state: Mapped[List["UserState"]] = relationship(
+    user_state: Mapped[list["UserState"]] = relationship(
         back_populates="user", cascade="all, delete-orphan", lazy="select"
     )
     def __repr__(self) -> str:
@@ -43,7 +43,7 @@ class User(Base):
 class UserState(Base):
     __tablename__ = "user_state"
     telegram_username: Mapped[str] = mapped_column(ForeignKey("users.telegram_username"), primary_key=True)
-    state: Mapped[Optional[str]] = mapped_column(String(50), default=None, nullable=True)
+    state: Mapped[str | None] = mapped_column(String(50), default=None, nullable=True)
     user: Mapped["User"] = relationship(User, back_populates="user_state")
     def __repr__(self) -> str:
         return f"UserState(id={self.telegram_username!r}, State={self.state!r})"
@@ -70,21 +70,23 @@ class Task(Base):
     __tablename__ = "tasks"
     id: Mapped[int] = mapped_column(primary_key=True)
 
-    workspace_id: Mapped[int] = mapped_column(ForeignKey("workspaces.id"))
+    workspace_id: Mapped[int] = mapped_column(ForeignKey("workspaces.id"), index=True)
     workspace: Mapped["Workspace"] = relationship(back_populates="child_tasks")
 
-    parent_id: Mapped[Optional[int]] = mapped_column(ForeignKey("tasks.id"), nullable=True)
+    parent_id: Mapped[int | None] = mapped_column(ForeignKey("tasks.id"), nullable=True, index=True)
     parent_task: Mapped[Optional["Task"]] = relationship(
         "Task", back_populates="child_tasks", remote_side=id
     )
+    # Ids of the ancestors and of the task itself, see core.services.task_tree.PATH_WIDTH
+    path: Mapped[str | None] = mapped_column(String, nullable=True, index=True)
 
     name: Mapped[str] = mapped_column(String(100))
-    description: Mapped[Optional[str]] = mapped_column(String(5000), nullable=True)
+    description: Mapped[str | None] = mapped_column(String(5000), nullable=True)
     completed: Mapped[bool] = mapped_column(Boolean, default=False)
     weight: Mapped[float] = mapped_column(Float, default=1)
     owner_name: Mapped[str] = mapped_column(ForeignKey("users.username"))
 
-    child_tasks: Mapped[List["Task"]] = relationship(back_populates="parent_task", cascade="all, delete-orphan")
+    child_tasks: Mapped[list["Task"]] = relationship(back_populates="parent_task", cascade="all, delete-orphan")
 
 class Summary:
-    all_cls = Union[Workspace, UserState, Task, User]
\ No newline at end of file
+    all_cls = Workspace | UserState | Task | User
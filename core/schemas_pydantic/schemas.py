@@ -1,7 +1,6 @@
 from enum import Enum
-from typing import Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class States(str, Enum):
@@ -11,16 +10,18 @@ class States(str, Enum):
     creating_task = "creating_task"
 
 class BaseObject(BaseModel):
-    id: Optional[int] = Field(alias="Id")
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: int | None = Field(None, alias="Id")
     name: str = Field(...,max_length=255, alias="Name")
-    description: Optional[str] | None = Field(None, max_length=1000, alias="Description")
-    owner_name: [str] = Field(alias="Owner Name")
+    description: str | None = Field(None, max_length=1000, alias="Description")
+    owner_name: str | None = Field(None, alias="Owner Name")
 
 class Workspace(BaseObject):
     pass
 
 class Task(BaseObject):
     workspace_name: str = Field(..., max_length=255, alias="Workspace Name")
-    parent_name: str = Field(None, max_length=255, alias="Parent Name")
+    parent_name: str | None = Field(None, max_length=255, alias="Parent Name")
     completed: bool = Field(default=False, alias="Completed")
-    weight: Optional[float] = Field(default=1, ge=1, le=100, alias="Weight")
+    weight: float | None = Field(default=1, ge=1, le=100, alias="Weight")
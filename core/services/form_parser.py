@@ -0,0 +1,138 @@
+from collections.abc import Mapping
+from dataclasses import dataclass
+from functools import cache
+from types import MappingProxyType
+from typing import Any
+
+from pydantic import BaseModel
+
+BOOLEAN_VALUES: Mapping[str, bool] = MappingProxyType({
+    "да": True,
+    "нет": False,
+    "1": True,
+    "0": False,
+    "y": True,
+    "n": False,
+    "true": True,
+    "false": False,
+    "yes": True,
+    "no": False,
+})
+
+
+@dataclass(frozen=True)
+class LineError:
+    line_number: int
+    line: str
+    reason: str
+
+    def __str__(self) -> str:
+        return f"Line {self.line_number}: {self.reason} - {self.line!r}"
+
+
+class FormParseError(ValueError):
+    """Raised when one or more lines of a form can't be parsed."""
+    def __init__(self, errors: list[LineError]) -> None:
+        self.errors = errors
+        super().__init__("\n".join(str(error) for error in errors))
+
+    def __reduce__(self):
+        # Rebuilt from the line errors when it comes back from another process
+        return type(self), (self.errors,)
+
+
+class FormSchema:
+    """
+    Parser for "Field - value" forms, built once per model.
+
+    Args:
+        fields: Mapping of lower-cased field labels to the keys used in the result.
+        boolean_fields: Result keys whose values are converted with `BOOLEAN_VALUES`.
+        strict: Report unknown fields and lines without a separator as errors
+                instead of skipping them.
+    """
+    def __init__(self,
+                 fields: Mapping[str, str],
+                 boolean_fields: frozenset[str] = frozenset(),
+                 strict: bool = False) -> None:
+        self.fields = dict(fields)
+        self.boolean_fields = boolean_fields
+        self.strict = strict
+
+    def parse(self, text: str, first_line_number: int = 1) -> dict[str, Any]:
+        """
+        Parses the whole form in one pass.
+
+        Known labels are mapped to their result keys, unknown labels are kept
+        as written when the schema has no fields (generic form) and skipped otherwise.
+
+        Args:
+            text: The form text.
+            first_line_number: Number reported for the first line, useful when
+                               the form is a part of a larger message.
+
+        Returns:
+            A dictionary of parsed values.
+
+        Raises:
+            FormParseError: With every offending line, if any line is invalid.
+        """
+        result: dict[str, Any] = {}
+        errors: list[LineError] = []
+        generic = not self.fields
+
+        for line_number, line in enumerate(text.splitlines(), start=first_line_number):
+            if not line or line.isspace():
+                continue
+            # "Field - value", the field name is everything up to the first hyphen
+            label, separator, value = line.partition("-")
+            label = label.strip()
+            if not separator or not label:
+                if self.strict:
+                    errors.append(LineError(line_number, line, "expected 'Field - value'"))
+                continue
+
+            value = value.strip()
+            key = label if generic else self.fields.get(label.casefold())
+            if key is None:
+                if self.strict:
+                    errors.append(LineError(line_number, line, f"unknown field {label!r}"))
+                continue
+            if key in result and self.strict:
+                errors.append(LineError(line_number, line, f"field {label!r} is repeated"))
+                continue
+
+            if key in self.boolean_fields:
+                boolean = BOOLEAN_VALUES.get(value.casefold())
+                if boolean is None:
+                    errors.append(LineError(line_number, line, f"{value!r} is not a yes/no value"))
+                    continue
+                result[key] = boolean
+            else:
+                result[key] = value
+
+        if errors:
+            raise FormParseError(errors)
+        return result
+
+
+GENERIC_FORM = FormSchema({}, boolean_fields=frozenset({"Completed"}))
+
+
+@cache
+def compile_form_schema(model: type[BaseModel], strict: bool = False) -> FormSchema:
+    """
+    Builds a `FormSchema` from the aliases of a Pydantic model.
+
+    Both the alias ("Workspace Name") and the field name ("workspace_name")
+    are accepted as labels, results are keyed by field name.
+    """
+    fields: dict[str, str] = {}
+    boolean_fields = set()
+    for name, info in model.model_fields.items():
+        fields[name.casefold()] = name
+        if info.alias:
+            fields[info.alias.casefold()] = name
+        if info.annotation is bool:
+            boolean_fields.add(name)
+    return FormSchema(fields, frozenset(boolean_fields), strict)
@@ -0,0 +1,104 @@
+"""
+Runs CPU-bound pure functions off the event loop when their input is big.
+
+Spawning work in another process costs pickling and a round trip, so small
+inputs stay inline. Where the line is drawn is learned per function from the
+measured cost per unit of input and the measured offload overhead.
+"""
+import asyncio
+import multiprocessing
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+# Seconds a call may block the event loop before it's worth a process round trip
+INLINE_BUDGET = 0.005
+# Input size offloaded from before a function has been timed
+INITIAL_THRESHOLD = 2000
+# Weight of the newest timing in the moving averages
+SMOOTHING = 0.2
+
+
+@dataclass
+class Timing:
+    """Moving averages of a function's cost."""
+    seconds_per_unit: float | None = None
+    # Wall time of an offloaded call minus the time spent in the function
+    overhead: float | None = None
+
+    @staticmethod
+    def _average(current: float | None, sample: float) -> float:
+        return sample if current is None else current + SMOOTHING * (sample - current)
+
+    def record(self, size: int, seconds: float, overhead: float | None = None) -> None:
+        if size > 0:
+            self.seconds_per_unit = self._average(self.seconds_per_unit, seconds / size)
+        if overhead is not None:
+            self.overhead = self._average(self.overhead, max(overhead, 0.0))
+
+
+def _timed(func: Callable[..., T], *args: Any) -> tuple[T, float]:
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+class Offloader:
+    """
+    Runs `func(*args)` in a process pool when `size` reaches the function's threshold, inline otherwise.
+
+    The threshold of a function is the input size whose inline run would take
+    longer than both `inline_budget` and the offload overhead. Functions, their
+    arguments, results and exceptions must be picklable.
+
+    Args:
+        max_workers: Pool size, 0 runs everything inline. The pool starts on the first offloaded call.
+    """
+
+    def __init__(self, max_workers: int = 2, inline_budget: float = INLINE_BUDGET,
+                 initial_threshold: int = INITIAL_THRESHOLD):
+        self.max_workers = max_workers
+        self.inline_budget = inline_budget
+        self.initial_threshold = initial_threshold
+        self.timings: dict[Callable, Timing] = {}
+        self._pool: ProcessPoolExecutor | None = None
+
+    def threshold(self, func: Callable) -> float:
+        timing = self.timings.get(func)
+        if timing is None or not timing.seconds_per_unit:
+            return self.initial_threshold
+        return max(self.inline_budget, timing.overhead or 0.0) / timing.seconds_per_unit
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Spawned, forking copies the bot's threads, sockets and pools
+            self._pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    async def run(self, func: Callable[..., T], *args: Any, size: int) -> T:
+        timing = self.timings.setdefault(func, Timing())
+        if self.max_workers <= 0 or size < self.threshold(func):
+            result, seconds = _timed(func, *args)
+            timing.record(size, seconds)
+            return result
+
+        start = time.perf_counter()
+        result, seconds = await asyncio.get_running_loop().run_in_executor(self._get_pool(), _timed, func, *args)
+        timing.record(size, seconds, overhead=time.perf_counter() - start - seconds)
+        return result
+
+    async def warm_up(self) -> None:
+        """Starts the pool processes, so the first big input doesn't wait for them."""
+        if self.max_workers > 0:
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(loop.run_in_executor(self._get_pool(), time.sleep, 0.01)
+                                   for _ in range(self.max_workers)))
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
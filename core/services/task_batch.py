@@ -0,0 +1,106 @@
+from dataclasses import dataclass
+from typing import Any
+
+from pydantic import ValidationError
+
+from core.schemas_pydantic.schemas import Task
+from core.services.form_parser import FormParseError, LineError, compile_form_schema
+
+TAB_WIDTH = 4
+
+
+@dataclass
+class _Block:
+    indent: int
+    first_line_number: int
+    lines: list[str]
+
+
+def _indent_of(line: str) -> int:
+    expanded = line.expandtabs(TAB_WIDTH)
+    return len(expanded) - len(expanded.lstrip(" "))
+
+
+def _split_blocks(text: str) -> list[_Block]:
+    blocks: list[_Block] = []
+    current: _Block | None = None
+    for line_number, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            current = None
+            continue
+        if current is None:
+            current = _Block(_indent_of(line), line_number, [])
+            blocks.append(current)
+        current.lines.append(line)
+    return blocks
+
+
+def parse_task_blocks(text: str) -> list[dict[str, Any]]:
+    """
+    Parses a message with many task forms into rows for `TaskRepository.create_tree`.
+
+    Forms are separated by blank lines. A form indented deeper than the
+    previous one is a child of the closest less indented form above it and
+    inherits its workspace. Top level forms inherit "Workspace Name" from
+    the previous top level form and may reference an existing task with "Parent Name".
+
+    Example:
+        "Workspace Name - Home
+        Name - Renovation
+
+            Name - Paint walls
+            Weight - 5
+
+            Name - Fix floor"
+
+    Returns:
+        Validated task fields keyed by field name, in message order. Children carry
+        "parent_index", the position of their parent in the returned list.
+
+    Raises:
+        FormParseError: With every invalid line of every form.
+    """
+    schema = compile_form_schema(Task, strict=True)
+    rows: list[dict[str, Any]] = []
+    errors: list[LineError] = []
+    # (indent, row index) of the forms the next one may be nested in
+    stack: list[tuple[int, int]] = []
+    workspace_name: str | None = None
+
+    for block in _split_blocks(text):
+        while stack and stack[-1][0] >= block.indent:
+            stack.pop()
+        parent_index = stack[-1][1] if stack else None
+        stack.append((block.indent, len(rows)))
+        row: dict[str, Any] = {"parent_index": parent_index}
+        rows.append(row)
+
+        try:
+            parsed = schema.parse("\n".join(block.lines), first_line_number=block.first_line_number)
+        except FormParseError as e:
+            errors.extend(e.errors)
+            continue
+
+        if parent_index is not None:
+            if parsed.get("parent_name"):
+                errors.append(LineError(block.first_line_number, block.lines[0],
+                                        "nested task can't have a Parent Name"))
+            if "workspace_name" not in rows[parent_index]:
+                # The parent is invalid and already reported
+                continue
+            parsed["workspace_name"] = rows[parent_index]["workspace_name"]
+        elif "workspace_name" in parsed:
+            workspace_name = parsed["workspace_name"]
+        elif workspace_name is not None:
+            parsed["workspace_name"] = workspace_name
+
+        try:
+            row.update(Task.model_validate(parsed).model_dump(exclude={"id", "owner_name"}))
+        except ValidationError as e:
+            for error in e.errors():
+                field = ".".join(str(part) for part in error["loc"])
+                errors.append(LineError(block.first_line_number, block.lines[0], f"{field}: {error['msg']}"))
+
+    if errors:
+        raise FormParseError(errors)
+    return rows
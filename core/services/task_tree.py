@@ -0,0 +1,228 @@
+"""
+Depth-safe traversal and cycle checks for task hierarchies.
+
+Nothing here recurses, so trees of any depth can be walked, and every walk
+keeps track of visited nodes so that a cycle in the stored data ends with a
+`TaskCycleError` instead of an endless loop.
+"""
+from collections import deque
+from collections.abc import Callable, Hashable, Iterable, Iterator
+from typing import Generic, NamedTuple, TypeVar
+
+from sqlalchemy.exc import SQLAlchemyError
+
+N = TypeVar('N')
+
+# Materialized paths are the ids from the top level task down to the task itself,
+# each zero-padded to PATH_WIDTH digits. Digits only, so every collation orders
+# them the same way and a subtree is one range of the index.
+PATH_WIDTH = 10
+
+
+class TaskCycleError(SQLAlchemyError):
+    """Raised when a parent assignment would make a task its own ancestor, or a stored tree has a cycle."""
+
+
+class Visit(NamedTuple, Generic[N]):
+    node: N
+    parent: N | None
+    depth: int
+
+
+def _identity(node: N) -> Hashable:
+    return node
+
+
+def iter_dfs(roots: Iterable[N],
+             children: Callable[[N], Iterable[N]],
+             max_depth: int | None = None,
+             key: Callable[[N], Hashable] = _identity) -> Iterator[Visit[N]]:
+    """
+    Walks the trees below `roots` depth-first, every node before its children,
+    siblings in their original order.
+
+    Args:
+        roots: Top level nodes, visited at depth 0.
+        children: Returns the children of a node.
+        max_depth: Children of nodes at this depth are not visited.
+        key: Identifies a node, for nodes that aren't hashable.
+
+    Raises:
+        TaskCycleError: If a node is reached twice.
+    """
+    seen: set[Hashable] = set()
+    stack: list[Visit[N]] = [Visit(root, None, 0) for root in reversed(list(roots))]
+    while stack:
+        visit = stack.pop()
+        node_key = key(visit.node)
+        if node_key in seen:
+            raise TaskCycleError(f"Task tree has a cycle at {node_key!r}")
+        seen.add(node_key)
+        yield visit
+        if max_depth is None or visit.depth < max_depth:
+            stack.extend(Visit(child, visit.node, visit.depth + 1)
+                         for child in reversed(list(children(visit.node))))
+
+
+def iter_bfs(roots: Iterable[N],
+             children: Callable[[N], Iterable[N]],
+             max_depth: int | None = None,
+             key: Callable[[N], Hashable] = _identity) -> Iterator[Visit[N]]:
+    """Like `iter_dfs`, but level by level: all nodes of a depth before any node of the next one."""
+    seen: set[Hashable] = set()
+    queue: deque[Visit[N]] = deque(Visit(root, None, 0) for root in roots)
+    while queue:
+        visit = queue.popleft()
+        node_key = key(visit.node)
+        if node_key in seen:
+            raise TaskCycleError(f"Task tree has a cycle at {node_key!r}")
+        seen.add(node_key)
+        yield visit
+        if max_depth is None or visit.depth < max_depth:
+            queue.extend(Visit(child, visit.node, visit.depth + 1) for child in children(visit.node))
+
+
+def iter_levels(roots: Iterable[N],
+                children_of: Callable[[list[Hashable]], Iterable[N]],
+                key: Callable[[N], Hashable] = _identity) -> Iterator[N]:
+    """
+    Yields the trees below `roots` level by level, streaming the nodes of every level.
+
+    `children_of` gets the keys of a whole level and returns the children of all
+    of them, so a database backed tree needs one query per level, not per node.
+    Only the keys of the nodes are kept in memory.
+
+    Raises:
+        TaskCycleError: If a node is reached twice.
+    """
+    seen: set[Hashable] = set()
+    level: Iterable[N] = roots
+    while True:
+        keys: list[Hashable] = []
+        for node in level:
+            node_key = key(node)
+            if node_key in seen:
+                raise TaskCycleError(f"Task tree has a cycle at {node_key!r}")
+            seen.add(node_key)
+            keys.append(node_key)
+            yield node
+        if not keys:
+            return
+        level = children_of(keys)
+
+
+def path_segment(task_id: int) -> str:
+    return f"{task_id:0{PATH_WIDTH}d}"
+
+
+def child_path(parent_path: str | None, task_id: int) -> str | None:
+    """Path of a task below a parent, None when the parent's path isn't known yet."""
+    if parent_path is None:
+        return None
+    return parent_path + path_segment(task_id)
+
+
+def subtree_bounds(path: str) -> tuple[str, str]:
+    """
+    Returns (low, high): a path p belongs to the subtree of `path` when low <= p < high.
+
+    `high` is the next path of the same length, so every longer path that starts
+    with `path` sorts before it.
+    """
+    return path, f"{int(path) + 1:0{len(path)}d}"
+
+
+def path_ids(path: str) -> list[int]:
+    """Ids from the top level ancestor down to the task."""
+    return [int(path[start:start + PATH_WIDTH]) for start in range(0, len(path), PATH_WIDTH)]
+
+
+def path_depth(path: str) -> int:
+    """Number of ancestors of the task."""
+    return len(path) // PATH_WIDTH - 1
+
+
+class AncestorIndex:
+    """
+    Parent links of tasks, cached for the checks of one transaction.
+
+    Links are loaded lazily: when a walk reaches a task the index doesn't know,
+    `load` is called with its id and returns (id, parent id) pairs of that task
+    and, ideally, all of its ancestors, so one call covers a whole path.
+    Depths are memoized, which lets most ancestor checks stop without walking.
+
+    Args:
+        load: Returns parent links starting at the given task id.
+    """
+    def __init__(self, load: Callable[[int], Iterable[tuple[int, int | None]]]) -> None:
+        self.load = load
+        self.parents: dict[int, int | None] = {}
+        self._depths: dict[int, int] = {}
+
+    def parent(self, task_id: int) -> int | None:
+        if task_id not in self.parents:
+            self.parents.update(self.load(task_id))
+            # A task that doesn't exist has no parent
+            self.parents.setdefault(task_id, None)
+        return self.parents[task_id]
+
+    def depth(self, task_id: int) -> int:
+        """Number of ancestors of a task."""
+        path: list[int] = []
+        on_path: set[int] = set()
+        node: int | None = task_id
+        while node is not None and node not in self._depths:
+            if node in on_path:
+                raise TaskCycleError(f"Task {node} is its own ancestor")
+            path.append(node)
+            on_path.add(node)
+            node = self.parent(node)
+        depth = -1 if node is None else self._depths[node]
+        for node in reversed(path):
+            depth += 1
+            self._depths[node] = depth
+        return self._depths[task_id]
+
+    def is_ancestor(self, ancestor_id: int, task_id: int) -> bool:
+        """Whether `ancestor_id` is `task_id` itself or one of its ancestors."""
+        steps = self.depth(task_id) - self.depth(ancestor_id)
+        if steps < 0:
+            return False
+        node: int | None = task_id
+        for _ in range(steps):
+            node = self.parent(node)  # type: ignore[arg-type]
+        return node == ancestor_id
+
+    def path(self, task_id: int) -> list[int]:
+        """Ids from the top level ancestor down to the task."""
+        self.depth(task_id)
+        path: list[int] = []
+        node: int | None = task_id
+        while node is not None:
+            path.append(node)
+            node = self.parent(node)
+        path.reverse()
+        return path
+
+    def check_parent(self, task_id: int | None, parent_id: int | None) -> None:
+        """
+        Validates moving a task under `parent_id`.
+
+        Raises:
+            TaskCycleError: If the parent is the task itself or one of its descendants,
+                            or if the parent's ancestors already form a cycle.
+        """
+        if parent_id is None:
+            return
+        if task_id is None:
+            self.depth(parent_id)
+            return
+        if self.is_ancestor(task_id, parent_id):
+            raise TaskCycleError(f"Task {parent_id} can't be the parent of task {task_id}, "
+                                 f"it is the task itself or one of its subtasks")
+
+    def set_parent(self, task_id: int, parent_id: int | None) -> None:
+        """Records a checked parent assignment."""
+        self.parents[task_id] = parent_id
+        # Depths of the whole moved subtree change
+        self._depths.clear()
@@ -0,0 +1,69 @@
+import textwrap
+
+# Width of the description lines of /view
+DESCRIPTION_WIDTH = 100
+# Width the child names are padded to, so their progress bars line up
+NAME_WIDTH = 50
+# Progress of a completed record, in percent
+FULL_PROGRESS = 100
+
+
+def create_progress_bar(progress: float, total_length: int = 10, filled_char: str = "█",
+                        empty_char: str = "░") -> str:
+    """
+    Generates a text-based progress bar.
+
+    Args:
+        progress: A float representing the progress percentage (0.0 to 100.0).
+        total_length: The total length of the progress bar in characters.
+        filled_char: The character to use for the filled portion of the bar.
+        empty_char: The character to use for the empty portion of the bar.
+
+    Returns:
+        A string representing the progress bar.
+    Raises:
+        ValueError: If progress is not a float between 0 and 100.
+    """
+    if not isinstance(progress, (int, float)):
+        raise TypeError("Progress must be a number (int or float)")
+
+    if not 0 <= progress <= FULL_PROGRESS:
+        raise ValueError("Progress must be between 0 and 100")
+
+    filled_length = int(total_length * progress / FULL_PROGRESS)
+    bar = filled_char * filled_length + empty_char * (total_length - filled_length)
+    return bar
+
+
+def create_telegram_progress_bar(progress: float) -> str:
+    """
+    Creates a Telegram-friendly progress bar using Unicode characters.  Includes
+    percentage.
+
+    Args:
+        progress:  A float representing the progress (0.0 - 100.0)
+
+    Returns:
+        A string representing a Telegram-compatible progress bar
+    """
+    bar = create_progress_bar(progress, total_length=10)  # Adjust length as needed
+    percentage = f"{progress:.1f}%"  # Format percentage with one decimal place
+    return f"[{bar}] {percentage}"  # Combine bar and percentage
+
+
+def render_view(name: str, progress: float, description: str | None,
+                children: list[tuple[int, str, float]]) -> str:
+    """
+    Builds the /view message of a record.
+
+    Takes plain values only, so it can run in another process.
+
+    Args:
+        children: (depth, name, progress) of the subtasks in display order, depth 0 for direct children.
+    """
+    lines = [create_telegram_progress_bar(progress), name]
+    if description:
+        lines.extend(textwrap.wrap(description, width=DESCRIPTION_WIDTH))
+    lines.extend(f"{'    ' * (depth + 1)}{child_name:<{NAME_WIDTH}} {create_telegram_progress_bar(child_progress)}"
+                 for depth, child_name, child_progress in children)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,138 @@
+import csv
+import io
+import json
+from collections.abc import Iterable, Iterator
+from typing import Any, TextIO
+
+TASK_FIELDS = ("id", "parent_id", "name", "description", "completed", "weight")
+CSV_FIELDS = ("kind",) + TASK_FIELDS
+CHUNK_SIZE = 64 * 1024
+
+# ("workspace", fields) once, then ("task", fields) for every task, parents before children
+Record = tuple[str, dict[str, Any]]
+
+
+def iter_json_export(workspace: dict[str, Any], tasks: Iterable[dict[str, Any]]) -> Iterator[str]:
+    """
+    Serializes a workspace and its tasks as a JSON document, piece by piece.
+
+    The document looks like {"workspace": {...}, "tasks": [{...}, ...]},
+    one task per line.
+    """
+    yield '{"workspace": '
+    yield json.dumps({"name": workspace["name"], "description": workspace.get("description")}, ensure_ascii=False)
+    yield ', "tasks": ['
+    separator = "\n"
+    for task in tasks:
+        yield separator
+        yield json.dumps({field: task.get(field) for field in TASK_FIELDS}, ensure_ascii=False)
+        separator = ",\n"
+    yield "\n]}\n"
+
+
+def iter_csv_export(workspace: dict[str, Any], tasks: Iterable[dict[str, Any]]) -> Iterator[str]:
+    """
+    Serializes a workspace and its tasks as CSV, piece by piece.
+
+    The first row after the header describes the workspace ("kind" is "workspace"),
+    every other row is a task.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    writer.writerow({"kind": "workspace", "name": workspace["name"], "description": workspace.get("description")})
+    for task in tasks:
+        writer.writerow({"kind": "task", **{field: task.get(field) for field in TASK_FIELDS}})
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+class _JsonStream:
+    """Reads JSON values one at a time from a text stream without loading all of it."""
+    def __init__(self, stream: TextIO) -> None:
+        self.stream = stream
+        self.buffer = ""
+        self.position = 0
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        chunk = self.stream.read(CHUNK_SIZE)
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def peek(self) -> str:
+        """Returns the next non-whitespace character without consuming it."""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position].isspace():
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON document")
+
+    def expect(self, character: str) -> None:
+        if self.peek() != character:
+            raise ValueError(f"Expected {character!r} at {self.buffer[self.position:self.position + 20]!r}")
+        self.position += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number may continue in the next chunk
+            if end == len(self.buffer) and isinstance(value, (int, float)) and self._fill():
+                continue
+            self.position = end
+            return value
+
+
+def iter_json_import(stream: TextIO) -> Iterator[Record]:
+    """Reads a document written by `iter_json_export`, task by task."""
+    reader = _JsonStream(stream)
+    reader.expect("{")
+    while reader.peek() != "}":
+        key = reader.value()
+        reader.expect(":")
+        if key == "tasks":
+            reader.expect("[")
+            while reader.peek() != "]":
+                yield "task", reader.value()
+                if reader.peek() == ",":
+                    reader.expect(",")
+            reader.expect("]")
+        elif key == "workspace":
+            yield "workspace", reader.value()
+        else:
+            reader.value()
+        if reader.peek() == ",":
+            reader.expect(",")
+
+
+def _csv_value(value: str) -> Any:
+    return value if value != "" else None
+
+
+def iter_csv_import(stream: TextIO) -> Iterator[Record]:
+    """Reads a document written by `iter_csv_export`, row by row."""
+    for row in csv.DictReader(stream):
+        kind = row.pop("kind")
+        fields = {key: _csv_value(value) for key, value in row.items()}
+        if kind == "workspace":
+            fields = {"name": fields["name"], "description": fields["description"]}
+        else:
+            fields["id"] = int(fields["id"])
+            fields["parent_id"] = int(fields["parent_id"]) if fields["parent_id"] is not None else None
+            fields["completed"] = fields["completed"] == "True"
+            fields["weight"] = float(fields["weight"]) if fields["weight"] is not None else None
+        yield kind, fields
@@ -0,0 +1,111 @@
+"""
+Batched, resumable data backfills for large tables.
+
+Every batch runs in a transaction of its own, so a backfill never holds locks
+for longer than one batch, and its position is saved in `backfill_checkpoints`
+with the same commit, so a stopped backfill continues from the last batch.
+"""
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import Column, Connection, Integer, MetaData, String, Table, delete, insert, select, update
+
+checkpoint_metadata = MetaData()
+checkpoints = Table(
+    "backfill_checkpoints",
+    checkpoint_metadata,
+    Column("name", String(100), primary_key=True),
+    Column("last_key", String, nullable=True),
+    Column("done", Integer, nullable=False, default=0),
+)
+
+
+@dataclass(frozen=True)
+class BackfillProgress:
+    name: str
+    done: int
+    total: int | None
+
+    def __str__(self) -> str:
+        if self.total:
+            return f"{self.name}: {self.done}/{self.total} ({self.done / self.total:.0%})"
+        return f"{self.name}: {self.done}"
+
+
+Fetch = Callable[[Connection, str | None, int], Sequence[Any]]
+Apply = Callable[[Connection, Sequence[Any]], None]
+
+
+@dataclass(frozen=True)
+class Backfill:
+    """
+    A backfill that `run_backfill` runs batch by batch.
+
+    Attributes:
+        name: Identifies the backfill's checkpoint.
+        fetch: Returns the next batch of at most `batch_size` rows. It gets the key of
+               the last processed row (None at the start) and may either continue
+               after it or select rows that still need the backfill.
+        apply: Writes one batch.
+        batch_size: Rows per batch and transaction.
+        key: Key of a row that `fetch` can continue after, saved as a string.
+        total: Expected number of rows, only used for reporting.
+        pause: Seconds to sleep between batches, to leave the database to live traffic.
+    """
+    name: str
+    fetch: Fetch
+    apply: Apply
+    batch_size: int = 1000
+    key: Callable[[Any], Any] = lambda row: row[0]
+    total: int | None = None
+    pause: float = 0.0
+
+
+def run_backfill(connection: Connection,
+                 backfill: Backfill,
+                 report: Callable[[BackfillProgress], None] | None = None) -> int:
+    """
+    Runs a backfill batch by batch until its `fetch` returns no rows.
+
+    Args:
+        connection: Connection without an open transaction, committed after every batch.
+        report: Called after every batch.
+
+    Returns:
+        Number of rows processed by this call.
+    """
+    name = backfill.name
+    checkpoints.create(connection, checkfirst=True)
+    connection.commit()
+
+    state = connection.execute(
+        select(checkpoints.c.last_key, checkpoints.c.done).where(checkpoints.c.name == name)
+    ).first()
+    if state is None:
+        connection.execute(insert(checkpoints).values(name=name, last_key=None, done=0))
+        last_key, done = None, 0
+    else:
+        last_key, done = state
+    connection.commit()
+
+    processed = 0
+    while rows := backfill.fetch(connection, last_key, backfill.batch_size):
+        backfill.apply(connection, rows)
+        last_key = str(backfill.key(rows[-1]))
+        done += len(rows)
+        processed += len(rows)
+        connection.execute(update(checkpoints)
+                           .where(checkpoints.c.name == name)
+                           .values(last_key=last_key, done=done))
+        connection.commit()
+        if report is not None:
+            report(BackfillProgress(name, done, backfill.total))
+        if backfill.pause:
+            time.sleep(backfill.pause)
+
+    # Finished, a later run with the same name starts over
+    connection.execute(delete(checkpoints).where(checkpoints.c.name == name))
+    connection.commit()
+    return processed
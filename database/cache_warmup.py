@@ -0,0 +1,211 @@
+"""
+Preloads the cache entries of recently active users, so a restart or a Redis
+flush doesn't send every user's first request to SQL at once.
+
+Other workers may write while it runs. The entries of a model are only
+written while no invalidation of that model happened since their rows were
+read, and always with an expiry, so a value read before a write can't
+outlive it.
+
+Usage: python -m database.cache_warmup [users] [max keys] [max seconds]
+
+The limits default to the CACHE_WARM_UP_* settings.
+"""
+import json
+import logging
+import sys
+import time
+from collections.abc import Iterator, MutableMapping, Sequence
+from dataclasses import dataclass, replace
+from typing import Any
+
+from redis.exceptions import WatchError
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from core.models_sql_alchemy.models import Task, User, UserState, Workspace
+from database.database_manager import RedisDatabaseManager, SQLDatabaseManager, get_redis_manager, get_sql_manager
+from database.repositories.base_repository import cache_key, generation_key
+from resources.config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class WarmUpLimits:
+    users: int = 1000
+    max_keys: int = 10_000
+    max_seconds: float = 10.0
+    batch_size: int = 200
+    # Seconds the warmed entries live at most, also when cached results don't expire
+    ttl: int = 3600
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> 'WarmUpLimits':
+        return cls(users=settings.cache_warm_up_users,
+                   max_keys=settings.cache_warm_up_max_keys,
+                   max_seconds=settings.cache_warm_up_seconds,
+                   ttl=settings.cache_warm_up_ttl)
+
+
+@dataclass
+class WarmUpReport:
+    users: int = 0
+    keys: int = 0
+    # Entries not written, their model was invalidated after their rows were read
+    skipped: int = 0
+    progress_entries: int = 0
+    seconds: float = 0.0
+    # The key or time budget ran out before every selected user was loaded
+    truncated: bool = False
+
+    def __str__(self) -> str:
+        return (f"Warmed {self.keys} keys and {self.progress_entries} progress entries "
+                f"of {self.users} users in {self.seconds:.2f}s" + (" (budget reached)" if self.truncated else "")
+                + (f", skipped {self.skipped} keys written meanwhile" if self.skipped else ""))
+
+
+def recent_users(session: Session, limit: int) -> list[str]:
+    """
+    Usernames of the users who created tasks most recently, then of the others.
+
+    Ids grow with time, so the newest task of a user stands in for their last activity.
+    """
+    latest = func.max(Task.id)
+    return list(session.scalars(
+        select(User.username)
+        .outerjoin(Task, Task.owner_name == User.username)
+        .group_by(User.username)
+        .order_by(latest.desc().nulls_last(), User.username)
+        .limit(limit)
+    ))
+
+
+def _chunks(items: Sequence[str], size: int) -> Iterator[Sequence[str]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _load_entries(session: Session, usernames: Sequence[str]) -> tuple[dict[type, dict[str, Any]], list[int]]:
+    """Cache entries of `usernames` by model, read with one query per table, and the ids of their workspaces."""
+    entries: dict[type, dict[str, Any]] = {User: {}, UserState: {}, Workspace: {}}
+    for user in session.scalars(select(User).where(User.username.in_(usernames))):
+        entries[User][cache_key("get_by_id", User, user.username)] = user.to_dict()
+    for state in session.scalars(select(UserState).where(UserState.telegram_username.in_(usernames))):
+        entries[UserState][cache_key("get_by_id", UserState, state.telegram_username)] = state.to_dict()
+
+    workspaces: dict[str, list[dict[str, Any]]] = {username: [] for username in usernames}
+    for workspace in session.scalars(select(Workspace)
+                                     .where(Workspace.owner_name.in_(usernames))
+                                     .order_by(Workspace.id)):
+        workspaces[workspace.owner_name].append(workspace.to_dict())
+    workspace_ids = []
+    for username, owned in workspaces.items():
+        # The workspace list, and the lookups by name of /view
+        entries[Workspace][cache_key("get_by_custom_fields", Workspace, owner_name=username)] = owned
+        by_name: dict[str, list[dict[str, Any]]] = {}
+        for workspace in owned:
+            by_name.setdefault(workspace["name"], []).append(workspace)
+            workspace_ids.append(workspace["id"])
+        for name, named in by_name.items():
+            entries[Workspace][cache_key("get_by_custom_fields", Workspace, name=name, owner_name=username)] = named
+    return entries, workspace_ids
+
+
+def _generations(redis_conn: Any, models: Sequence[type]) -> list[Any]:
+    return redis_conn.mget([generation_key(model.__name__.lower()) for model in models])
+
+
+def _write_entries(redis_conn: Any,
+                   entries: dict[type, dict[str, Any]],
+                   generations: list[Any],
+                   ttl: int) -> int:
+    """
+    Sets the entries of the models whose generation is still `generations`, returns the number skipped.
+
+    The generations are WATCHed, so an invalidation between their check and the
+    writes drops the writes of the whole batch.
+    """
+    models = list(entries)
+    with redis_conn.pipeline() as pipeline:
+        try:
+            pipeline.watch(*(generation_key(model.__name__.lower()) for model in models))
+            current = _generations(pipeline, models)
+            pipeline.multi()
+            skipped = 0
+            for model, before, now in zip(models, generations, current):
+                if before != now:
+                    skipped += len(entries[model])
+                    continue
+                for key, value in entries[model].items():
+                    pipeline.set(key, json.dumps(value), ex=ttl, nx=True)
+            pipeline.execute()
+            return skipped
+        except WatchError:
+            return sum(len(model_entries) for model_entries in entries.values())
+
+
+def warm_up_cache(sql_manager: SQLDatabaseManager,
+                  redis_manager: RedisDatabaseManager,
+                  limits: WarmUpLimits = WarmUpLimits(),
+                  progress: MutableMapping[tuple[int, type], float] | None = None) -> WarmUpReport:
+    """
+    Writes the user, state and workspace entries of the most recently active users.
+
+    Users are handled in batches: one query per table, one pipelined Redis write.
+    Entries are only set where the key is missing, so values cached meanwhile win,
+    and are skipped when their model was invalidated since their rows were read.
+    They expire after `limits.ttl` seconds, or the cache's TTL when that is shorter.
+    Stops at the batch that reaches `limits.max_keys` or `limits.max_seconds`.
+
+    Args:
+        progress: If given, e.g. `Statics.COMPONENTS_PROGRESS` of the running bot,
+                  filled with the progress of the users' workspaces and tasks.
+    """
+    start = time.perf_counter()
+    report = WarmUpReport()
+    redis_conn = redis_manager.get_connection()
+    ttl = limits.ttl if redis_manager.cache_ttl is None else min(limits.ttl, redis_manager.cache_ttl)
+    models = [User, UserState, Workspace]
+    with sql_manager.get_session() as session:
+        usernames = recent_users(session, limits.users)
+    for chunk in _chunks(usernames, limits.batch_size):
+        if report.keys >= limits.max_keys or time.perf_counter() - start >= limits.max_seconds:
+            report.truncated = True
+            break
+        # Read before the rows, in a session of the batch, so a write the rows miss changes them
+        generations = _generations(redis_conn, models)
+        with sql_manager.get_session() as session:
+            entries, workspace_ids = _load_entries(session, chunk)
+            report.skipped += _write_entries(redis_conn, entries, generations, ttl)
+            report.users += len(chunk)
+            report.keys += sum(len(model_entries) for model_entries in entries.values())
+
+            if progress is not None and workspace_ids:
+                # Imported here, NumPy stays out of the bot's startup imports
+                from core.services.progress_engine import load_progress  # noqa: PLC0415
+                result = load_progress(session, workspace_ids)
+                progress.update(((task_id, Task), value)
+                                for task_id, value in zip(result.task_ids.tolist(), result.task_progress.tolist()))
+                progress.update(((workspace_id, Workspace), value)
+                                for workspace_id, value in zip(result.workspace_ids.tolist(),
+                                                               result.workspace_progress.tolist()))
+                report.progress_entries += len(result.task_ids) + len(result.workspace_ids)
+    report.seconds = time.perf_counter() - start
+    logger.info("%s", report)
+    return report
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    settings = get_settings()
+    limits = WarmUpLimits.from_settings(settings)
+    defaults = [limits.users, limits.max_keys, limits.max_seconds]
+    args = [float(arg) for arg in sys.argv[1:4]]
+    users, max_keys, max_seconds = args + defaults[len(args):]
+    limits = replace(limits, users=int(users), max_keys=int(max_keys), max_seconds=max_seconds)
+    print(warm_up_cache(get_sql_manager(), get_redis_manager(), limits))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,42 @@
+import itertools
+import time
+from collections.abc import Hashable, Sequence
+from typing import Any, TypedDict, Unpack
+
 import redis
-from sqlalchemy import create_engine
+from redis.client import Pipeline
+from sqlalchemy import Engine, create_engine
 from sqlalchemy.orm import Session, sessionmaker
 
 from core.models_sql_alchemy.models import Base
+from database.postgres import create_postgres_engine, is_postgres
+from resources.config import Settings, get_settings
+
+
+class PostgresOptions(TypedDict, total=False):
+    """Pool and prepared statement options of `create_postgres_engine`, ignored for other databases."""
+    pool_size: int
+    max_overflow: int
+    prepare_threshold: int | None
+
+
+class EngineOptions(PostgresOptions, total=False):
+    """
+    Keyword options of `SQLDatabaseManager`.
+
+    Attributes:
+        create_schema: Create missing tables from the models, for new and in-memory databases,
+                       True by default. Existing databases are upgraded with
+                       `python -m database.migrate` instead.
+        replica_urls: Read replicas of the database, read-only units of work read from
+                      them in turns, see `reads_from_replica`.
+        replica_sticky_seconds: How long the reads of a reader go to the primary after it
+                                committed a write, so it sees the write before the replicas do.
+                                5 seconds by default.
+    """
+    create_schema: bool
+    replica_urls: Sequence[str]
+    replica_sticky_seconds: float
 
 
 class SQLDatabaseManager:
@@ -10,21 +44,115 @@ class SQLDatabaseManager:
                  sql_string: str, echo: bool = True,
                  autocommit: bool = False,
                  autoflush: bool = False,
-                 expire_on_commit: bool = False):
-        self.engine = create_engine(sql_string, echo=echo) #"sqlite:///database/progresser.db"
-        Base.metadata.create_all(self.engine)
+                 expire_on_commit: bool = False,
+                 **options: Unpack[EngineOptions]):
+        """
+        Args:
+            options: Schema, replica and PostgreSQL options, see `EngineOptions`.
+        """
+        create_schema = options.pop("create_schema", True)
+        replica_urls = options.pop("replica_urls", ())
+        self.replica_sticky_seconds = options.pop("replica_sticky_seconds", 5.0)
+        # What is left are the PostgreSQL options
+        self.engine = self._create_engine(sql_string, echo, **options)
+        if create_schema:
+            Base.metadata.create_all(self.engine)
         self.SessionLocal = sessionmaker(autocommit=autocommit,
                                          autoflush=autoflush,
                                          bind=self.engine,
                                          expire_on_commit=expire_on_commit)
+        self.replica_engines = [self._create_engine(url, echo, **options) for url in replica_urls]
+        self._replica_sessions = itertools.cycle([
+            sessionmaker(autocommit=autocommit, autoflush=False, bind=engine, expire_on_commit=expire_on_commit)
+            for engine in self.replica_engines])
+        # Reader -> time of its last committed write, oldest first
+        self._last_writes: dict[Hashable, float] = {}
+
+    @staticmethod
+    def _create_engine(sql_string: str, echo: bool, **postgres_options: Unpack[PostgresOptions]) -> Engine:
+        if is_postgres(sql_string):
+            return create_postgres_engine(sql_string, echo=echo, **postgres_options)
+        return create_engine(sql_string, echo=echo) #"sqlite:///database/progresser.db"
+
+    @classmethod
+    def from_settings(cls, settings: Settings, **kwargs: Unpack[EngineOptions]) -> 'SQLDatabaseManager':
+        """Deployed databases are migrated before the bot starts, so no schema is created here by default."""
+        kwargs.setdefault("create_schema", False)
+        return cls(settings.database_url,
+                   echo=settings.db_echo,
+                   replica_urls=settings.database_replica_urls,
+                   replica_sticky_seconds=settings.replica_sticky_seconds,
+                   pool_size=settings.db_pool_size,
+                   max_overflow=settings.db_max_overflow,
+                   prepare_threshold=settings.db_prepare_threshold,
+                   **kwargs)
 
     def get_session(self) -> Session:
         return self.SessionLocal()
 
+    def get_replica_session(self) -> Session:
+        """Session of the next replica in turn, of the primary when there are no replicas."""
+        if not self.replica_engines:
+            return self.get_session()
+        return next(self._replica_sessions)()
+
+    def note_write(self, reader: Hashable | None) -> None:
+        """Sends the reads of `reader` to the primary for the sticky window, called once its write committed."""
+        if not self.replica_engines:
+            return
+        if reader is None:
+            return
+        now = time.monotonic()
+        # Re-inserted at the end, so the entries stay ordered by time and expired ones are dropped from the front
+        self._last_writes.pop(reader, None)
+        self._last_writes[reader] = now
+        while (oldest := next(iter(self._last_writes))) != reader:
+            if now - self._last_writes[oldest] < self.replica_sticky_seconds:
+                break
+            del self._last_writes[oldest]
+
+    def reads_from_replica(self, reader: Hashable | None) -> bool:
+        """
+        Whether the reads of `reader` may go to a replica.
+
+        Not within the sticky window after its last write, replicas apply writes
+        with some lag. Reads without a known reader always may.
+        """
+        if not self.replica_engines:
+            return False
+        written_at = self._last_writes.get(reader) if reader is not None else None
+        return written_at is None or time.monotonic() - written_at >= self.replica_sticky_seconds
+
+    def warm_up(self, connections: int = 1) -> None:
+        """Opens `connections` pooled connections per database at once, so first requests don't pay for connecting."""
+        opened = []
+        try:
+            for engine in [self.engine, *self.replica_engines]:
+                for _ in range(connections):
+                    connection = engine.connect()
+                    opened.append(connection)
+                    connection.exec_driver_sql("SELECT 1")
+        finally:
+            for connection in opened:
+                connection.close()
+
     def reset_database(self) -> None:
         Base.metadata.drop_all(self.engine)
         Base.metadata.create_all(self.engine)
 
+class RedisOptions(TypedDict, total=False):
+    """
+    Keyword options of `RedisDatabaseManager`.
+
+    Attributes:
+        cache_ttl: Seconds a cached query result lives, None (the default) keeps it until it is invalidated.
+        client: Client to use instead of connecting to `host`, e.g. an in-process fakeredis
+                one in benchmarks. It must decode responses.
+    """
+    cache_ttl: int | None
+    client: redis.Redis | None
+
+
 class RedisDatabaseManager:
     def __init__(self,
                  host : str ='localhost',
@@ -32,19 +160,85 @@ class RedisDatabaseManager:
                  db: int = 0,
                  username: str = 'default',
                  password: str = 'null',
+                 **options: Unpack[RedisOptions],
                  ):
+        """
+        Args:
+            options: Caching and client options, see `RedisOptions`.
+        """
+        self._username = username
+        self._password = password
+        self.cache_ttl = options.get("cache_ttl")
+        client = options.get("client")
+        if client is not None:
+            self._pool = client.connection_pool
+            self._client = client
+            return
         self._pool = redis.ConnectionPool(
             host=host,
             port=port,
             db=db,
             username=username,
-            password=password)
-        self._username = username
-        self._password = password
+            password=password,
+            # A client given a pool ignores its own connection options, decoding is set on the pool
+            decode_responses=True)
+        # Clients are thread-safe, connections are taken from the pool per command
+        self._client = redis.Redis(connection_pool=self._pool)
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> 'RedisDatabaseManager':
+        return cls(host=settings.redis_host,
+                   port=settings.redis_port,
+                   db=settings.redis_db,
+                   username=settings.redis_username,
+                   password=settings.redis_password,
+                   cache_ttl=settings.cache_ttl)
 
     def get_connection(self) -> redis.Redis:
-        """Get a Redis connection from the pool."""
-        return redis.Redis(
-            decode_responses=True,
-            connection_pool=self._pool,
-        )
+        """Get the Redis client of the manager, shared by all its users."""
+        return self._client
+
+    def pipeline(self) -> Pipeline:
+        """Commands queued on the pipeline are sent in one round trip by `execute()`."""
+        return self._client.pipeline(transaction=False)
+
+    def warm_up(self, connections: int = 1) -> None:
+        """Opens `connections` pooled connections at once and pings over each."""
+        opened = []
+        try:
+            for _ in range(connections):
+                connection = self._pool.get_connection()
+                opened.append(connection)
+                connection.send_command("PING")
+                connection.read_response()
+        finally:
+            for connection in opened:
+                self._pool.release(connection)
+
+
+# Managers of the process by class, missing ones are built from the settings
+_managers: dict[type, Any] = {}
+
+
+def get_sql_manager() -> SQLDatabaseManager:
+    """SQL manager of the process, built from the settings, shared so its pool is shared."""
+    if SQLDatabaseManager not in _managers:
+        _managers[SQLDatabaseManager] = SQLDatabaseManager.from_settings(get_settings())
+    return _managers[SQLDatabaseManager]
+
+
+def get_redis_manager() -> RedisDatabaseManager:
+    """Redis manager of the process, built from the settings, shared so its pool is shared."""
+    if RedisDatabaseManager not in _managers:
+        _managers[RedisDatabaseManager] = RedisDatabaseManager.from_settings(get_settings())
+    return _managers[RedisDatabaseManager]
+
+
+def use_managers(sql_manager: SQLDatabaseManager | None = None,
+                 redis_manager: RedisDatabaseManager | None = None) -> None:
+    """Makes `get_sql_manager` and `get_redis_manager` return these managers, None rebuilds from the settings."""
+    _managers.clear()
+    if sql_manager is not None:
+        _managers[SQLDatabaseManager] = sql_manager
+    if redis_manager is not None:
+        _managers[RedisDatabaseManager] = redis_manager
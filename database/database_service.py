@@ -0,0 +1,67 @@
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+from core.models_sql_alchemy.models import Base, Task, Workspace
+from database.database_manager import RedisDatabaseManager, SQLDatabaseManager, get_redis_manager, get_sql_manager
+from database.repositories.all_repositories import TaskRepository, UserRepository
+
+
+class DatabaseService:
+    """
+    The database as the bot uses it, one object over the user and task repositories.
+
+    Records are returned as dicts, like the repositories return them. Every call
+    joins the unit of work the caller runs in, see `database.unit_of_work`.
+    Without managers, the shared managers of the process are used.
+    """
+    def __init__(self,
+                 db_manager: SQLDatabaseManager | None = None,
+                 redis_db_manager: RedisDatabaseManager | None = None) -> None:
+        db_manager = db_manager or get_sql_manager()
+        redis_db_manager = redis_db_manager or get_redis_manager()
+        self.users = UserRepository(db_manager, redis_db_manager)
+        self.tasks = TaskRepository(db_manager, redis_db_manager)
+
+    def create_user(self, username: str) -> bool:
+        return self.users.create(username)
+
+    def set_state(self, telegram_username: str, state: str | None) -> bool:
+        return self.users.set_state(telegram_username, state)
+
+    def get_or_create_state(self, telegram_username: str) -> str | None:
+        return self.users.get_or_create_state(telegram_username)
+
+    def create(self, model: type[Base], values: dict[str, Any]) -> bool:
+        return self.tasks.create(model, **values)
+
+    def get_by_id(self, model: type[Base], item_id: str | int) -> dict[str, Any] | None:
+        return self.tasks.get_by_id(model, item_id)
+
+    def get_by_custom_field(self, model: type[Base], field_name: str, field_value: Any) -> dict[str, Any] | None:
+        """The first record with the value, read through `get_by_custom_fields`, whose cache writes invalidate"""
+        records = self.tasks.get_by_custom_fields(model, **{field_name: field_value})
+        return records[0] if records else None
+
+    def get_by_custom_fields(self, model: type[Base], **kwargs: Any) -> list[dict[str, Any]]:
+        return self.tasks.get_by_custom_fields(model, **kwargs)
+
+    def update(self, model: type[Base], item_id: str | int, values: dict[str, Any]) -> bool:
+        return self.tasks.update(model, item_id, **values)
+
+    def delete(self, model: type[Base], item_id: str | int) -> bool:
+        return self.tasks.delete(model, item_id)
+
+    def resolve_name_id(self, model: type[Base], owner_name: str, name: str) -> int | None:
+        return self.tasks.resolve_name_id(model, owner_name, name)
+
+    def create_tree(self, owner_name: str, rows: list[dict[str, Any]]) -> int:
+        return self.tasks.create_tree(owner_name, rows)
+
+    def import_tree(self, owner_name: str, records: Iterable[tuple[str, dict[str, Any]]]) -> tuple[str, int]:
+        return self.tasks.import_tree(owner_name, records)
+
+    def get_subtree(self, model: type[Task] | type[Workspace], record_id: int) -> list[dict[str, Any]]:
+        return self.tasks.get_subtree(model, record_id)
+
+    def iter_workspace_tree(self, workspace_id: int) -> Iterator[dict[str, Any]]:
+        return self.tasks.iter_workspace_tree(workspace_id)
@@ -0,0 +1,67 @@
+"""
+Applies the Alembic migrations in database/migrations.
+
+Usage: python -m database.migrate [database url] [revision]
+
+The database url defaults to DATABASE_URL from the settings.
+"""
+import logging
+import os
+import sys
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import Engine, create_engine, inspect
+
+from database.backfill import checkpoint_metadata
+from resources.config import get_settings
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+# Schema that databases created with Base.metadata.create_all before the migrations existed have at least
+BASELINE_REVISION = "0001"
+
+logger = logging.getLogger(__name__)
+
+
+def include_name(name: str | None, type_: str, parent_names: dict[str, str | None]) -> bool:
+    """Keeps autogenerate away from tables that aren't models, like the backfill checkpoints."""
+    return not (type_ == "table" and name in checkpoint_metadata.tables)
+
+
+def alembic_config(url: str | None = None) -> Config:
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS_DIR)
+    if url is not None:
+        # ConfigParser interpolation, a password may contain "%"
+        config.set_main_option("sqlalchemy.url", url.replace("%", "%%"))
+    return config
+
+
+def upgrade(engine: Engine, revision: str = "head") -> None:
+    """
+    Upgrades the database to `revision`.
+
+    A database that already has tables but was never migrated is stamped with
+    the baseline first; later revisions tolerate objects that create_all already made.
+    """
+    config = alembic_config()
+    with engine.connect() as connection:
+        config.attributes["connection"] = connection
+        tables = set(inspect(connection).get_table_names())
+        connection.commit()
+        if "alembic_version" not in tables and "tasks" in tables:
+            logger.info("Stamping unversioned database with %s", BASELINE_REVISION)
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, revision)
+        connection.commit()
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    args = sys.argv[1:]
+    engine = create_engine(args[0] if args else get_settings().database_url)
+    upgrade(engine, args[1] if len(args) > 1 else "head")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+from alembic import context
+from sqlalchemy import Connection, engine_from_config, pool
+
+from core.models_sql_alchemy.models import Base
+from database.migrate import include_name
+from resources.config import get_settings
+
+config = context.config
+target_metadata = Base.metadata
+
+
+def database_url() -> str:
+    return config.get_main_option("sqlalchemy.url") or get_settings().database_url
+
+
+def run_migrations_offline() -> None:
+    """Writes the SQL of the migrations instead of running them."""
+    context.configure(url=database_url(),
+                      target_metadata=target_metadata,
+                      include_name=include_name,
+                      literal_binds=True,
+                      render_as_batch=True,
+                      dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations(connection: Connection) -> None:
+    context.configure(connection=connection,
+                      target_metadata=target_metadata,
+                      include_name=include_name,
+                      render_as_batch=True,
+                      transaction_per_migration=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    # database.migrate passes a connection of its own
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        run_migrations(connection)
+        return
+    engine = engine_from_config({"sqlalchemy.url": database_url()}, prefix="sqlalchemy.", poolclass=pool.NullPool)
+    with engine.connect() as connection:
+        run_migrations(connection)
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
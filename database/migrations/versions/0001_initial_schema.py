@@ -0,0 +1,63 @@
+"""Initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0001"
+down_revision: str | Sequence[str] | None = None
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("username", sa.String(), nullable=False),
+        sa.Column("active", sa.Boolean(), nullable=False),
+        sa.Column("telegram_username", sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint("username"),
+    )
+    op.create_table(
+        "user_state",
+        sa.Column("telegram_username", sa.String(), nullable=False),
+        sa.Column("state", sa.String(length=50), nullable=True),
+        sa.ForeignKeyConstraint(["telegram_username"], ["users.telegram_username"]),
+        sa.PrimaryKeyConstraint("telegram_username"),
+    )
+    op.create_table(
+        "workspaces",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("description", sa.String(length=1000), nullable=True),
+        sa.Column("owner_name", sa.String(), nullable=False),
+        sa.ForeignKeyConstraint(["owner_name"], ["users.username"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "tasks",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("workspace_id", sa.Integer(), nullable=False),
+        sa.Column("parent_id", sa.Integer(), nullable=True),
+        sa.Column("name", sa.String(length=100), nullable=False),
+        sa.Column("description", sa.String(length=5000), nullable=True),
+        sa.Column("completed", sa.Boolean(), nullable=False),
+        sa.Column("weight", sa.Float(), nullable=False),
+        sa.Column("owner_name", sa.String(), nullable=False),
+        sa.ForeignKeyConstraint(["workspace_id"], ["workspaces.id"]),
+        sa.ForeignKeyConstraint(["parent_id"], ["tasks.id"]),
+        sa.ForeignKeyConstraint(["owner_name"], ["users.username"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("tasks")
+    op.drop_table("workspaces")
+    op.drop_table("user_state")
+    op.drop_table("users")
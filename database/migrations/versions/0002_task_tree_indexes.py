@@ -0,0 +1,25 @@
+"""Index tasks by workspace and parent
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+from collections.abc import Sequence
+
+from alembic import op
+
+revision: str = "0002"
+down_revision: str | Sequence[str] | None = "0001"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    # Databases created with create_all may already have them
+    op.create_index("ix_tasks_workspace_id", "tasks", ["workspace_id"], if_not_exists=True)
+    op.create_index("ix_tasks_parent_id", "tasks", ["parent_id"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_tasks_parent_id", table_name="tasks")
+    op.drop_index("ix_tasks_workspace_id", table_name="tasks")
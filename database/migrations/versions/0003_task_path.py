@@ -0,0 +1,36 @@
+"""Materialized task paths
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+import logging
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+from database.task_paths import backfill_paths
+
+revision: str = "0003"
+down_revision: str | Sequence[str] | None = "0002"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+logger = logging.getLogger(__name__)
+
+
+def upgrade() -> None:
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("tasks")}
+    if "path" not in columns:
+        op.add_column("tasks", sa.Column("path", sa.String(), nullable=True))
+    op.create_index("ix_tasks_path", "tasks", ["path"], if_not_exists=True)
+    # Commits the schema change, then fills the paths in batches on a connection of their own
+    with op.get_context().autocommit_block(), op.get_bind().engine.connect() as connection:
+        backfill_paths(connection, report=lambda progress: logger.info("%s", progress))
+
+
+def downgrade() -> None:
+    op.drop_index("ix_tasks_path", table_name="tasks")
+    with op.batch_alter_table("tasks") as batch_op:
+        batch_op.drop_column("path")
@@ -1,18 +1,361 @@
-from typing import Literal
+from collections.abc import Iterable, Iterator
+from typing import Any, Literal, cast
 
-from sqlalchemy import exc
+from pydantic import ValidationError
+from sqlalchemy import exc, insert, select, update
 
-from core.models_sql_alchemy.models import User, UserState
+from core.models_sql_alchemy.models import Task, User, UserState, Workspace
+from core.schemas_pydantic import schemas
+from core.services.task_tree import child_path, iter_levels, path_depth, path_ids, path_segment, subtree_bounds
+from database.postgres import allocate_ids, copy_rows
+from database.repositories import change_events
 from database.repositories.base_repository import BaseRepository
 
 
+def _imported_workspace(fields: Any) -> schemas.Workspace:
+    """The first record of an import, checked like the bot checks a new workspace."""
+    if not isinstance(fields, dict):
+        raise ValueError("Record 0 of the import isn't a workspace")
+    try:
+        return schemas.Workspace.model_validate({"name": fields.get("name"),
+                                                 "description": fields.get("description")})
+    except ValidationError as e:
+        raise ValueError(f"Record 0 of the import isn't a valid workspace:\n{e}") from e
+
+
+def _imported_task(index: int, kind: str, fields: Any, workspace_name: str) -> schemas.Task:
+    """A task record of an import, checked like the bot checks a new task."""
+    if kind != "task" or not isinstance(fields, dict):
+        raise ValueError(f"Record {index} of the import isn't a task")
+    if not isinstance(fields.get("id"), int) or not isinstance(fields.get("parent_id"), int | None):
+        raise ValueError(f"Record {index} of the import has no valid id or parent_id")
+    try:
+        return schemas.Task.model_validate({
+            "name": fields.get("name"),
+            "description": fields.get("description"),
+            "completed": fields.get("completed") or False,
+            "weight": fields["weight"] if fields.get("weight") is not None else 1,
+            "workspace_name": workspace_name,
+        })
+    except ValidationError as e:
+        raise ValueError(f"Record {index} of the import isn't a valid task:\n{e}") from e
+
+
 class UserRepository(BaseRepository):
     @BaseRepository.transaction_decorator
     def create(self, username: str) -> Literal[True]:
-        """Creates a new record in the database."""
+        """
+        Registers a user, an already registered user is left as it is.
+
+        Both rows are upserts, so two first messages of a new user don't race.
+        """
         try:
-            super().create(User, username=username, telegram_username=username)
-            super().create(UserState, telegram_username=username)
+            self.upsert(User, ["username"], {"username": username, "telegram_username": username})
+            self.upsert(UserState, ["telegram_username"], {"telegram_username": username})
             return True
         except exc.SQLAlchemyError as e:
             raise e
+
+    def set_state(self, telegram_username: str, state: str | None) -> Literal[True]:
+        """Sets the state of a user, creating the state row if it doesn't exist yet."""
+        self.upsert(UserState, ["telegram_username"], {"telegram_username": telegram_username, "state": state})
+        return True
+
+    def get_or_create_state(self, telegram_username: str) -> str | None:
+        """
+        Returns the state of a user, creating an empty one if there is none.
+
+        The state is read through the cache of `get_by_id`. Only a user without a
+        state row is written, with an upsert, so two first messages don't race.
+        """
+        if (record := self.get_by_id(UserState, telegram_username)) is not None:
+            return cast(str | None, record["state"])
+        return cast(str | None, self.upsert(UserState, ["telegram_username"],
+                                            {"telegram_username": telegram_username})["state"])
+
+
+class TaskRepository(BaseRepository):
+    @BaseRepository.transaction_decorator
+    def create_tree(self, owner_name: str, rows: list[dict[str, Any]]) -> int:
+        """
+        Creates many tasks in one transaction.
+
+        Workspaces are resolved with one query, existing parent tasks with one
+        query per workspace, parents created in the same batch are linked in memory.
+
+        Args:
+            owner_name: Owner of the workspaces and of the created tasks.
+            rows: Task fields plus "workspace_name" and either "parent_name"
+                  (existing task) or "parent_index" (position of a parent in `rows`).
+
+        Returns:
+            Number of created tasks.
+
+        Raises:
+            SQLAlchemyError: If a workspace or parent task doesn't exist.
+        """
+        session = self._ensure_session()
+        workspace_names = {row["workspace_name"] for row in rows}
+        workspace_ids = dict(session.execute(
+            select(Workspace.name, Workspace.id)
+            .where(Workspace.owner_name == owner_name, Workspace.name.in_(workspace_names))
+            .order_by(Workspace.id.desc())
+        ).all())
+        if missing := workspace_names - workspace_ids.keys():
+            raise exc.SQLAlchemyError(
+                f"Parent record with Name {', '.join(sorted(missing))} in {Workspace.__name__} doesn't exist")
+
+        parent_ids, parent_paths = self._existing_parents(owner_name, rows, workspace_ids)
+
+        created: list[Task] = []
+        for row in rows:
+            workspace_id = workspace_ids[row["workspace_name"]]
+            task = Task(name=row["name"],
+                        description=row.get("description"),
+                        completed=row.get("completed", False),
+                        weight=row.get("weight", 1),
+                        owner_name=owner_name,
+                        workspace_id=workspace_id)
+            if row.get("parent_index") is not None:
+                task.parent_task = created[row["parent_index"]]
+            elif parent_name := row.get("parent_name"):
+                if (workspace_id, parent_name) not in parent_ids:
+                    raise exc.SQLAlchemyError(
+                        f"Parent record with Name {parent_name} in {Task.__name__} doesn't exist")
+                task.parent_id = parent_ids[(workspace_id, parent_name)]
+            created.append(task)
+
+        session.add_all(created)
+        session.flush()
+        # Parents come before their children, so their paths are already set
+        for task in created:
+            if task.parent_task is not None:
+                task.path = child_path(task.parent_task.path, task.id)
+            elif task.parent_id is not None:
+                task.path = child_path(parent_paths[task.parent_id], task.id)
+            else:
+                task.path = path_segment(task.id)
+        self._invalidate_caches(Task.__name__.lower(), "get_all", "get_by_custom_fields")
+        for task in created:
+            change = change_events.created(Task, task.id, task.to_dict(),
+                                           self._ancestor_ids(task.path, task.parent_id))
+            self._changed(lambda change=change: change)
+        return len(created)
+
+    def _existing_parents(self, owner_name: str, rows: list[dict[str, Any]], workspace_ids: dict[str, int]
+                          ) -> tuple[dict[tuple[int, str], int], dict[int, str | None]]:
+        """Ids by workspace id and name, and paths by id, of the existing parents `create_tree` rows name."""
+        parent_names: dict[int, set[str]] = {}
+        for row in rows:
+            if row.get("parent_name") and row.get("parent_index") is None:
+                parent_names.setdefault(workspace_ids[row["workspace_name"]], set()).add(row["parent_name"])
+        parent_ids: dict[tuple[int, str], int] = {}
+        parent_paths: dict[int, str | None] = {}
+        for workspace_id, names in parent_names.items():
+            found = self._ensure_session().execute(
+                select(Task.name, Task.id, Task.path)
+                .where(Task.workspace_id == workspace_id, Task.owner_name == owner_name, Task.name.in_(names))
+                .order_by(Task.id.desc())
+            ).all()
+            parent_ids.update(((workspace_id, name), task_id) for name, task_id, _ in found)
+            parent_paths.update((task_id, path) for _, task_id, path in found)
+        return parent_ids, parent_paths
+
+    def iter_workspace_tree(self, workspace_id: int, chunk_size: int = 1000) -> Iterator[dict[str, Any]]:
+        """
+        Yields the tasks of a workspace level by level, parents before their children.
+
+        Only the ids of the tasks are kept in memory, rows are read in
+        chunks of `chunk_size` with a session of its own.
+        """
+        columns = list(Task.__table__.columns)
+        with self.db_manager.get_session() as session:
+            def rows(query: Any) -> Iterator[dict[str, Any]]:
+                return (dict(row) for row in session.execute(
+                    query.order_by(Task.id).execution_options(yield_per=chunk_size)).mappings())
+
+            def children(ids: list[int]) -> Iterator[dict[str, Any]]:
+                for start in range(0, len(ids), chunk_size):
+                    yield from rows(select(*columns).where(Task.parent_id.in_(ids[start:start + chunk_size])))
+
+            roots = rows(select(*columns).where(Task.workspace_id == workspace_id, Task.parent_id.is_(None)))
+            yield from iter_levels(roots, children, key=lambda row: row["id"])
+
+    def _path_of(self, task_id: int) -> str:
+        path = self._ensure_session().scalar(select(Task.path).where(Task.id == task_id))
+        if path is None:
+            raise exc.SQLAlchemyError(f"Record with Id {task_id} in {Task.__name__} doesn't exist or has no path yet")
+        return path
+
+    @BaseRepository.transaction_decorator
+    def get_descendants(self, task_id: int) -> list[dict[str, Any]]:
+        """
+        Returns every task below a task, each parent before its children.
+
+        Uses one range scan of the path index, whatever the depth of the subtree.
+        """
+        low, high = subtree_bounds(self._path_of(task_id))
+        result = self._ensure_session().execute(
+            select(Task).where(Task.path > low, Task.path < high).order_by(Task.path)
+        ).scalars()
+        return [x.to_dict() for x in result]
+
+    @BaseRepository.transaction_decorator
+    def get_subtree(self, model: type[Task] | type[Workspace], record_id: int) -> list[dict[str, Any]]:
+        """
+        Returns the tasks of a workspace, or a task with every task below it, ordered by id.
+
+        A workspace's tasks are read through its workspace_id, a task's with one
+        range scan of the path index, both in one query whatever the depth.
+        """
+        query = select(Task).order_by(Task.id)
+        if model is Workspace:
+            query = query.where(Task.workspace_id == record_id)
+        else:
+            low, high = subtree_bounds(self._path_of(record_id))
+            query = query.where(Task.path >= low, Task.path < high)
+        return [x.to_dict() for x in self._ensure_session().execute(query).scalars()]
+
+    @BaseRepository.transaction_decorator
+    def get_ancestors(self, task_id: int) -> list[dict[str, Any]]:
+        """Returns the ancestors of a task, from the top level task down to its parent."""
+        ancestor_ids = path_ids(self._path_of(task_id))[:-1]
+        result = self._ensure_session().execute(select(Task).where(Task.id.in_(ancestor_ids))).scalars()
+        by_id = {x.id: x.to_dict() for x in result}
+        return [by_id[ancestor_id] for ancestor_id in ancestor_ids if ancestor_id in by_id]
+
+    @BaseRepository.transaction_decorator
+    def get_depth(self, task_id: int) -> int:
+        """Returns the number of ancestors of a task, 0 for top level tasks."""
+        return path_depth(self._path_of(task_id))
+
+    @BaseRepository.transaction_decorator
+    def subtree_progress(self, task_id: int) -> float:
+        """Computes the progress of a task from its subtree, read with one range scan of the path index."""
+        # NumPy is only needed here, it isn't worth importing at startup
+        from core.services.progress_engine import NO_PARENT, compute_progress  # noqa: PLC0415
+
+        low, high = subtree_bounds(self._path_of(task_id))
+        rows = self._ensure_session().execute(
+            select(Task.id, Task.parent_id, Task.weight, Task.completed)
+            .where(Task.path >= low, Task.path < high)
+        ).all()
+        result = compute_progress(
+            [row[0] for row in rows],
+            [NO_PARENT if row[0] == task_id or row[1] is None else row[1] for row in rows],
+            [0] * len(rows),
+            [1.0 if row[2] is None else row[2] for row in rows],
+            [bool(row[3]) for row in rows],
+        )
+        return result.task(task_id)
+
+    def _insert_tasks(self, rows: list[dict[str, Any]], parent_paths: list[str | None]) -> list[tuple[int, str]]:
+        """
+        Inserts task rows with the same keys, returns the (id, path) of every row.
+
+        On PostgreSQL the ids are taken from the sequence first, so the rows are
+        loaded with their paths by one COPY. Elsewhere they are inserted with
+        RETURNING, and the paths, which end with the new ids, are written afterwards.
+        """
+        session = self._ensure_session()
+        connection = session.connection()
+        if connection.dialect.name == "postgresql":
+            ids = allocate_ids(connection, Task.__table__, len(rows))
+        else:
+            ids = list(session.scalars(insert(Task).returning(Task.id, sort_by_parameter_order=True), rows))
+        paths = [(parent_path or "") + path_segment(task_id) for parent_path, task_id in zip(parent_paths, ids)]
+
+        if connection.dialect.name == "postgresql":
+            copy_rows(connection, Task.__table__, [*rows[0], "id", "path"],
+                      ([*row.values(), task_id, path] for row, task_id, path in zip(rows, ids, paths)))
+        else:
+            session.execute(update(Task), [{"id": task_id, "path": path} for task_id, path in zip(ids, paths)])
+        return list(zip(ids, paths))
+
+    @BaseRepository.transaction_decorator
+    def import_tree(self,
+                    owner_name: str,
+                    records: Iterable[tuple[str, dict[str, Any]]],
+                    batch_size: int = 1000) -> tuple[str, int]:
+        """
+        Creates a workspace with all of its tasks from exported records in one transaction.
+
+        Tasks are inserted in batches, the exported ids are only used to link
+        children to their parents and are mapped to the new ids in memory.
+
+        Args:
+            owner_name: Owner of the created workspace and tasks.
+            records: ("workspace", fields) first, then ("task", fields) with
+                     every parent before its children.
+            batch_size: Number of tasks per INSERT statement.
+
+        Returns:
+            Name of the created workspace and number of created tasks.
+
+        Raises:
+            SQLAlchemyError: If the workspace already exists or a parent is missing.
+            ValueError: If a record isn't a valid workspace or task, with the record's index.
+        """
+        session = self._ensure_session()
+        records = iter(records)
+        kind, fields = next(records, ("", {}))
+        if kind != "workspace":
+            raise exc.SQLAlchemyError("Import has to start with a workspace")
+        workspace = _imported_workspace(fields)
+        if session.scalar(select(Workspace.id)
+                          .where(Workspace.owner_name == owner_name, Workspace.name == workspace.name)):
+            raise exc.SQLAlchemyError(f"Record with Name {workspace.name} in {Workspace.__name__} already exists")
+        workspace_record = Workspace(name=workspace.name,
+                                     description=workspace.description,
+                                     owner_name=owner_name)
+        session.add(workspace_record)
+        session.flush()
+
+        new_ids: dict[int, int] = {}
+        new_paths: dict[int, str] = {}
+        batch: list[dict[str, Any]] = []
+        batch_old_ids: dict[int, int | None] = {}
+
+        def flush_batch() -> None:
+            parent_paths = [new_paths[old_parent_id] if old_parent_id is not None else None
+                            for old_parent_id in batch_old_ids.values()]
+            for old_id, (new_id, path) in zip(batch_old_ids, self._insert_tasks(batch, parent_paths)):
+                new_ids[old_id] = new_id
+                new_paths[old_id] = path
+            batch.clear()
+            batch_old_ids.clear()
+
+        count = 0
+        for index, (kind, fields) in enumerate(records, start=1):
+            task = _imported_task(index, kind, fields, workspace.name)
+            task_id, parent_id = fields["id"], fields.get("parent_id")
+            if parent_id in batch_old_ids:
+                # The parent needs its new id before the child can reference it
+                flush_batch()
+            if task_id in new_ids or task_id in batch_old_ids:
+                raise exc.SQLAlchemyError(f"Record with Id {task_id} in {Task.__name__} is repeated")
+            if parent_id is not None and parent_id not in new_ids:
+                raise exc.SQLAlchemyError(f"Parent record with Id {parent_id} in {Task.__name__} doesn't exist")
+            batch.append({"name": task.name,
+                          "description": task.description,
+                          "completed": task.completed,
+                          "weight": task.weight,
+                          "owner_name": owner_name,
+                          "workspace_id": workspace_record.id,
+                          "parent_id": new_ids[parent_id] if parent_id is not None else None})
+            batch_old_ids[task_id] = parent_id
+            count += 1
+            if len(batch) >= batch_size:
+                flush_batch()
+        if batch:
+            flush_batch()
+
+        self._invalidate_caches(Workspace.__name__.lower(), "get_all", "get_by_custom_fields")
+        self._invalidate_caches(Task.__name__.lower(), "get_all", "get_by_custom_fields")
+        workspace_change = change_events.created(Workspace, workspace_record.id, workspace_record.to_dict())
+        # The imported tasks are one change, they are only ever read back through their workspace and owner
+        tasks_change = change_events.created(Task, None, {"owner_name": owner_name,
+                                                          "workspace_id": workspace_record.id})
+        self._changed(lambda: workspace_change)
+        self._changed(lambda: tasks_change)
+        return workspace_record.name, count
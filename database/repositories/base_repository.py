@@ -1,18 +1,80 @@
 import json
+from collections import Counter
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import AbstractContextManager
 from functools import wraps
-from typing import Any, Callable, Literal, TypeVar, cast, get_type_hints
+from importlib import import_module
+from typing import Any, Literal, TypeVar, cast, get_type_hints
 
-from sqlalchemy import exc, select
+from redis.client import Pipeline
+from sqlalchemy import String, exc, func, literal, select, update
 from sqlalchemy import inspect as sqlalchemy_inspect
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
-from core.models_sql_alchemy.models import Base
+from core.models_sql_alchemy.models import Base, Task
+from core.services.task_tree import AncestorIndex, child_path, path_ids, path_segment, subtree_bounds
 from database.database_manager import RedisDatabaseManager, SQLDatabaseManager
+from database.repositories import change_events
+from database.repositories.change_events import CacheRegion, Change, NameIndexRegion
+from database.repositories.name_index import NameIndex
+from database.unit_of_work import UnitOfWork, current_unit, unit_of_work
 
 T = TypeVar('T', bound=Base)
 F = TypeVar('F', bound=Callable[..., Any])
 
+# Dialects with INSERT ... ON CONFLICT, their modules are imported once a database of theirs is used
+UPSERT_DIALECTS = ("postgresql", "sqlite")
+# Ids per IN list and MGET, well below the bound parameter limits of SQLite and PostgreSQL
+IN_CHUNK_SIZE = 500
+# Model name, cache names and record id of a pending `BaseRepository._invalidate_caches`
+Invalidation = tuple[str, tuple[str, ...], str | int | None]
+
+
+def _chunks(items: Sequence[Any], size: int) -> Iterator[Sequence[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def cache_key(func_name: str, model: type, item_id: str | int | None = None, **kwargs: Any) -> str:
+    """Redis key of a result cached by `BaseRepository.caching`."""
+    key = f"{func_name}:{model.__name__.lower()}"
+    if item_id:
+        key += f':item_id:{item_id}'
+    for name, value in kwargs.items():
+        key += f":{name}:{value}"
+    return key
+
+
+def generation_key(model_name: str) -> str:
+    """Redis counter bumped by every invalidation of the cached results of a model, e.g. "workspace"."""
+    return f"cache_generation:{model_name}"
+
+
+class CacheStats:
+    """Hits and misses of the cached repository methods in this process."""
+    def __init__(self) -> None:
+        self.hits: Counter[str] = Counter()
+        self.misses: Counter[str] = Counter()
+
+    def hit(self, name: str, count: int = 1) -> None:
+        self.hits[name] += count
+
+    def miss(self, name: str, count: int = 1) -> None:
+        self.misses[name] += count
+
+    def miss_rate(self) -> float:
+        lookups = self.hits.total() + self.misses.total()
+        return self.misses.total() / lookups if lookups else 0.0
+
+    def reset(self) -> None:
+        self.hits.clear()
+        self.misses.clear()
+
+
+cache_stats = CacheStats()
+
+
 class BaseRepository:
     """
     Repository that initialized basic database operations(CRUD)
@@ -20,21 +82,79 @@ class BaseRepository:
     """
     def __init__(self, db_manager: SQLDatabaseManager, redis_db_manager: RedisDatabaseManager):
         self.db_manager = db_manager
-        self._session: Session | None = None
         self.redis_db_manager = redis_db_manager
+        self.name_index = NameIndex(redis_db_manager)
+        # Stores of this repository kept up to date by its change events, next to the registered ones
+        self.regions: list[CacheRegion] = [NameIndexRegion(self.name_index)]
 
-    def transaction(self) -> '_TransactionHelper':
-        """Use this when you need multi-operation transactions"""
-        return self._TransactionHelper(self)
+    def transaction(self, read_only: bool = False) -> AbstractContextManager['BaseRepository']:
+        """
+        Use this when you need multi-operation transactions.
+
+        Joins the unit of work the caller already runs in, see `database.unit_of_work`.
+        A read-only transaction never flushes or commits and refuses writes.
+        """
+        return self._TransactionHelper(self, read_only)
+
+    def _unit(self) -> UnitOfWork | None:
+        return current_unit(self.db_manager)
 
     def get_session(self) -> Session | None:
         """Return the current session"""
-        return self._session
+        unit = self._unit()
+        return unit.session if unit is not None else None
 
     def _ensure_session(self) -> Session:
-        if self._session is None:
+        return self._ensure_unit().session
+
+    def _on_commit(self, callback: Callable[[], None]) -> None:
+        """Runs callback after the current transaction is committed, drops it on rollback"""
+        self._ensure_unit().on_commit(callback)
+
+    def _changed(self, build: Callable[[], Change | None]) -> None:
+        """
+        Publishes the change returned by `build` to the cache regions once the current unit is committed.
+
+        The changes of a unit are built after its commit, when created records
+        have their ids, and published together, see `change_events.publish`.
+        """
+        state = self._ensure_unit().state
+        if "changes" not in state:
+            pending: list[Callable[[], Change | None]] = []
+            state["changes"] = pending
+            regions = [*self.regions, *change_events.registered_regions()]
+            self._on_commit(lambda: change_events.publish(
+                [change for change in (build() for build in pending) if change is not None], regions))
+        cast(list[Callable[[], Change | None]], state["changes"]).append(build)
+
+    def _ancestor_ids(self, path: str | None, parent_id: int | None) -> list[int]:
+        """Ids of the tasks above a task, from its path or, when that isn't known yet, its parent links"""
+        if path is not None:
+            return path_ids(path)[:-1]
+        return self._ancestors().path(parent_id) if parent_id is not None else []
+
+    def _ensure_unit(self) -> UnitOfWork:
+        unit = self._unit()
+        if unit is None:
             raise RuntimeError("Session is not available")
-        return self._session
+        return unit
+
+    def _ancestors(self) -> AncestorIndex:
+        """Task parent links of the current transaction, loaded on demand"""
+        state = self._ensure_unit().state
+        if "ancestors" not in state:
+            state["ancestors"] = AncestorIndex(self._load_ancestors)
+        return cast(AncestorIndex, state["ancestors"])
+
+    def _load_ancestors(self, task_id: int) -> list[tuple[int, int | None]]:
+        # UNION rather than UNION ALL, so a cycle already stored ends the recursion
+        ancestors = (select(Task.id, Task.parent_id)
+                     .where(Task.id == task_id)
+                     .cte("ancestors", recursive=True))
+        ancestors = ancestors.union(
+            select(Task.id, Task.parent_id).join(ancestors, Task.id == ancestors.c.parent_id))
+        rows = self._ensure_session().execute(select(ancestors.c.id, ancestors.c.parent_id)).all()
+        return [(row[0], row[1]) for row in rows]
 
     @staticmethod
     def transaction_decorator(func: F) -> F:
@@ -44,10 +164,8 @@ class BaseRepository:
         """
         @wraps(func)
         def wrapper(self: 'BaseRepository', model: type[Base], *args: Any, **kwargs: Any) -> Any:
-            if self.get_session() is None:
+            if self._unit() is None:
                 with self.transaction():
-                    session = self.get_session()
-                    assert session is not None
                     return func(self, model, *args, **kwargs)
             else:
                 return func(self, model, *args, **kwargs)
@@ -64,46 +182,45 @@ class BaseRepository:
                 model: type,
                 item_id: str | int | None = None,
                 **kwargs: Any) -> Any:
-            key = f"{func.__name__}:{model.__name__.lower()}"
-            if item_id:
-                key += f':item_id:{item_id}'
-            for name, value in kwargs.items():
-                key += f":{name}:{value}"
+            key = cache_key(func.__name__, model, item_id, **kwargs)
 
             redis_conn = self.redis_db_manager.get_connection()
-            if redis_conn.exists(key):
-                return json.loads(redis_conn.get(key))
-
-            if item_id:
-                result = func(self, model, item_id, **kwargs)
-            else:
-                result = func(self, model, **kwargs)
-            redis_conn.set(key,json.dumps(result))
+            # A cached None is stored as "null", so a missing key is the only None reply. A unit that
+            # wrote reads past the cache, its invalidations only run once it is committed
+            unit = self._unit()
+            if (unit is None or not unit.dirty) and (cached := redis_conn.get(key)) is not None:
+                cache_stats.hit(func.__name__)
+                return json.loads(cached)
+            cache_stats.miss(func.__name__)
+
+            args = (model, item_id) if item_id else (model,)
+            # Joins the caller's unit of work, the result is shared, so it is read from the primary
+            with self.transaction(read_only=True), self._ensure_unit().primary_reads():
+                result = func(self, *args, **kwargs)
+                cacheable = self._results_cacheable()
+            if cacheable:
+                redis_conn.set(key, json.dumps(result), ex=self.redis_db_manager.cache_ttl)
             return result
         return cast(F, wrapper)
 
+    def _results_cacheable(self) -> bool:
+        """Whether results read in the current unit may be shared through the cache, not once it wrote"""
+        return not self._ensure_unit().dirty
+
     class _TransactionHelper:
-        def __init__(self, repository: 'BaseRepository') -> None:
+        def __init__(self, repository: 'BaseRepository', read_only: bool = False) -> None:
             self.repository = repository
+            self._scope = unit_of_work(repository.db_manager, read_only)
 
         def __enter__(self) -> 'BaseRepository':
-            # Start a new session if none exists
-            if self.repository._session is None:
-                self.repository._session = self.repository.db_manager.get_session()
+            self._scope.__enter__()
             return self.repository
 
         def __exit__(self,
                      exc_type: type[BaseException] | None,
                      exc_val: BaseException | None,
                      exc_tb: Any | None) -> None:
-            session = self.repository._ensure_session()
-
-            if exc_type is None:
-                session.commit()
-            else:
-                session.rollback()
-            session.close()
-            self.repository._session = None
+            self._scope.__exit__(exc_type, exc_val, exc_tb)
 
     def _invalidate_caches(
             self,
@@ -111,24 +228,69 @@ class BaseRepository:
             *cache_names: str,
             item_id: str | int | None = None
     ) -> None:
-        for name in cache_names:
-            func = getattr(self, f"_{name}_cache_invalidation")
-            func(model, item_id) if name == "get_by_id" else func(model)
+        """
+        Drops the cached results of `cache_names` for `model` once the current unit is committed.
+
+        Before the commit a reader that misses the cache would read, and cache
+        again, the rows the unit is replacing. The invalidations of a unit are
+        sent together after its commit, without a unit they are sent at once.
+        """
+        invalidation = (model, cache_names, item_id)
+        unit = self._unit()
+        if unit is None:
+            self._drop_cached([invalidation])
+            return
+        unit.written()
+        # Repositories of the unit may cache in different Redis databases
+        state_key = ("invalidations", self.redis_db_manager)
+        if state_key not in unit.state:
+            pending: list[Invalidation] = []
+            unit.state[state_key] = pending
+            unit.on_commit(lambda: self._drop_cached(pending))
+        cast(list[Invalidation], unit.state[state_key]).append(invalidation)
+
+    def _drop_cached(self, invalidations: Sequence[Invalidation]) -> None:
+        """
+        Drops the cached results of the invalidations in one pipeline.
+
+        Key patterns are matched, and the models' generations bumped, in the
+        same round trip, the matched keys are deleted in a second one.
+        """
+        pipeline = self.redis_db_manager.pipeline()
+        for model, cache_names, item_id in invalidations:
+            pipeline.incr(generation_key(model))
+            for name in cache_names:
+                func = getattr(self, f"_{name}_cache_invalidation")
+                func(pipeline, model, item_id) if name == "get_by_id" else func(pipeline, model)
+        # Replies of KEYS are lists, those of DEL counts
+        matched = [key for reply in pipeline.execute() if isinstance(reply, list) for key in reply]
+        if matched:
+            self.redis_db_manager.get_connection().delete(*matched)
 
     @transaction_decorator
     def create(self, model: type[Base], **kwargs: Any) -> Literal[True]:
         """Creates a new record in the database."""
         try:
+            if model is Task and kwargs.get("id") is not None:
+                # Only a task with a chosen id can already have subtasks that would close a cycle
+                self._ancestors().check_parent(kwargs["id"], kwargs.get("parent_id"))
             instance = model(**kwargs)
             self._ensure_session().add(instance)
+            ancestor_ids: list[int] = []
+            if model is Task:
+                # The path ends with the task's own id
+                self._ensure_session().flush()
+                instance.path = self._task_path(instance.parent_id, instance.id)
+                ancestor_ids = self._ancestor_ids(instance.path, instance.parent_id)
             self._invalidate_caches(model.__name__.lower(), "get_all", "get_by_custom_fields")
+            self._changed(lambda: change_events.created(model, sqlalchemy_inspect(instance).identity[0],
+                                                        instance.to_dict(), ancestor_ids))
             return True
         except exc.SQLAlchemyError as e:
             raise e
 
-    def _get_by_id_cache_invalidation(self, model: str, item_id: str | int) -> None:
-        redis_conn = self.redis_db_manager.get_connection()
-        redis_conn.delete(f"get_by_id:{model}:item_id:{item_id}")
+    def _get_by_id_cache_invalidation(self, pipeline: Pipeline, model: str, item_id: str | int) -> None:
+        pipeline.delete(f"get_by_id:{model}:item_id:{item_id}")
 
     @caching
     @transaction_decorator
@@ -142,6 +304,63 @@ class BaseRepository:
         except exc.SQLAlchemyError as e:
             raise e
 
+    @transaction_decorator
+    def get_many_by_id(self,
+                       model: type[T],
+                       item_ids: Sequence[str | int],
+                       chunk_size: int = IN_CHUNK_SIZE) -> list[dict[str, Any] | None]:
+        """
+        Retrieves records by their primary keys, sharing the cache of `get_by_id`.
+
+        Cached records are read with one pipeline of MGETs, the others with one
+        `IN` query per `chunk_size` ids, and cached in one pipeline. Ids without
+        a record are cached as None, like `get_by_id` does.
+
+        Returns:
+            The records in the order of `item_ids`, None for ids without a record.
+        """
+        try:
+            # Repeated ids are looked up once
+            unique_ids = list({str(item_id): item_id for item_id in item_ids}.values())
+            store = self._results_cacheable()
+            # Like `caching`, a unit that wrote reads past the cache
+            cached: list[Any] = [None] * len(unique_ids)
+            if store:
+                pipeline = self.redis_db_manager.pipeline()
+                for chunk in _chunks(unique_ids, chunk_size):
+                    pipeline.mget([cache_key("get_by_id", model, item_id) for item_id in chunk])
+                cached = [value for reply in pipeline.execute() for value in reply]
+
+            results: dict[str, dict[str, Any] | None] = {}
+            missing = []
+            for item_id, value in zip(unique_ids, cached):
+                if value is None:
+                    missing.append(item_id)
+                else:
+                    results[str(item_id)] = json.loads(value)
+            cache_stats.hit("get_many_by_id", len(results))
+            cache_stats.miss("get_many_by_id", len(missing))
+
+            if missing:
+                primary_key = sqlalchemy_inspect(model).primary_key[0]
+                found: dict[str, dict[str, Any]] = {}
+                with self._ensure_unit().primary_reads():
+                    for chunk in _chunks(missing, chunk_size):
+                        found.update((str(getattr(record, primary_key.key)), record.to_dict())
+                                     for record in self._ensure_session().scalars(
+                                         select(model).where(primary_key.in_(chunk))))
+                pipeline = self.redis_db_manager.pipeline()
+                for item_id in missing:
+                    results[str(item_id)] = found.get(str(item_id))
+                    if store:
+                        pipeline.set(cache_key("get_by_id", model, item_id), json.dumps(results[str(item_id)]),
+                                     ex=self.redis_db_manager.cache_ttl)
+                if store:
+                    pipeline.execute()
+            return [results[str(item_id)] for item_id in item_ids]
+        except exc.SQLAlchemyError as e:
+            raise e
+
     @caching
     @transaction_decorator
     def get_by_custom_field(self,
@@ -183,11 +402,8 @@ class BaseRepository:
         except exc.SQLAlchemyError as e:
             raise e
 
-    def _get_by_custom_fields_cache_invalidation(self, model: str) -> None:
-        redis_conn = self.redis_db_manager.get_connection()
-        keys_to_del_bin = redis_conn.keys(f"get_by_custom_fields:{model}*")
-        if len(keys_to_del_bin):
-            redis_conn.delete(*keys_to_del_bin)
+    def _get_by_custom_fields_cache_invalidation(self, pipeline: Pipeline, model: str) -> None:
+        pipeline.keys(f"get_by_custom_fields:{model}*")
 
     @caching
     @transaction_decorator
@@ -227,19 +443,107 @@ class BaseRepository:
         try:
             instance = self._ensure_session().get(model, item_id)
             if instance:
+                before = instance.to_dict()
+                if model is Task and "parent_id" in data:
+                    self._ancestors().check_parent(instance.id, data["parent_id"])
+                    self._move_subtree(instance, data["parent_id"])
                 for key, value in data.items():
                     if hasattr(instance, key) and key in get_type_hints(model):
                         setattr(instance, key, value)
+                if model is Task and "parent_id" in data:
+                    self._ancestors().set_parent(instance.id, data["parent_id"])
+                after = instance.to_dict()
+                # A moved task leaves the progress of its former ancestors as well
+                ancestor_ids = ([*self._ancestor_ids(before["path"], before["parent_id"]),
+                                 *self._ancestor_ids(after["path"], after["parent_id"])]
+                                if model is Task else [])
                 self._invalidate_caches(
                     model.__name__.lower(),
                     "get_all", "get_by_custom_fields", "get_by_id",
                     item_id=item_id
                 )
+                change = change_events.updated(model, item_id, before, after, ancestor_ids)
+                self._changed(lambda: change)
                 return True
             return False
         except exc.SQLAlchemyError as e:
             raise e
 
+    @transaction_decorator
+    def upsert(self, model: type[Base], conflict_keys: Sequence[str], values: dict[str, Any]) -> dict[str, Any]:
+        """
+        Inserts a record or, if one with the same `conflict_keys` exists, updates it with `values`.
+
+        A single INSERT ... ON CONFLICT statement, so concurrent callers can't both
+        insert. When `values` holds only the conflict keys the existing record is
+        kept as it is, which makes this a get-or-create.
+
+        Returns:
+            The record as stored after the statement.
+
+        Raises:
+            SQLAlchemyError: If the database has no ON CONFLICT support here.
+        """
+        try:
+            session = self._ensure_session()
+            dialect = session.connection().dialect.name
+            if dialect not in UPSERT_DIALECTS:
+                raise exc.SQLAlchemyError(f"Upsert isn't supported on {dialect}")
+            statement = import_module(f"sqlalchemy.dialects.{dialect}").insert(model).values(**values)
+            # Setting a key to itself is a no-op update, unlike DO NOTHING it still returns the row
+            updated = [key for key in values if key not in conflict_keys] or list(conflict_keys)
+            statement = statement.on_conflict_do_update(
+                index_elements=list(conflict_keys),
+                set_={key: statement.excluded[key] for key in updated},
+            ).returning(model)
+            instance = session.scalars(statement, execution_options={"populate_existing": True}).one()
+            item_id = sqlalchemy_inspect(instance).identity[0]
+            self._invalidate_caches(
+                model.__name__.lower(),
+                "get_all", "get_by_custom_fields", "get_by_id",
+                item_id=item_id
+            )
+            result = instance.to_dict()
+            # Whether the record was inserted or updated isn't known, nor what it held before
+            change = change_events.updated(model, item_id, None, result)
+            self._changed(lambda: change)
+            return result
+        except exc.SQLAlchemyError as e:
+            raise e
+
+    def _task_path(self, parent_id: int | None, task_id: int) -> str | None:
+        if parent_id is None:
+            return path_segment(task_id)
+        parent = self._ensure_session().get(Task, parent_id)
+        return child_path(parent.path if parent else None, task_id)
+
+    def _move_subtree(self, instance: Task, parent_id: int | None) -> None:
+        """Rewrites the paths of a task and all of its subtasks with one UPDATE"""
+        new_path = self._task_path(parent_id, instance.id)
+        old_path = instance.path
+        if old_path is not None and old_path != new_path:
+            low, high = subtree_bounds(old_path)
+            # Without the new parent's path the subtree is left to the path backfill
+            moved_path = (literal(new_path, String) + func.substr(Task.path, len(old_path) + 1)
+                          if new_path is not None else None)
+            self._ensure_session().execute(
+                update(Task)
+                .where(Task.path >= low, Task.path < high)
+                .values(path=moved_path)
+                .execution_options(synchronize_session="fetch"))
+        instance.path = new_path
+
+    @transaction_decorator
+    def resolve_name_id(self, model: type[Base], owner_name: str, name: str) -> int | None:
+        """
+        Returns the id of the owner's workspace or task with the given name.
+
+        Served from the name index without touching SQL once the owner's index is loaded,
+        which is loaded from the primary.
+        """
+        with self._ensure_unit().primary_reads():
+            return self.name_index.resolve(self._ensure_session(), model, owner_name, name)
+
     @transaction_decorator
     def delete(self, model: type[Base], item_id: str | int) -> bool:
         """Deletes a record from the database."""
@@ -247,20 +551,25 @@ class BaseRepository:
             session = self._ensure_session()
             instance = session.get(model, item_id)
             if instance:
+                before = instance.to_dict()
+                ancestor_ids = self._ancestor_ids(before["path"], before["parent_id"]) if model is Task else []
                 session.delete(instance)
+                # Deletes cascade to tasks, so cached parent links may point to removed ones
+                self._ensure_unit().state.pop("ancestors", None)
                 self._invalidate_caches(
                     model.__name__.lower(),
                     "get_all", "get_by_custom_fields", "get_by_id",
                     item_id=item_id
                 )
+                change = change_events.deleted(model, item_id, before, ancestor_ids)
+                self._changed(lambda: change)
                 return True
             return False
         except exc.SQLAlchemyError as e:
             raise e
 
-    def _get_all_cache_invalidation(self, model: str) -> None:
-        redis_conn = self.redis_db_manager.get_connection()
-        redis_conn.delete(f"get_all:{model}")
+    def _get_all_cache_invalidation(self, pipeline: Pipeline, model: str) -> None:
+        pipeline.delete(f"get_all:{model}")
 
     @caching
     @transaction_decorator
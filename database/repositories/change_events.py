@@ -0,0 +1,186 @@
+"""
+Change events of repository writes and the cache regions that depend on them.
+
+Every write of a repository records a `Change`: the model, the id, the changed
+columns, the values before and after and, for tasks, the ids of the tasks above
+it. Once the unit of work commits, its changes are published in one call to each
+`CacheRegion` that depends on any of them. The region then drops only the entries
+those records feed into. Completing a task drops the progress of the task, its
+ancestors and its workspace. Renaming a task doesn't drop that progress. Rolled
+back units publish nothing.
+
+Repositories keep the regions of their own stores, e.g. the name index.
+Caches of a process, e.g. `Statics.COMPONENTS_PROGRESS` of the bot, subscribe
+to the changes of every repository with `register_region`.
+"""
+from abc import ABC, abstractmethod
+from collections.abc import Iterable, Mapping, MutableMapping, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from core.models_sql_alchemy.models import Base, Task, User, Workspace
+from database.repositories.name_index import NameIndex
+
+CREATED, UPDATED, DELETED = "created", "updated", "deleted"
+
+# Columns the progress of a task and of everything above it is computed from
+PROGRESS_FIELDS = frozenset({"completed", "weight", "parent_id", "workspace_id"})
+# Columns shown by /view, which renders a record with the names and progress of its subtasks
+VIEW_FIELDS = PROGRESS_FIELDS | {"name", "description"}
+
+
+@dataclass(frozen=True)
+class Change:
+    """
+    A record written by a repository.
+
+    Attributes:
+        kind: CREATED, UPDATED or DELETED.
+        item_id: Primary key of the record, None for many records written at once,
+                 e.g. the tasks of an import, described by the columns they share in `after`.
+        fields: Names of the changed columns, all of them for created and deleted records.
+        before: Column values before the write, None for created records and upserts.
+        after: Column values after the write, None for deleted records.
+        ancestor_ids: Tasks above a changed task, both before and after a move.
+    """
+    model: type[Base]
+    kind: str
+    item_id: Any
+    fields: frozenset[str]
+    before: Mapping[str, Any] | None = None
+    after: Mapping[str, Any] | None = None
+    ancestor_ids: tuple[int, ...] = ()
+
+    def values(self, name: str) -> list[Any]:
+        """Distinct values of a column before and after the write, without None"""
+        values = []
+        for snapshot in (self.before, self.after):
+            value = snapshot.get(name) if snapshot is not None else None
+            if value is not None and value not in values:
+                values.append(value)
+        return values
+
+
+def created(model: type[Base], item_id: Any, after: Mapping[str, Any], ancestor_ids: Iterable[int] = ()) -> Change:
+    return Change(model, CREATED, item_id, frozenset(after), after=after, ancestor_ids=tuple(ancestor_ids))
+
+
+def updated(model: type[Base], item_id: Any, before: Mapping[str, Any] | None, after: Mapping[str, Any],
+            ancestor_ids: Iterable[int] = ()) -> Change | None:
+    """The change of an updated record, None when no column changed"""
+    fields = frozenset(after) if before is None else frozenset(
+        name for name, value in after.items() if before.get(name) != value)
+    if not fields:
+        return None
+    return Change(model, UPDATED, item_id, fields, before=before, after=after,
+                  ancestor_ids=tuple(dict.fromkeys(ancestor_ids)))
+
+
+def deleted(model: type[Base], item_id: Any, before: Mapping[str, Any], ancestor_ids: Iterable[int] = ()) -> Change:
+    return Change(model, DELETED, item_id, frozenset(before), before=before, ancestor_ids=tuple(ancestor_ids))
+
+
+class CacheRegion(ABC):
+    """
+    Cached entries that depend on the records of some models.
+
+    A region gets the changes of the models it lists. Updates only reach it
+    when they change one of `fields`, or any column when `fields` is None.
+    """
+    models: tuple[type[Base], ...] = ()
+    fields: frozenset[str] | None = None
+
+    def depends_on(self, change: Change) -> bool:
+        return change.model in self.models and (
+            self.fields is None or change.kind != UPDATED or not self.fields.isdisjoint(change.fields))
+
+    @abstractmethod
+    def invalidate(self, changes: Sequence[Change]) -> None:
+        """Drops the entries of the committed changes, all of which the region depends on"""
+
+
+class SubtreeEntries(CacheRegion):
+    """
+    Entries of tasks and workspaces keyed by (id, model), each computed from the record's whole subtree.
+
+    Examples are progress and rendered views. A change of a task drops the entries
+    of the task, of every task above it and of its workspace. Counts invalidations
+    in `generation`, so a value computed across an await is stored only if
+    nothing changed in the meantime.
+    """
+    models = (Task, Workspace)
+
+    def __init__(self, entries: MutableMapping[tuple[Any, type], Any], fields: Iterable[str]) -> None:
+        self.entries = entries
+        self.fields = frozenset(fields)
+        self.generation = 0
+
+    def invalidate(self, changes: Sequence[Change]) -> None:
+        self.generation += 1
+        for change in changes:
+            if change.item_id is not None:
+                self.entries.pop((change.item_id, change.model), None)
+            if change.model is Task:
+                for task_id in change.ancestor_ids:
+                    self.entries.pop((task_id, Task), None)
+                for workspace_id in change.values("workspace_id"):
+                    self.entries.pop((workspace_id, Workspace), None)
+
+
+class NameIndexRegion(CacheRegion):
+    """Keeps the owners' name indexes up to date on creates, renames and deletes, see `NameIndex`."""
+    models = (User, *NameIndex.TRACKED)
+    fields = frozenset({"name", "owner_name"})
+
+    def __init__(self, name_index: NameIndex) -> None:
+        self.name_index = name_index
+
+    def invalidate(self, changes: Sequence[Change]) -> None:
+        for change in changes:
+            if change.model is User:
+                if change.kind == DELETED:
+                    assert change.before is not None
+                    self.name_index.forget_owner(change.before["username"], *NameIndex.TRACKED)
+                continue
+            if change.item_id is None:
+                # Many records at once, the owner's index is loaded again on its next lookup
+                for owner_name in change.values("owner_name"):
+                    self.name_index.forget_owner(owner_name, change.model)
+                continue
+            if change.kind == DELETED:
+                assert change.before is not None
+                owner_name = change.before["owner_name"]
+                # Deleting a record cascades to its tasks, so the owner's task index is dropped
+                if change.model is Workspace:
+                    self.name_index.remove(Workspace, owner_name, change.before["name"], change.item_id)
+                self.name_index.forget_owner(owner_name, Task)
+                continue
+            if change.before is not None:
+                self.name_index.remove(change.model, change.before["owner_name"], change.before["name"],
+                                       change.item_id)
+            if change.after is not None:
+                self.name_index.add(change.model, change.after["owner_name"], change.after["name"], change.item_id)
+
+
+_regions: dict[str, CacheRegion] = {}
+
+
+def register_region(name: str, region: CacheRegion) -> None:
+    """Subscribes a region to the changes of every repository in this process, replacing one of the same name"""
+    _regions[name] = region
+
+
+def unregister_region(name: str) -> None:
+    _regions.pop(name, None)
+
+
+def registered_regions() -> list[CacheRegion]:
+    return list(_regions.values())
+
+
+def publish(changes: Sequence[Change], regions: Iterable[CacheRegion]) -> None:
+    """Passes each region the changes it depends on, in one call"""
+    for region in regions:
+        relevant = [change for change in changes if region.depends_on(change)]
+        if relevant:
+            region.invalidate(relevant)
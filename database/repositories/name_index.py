@@ -0,0 +1,111 @@
+from typing import Any
+
+from redis.exceptions import WatchError
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from core.models_sql_alchemy.models import Base, Task, Workspace
+from database.database_manager import RedisDatabaseManager
+
+
+class NameIndex:
+    """
+    Per-owner name -> id index of workspaces and tasks kept in Redis hashes.
+
+    Every owner has one hash per model. It is filled with a single query the
+    first time a name of that owner is resolved and is then kept up to date on
+    create/rename/delete, so unrelated writes never drop it.
+    When several records share a name, the one with the lowest id is indexed.
+
+    Every change of an owner's names bumps a version next to the hash. A load
+    only replaces the hash, in one MULTI/EXEC, while the version it read before
+    its query is still current, so a name changed meanwhile is never lost.
+    """
+    TRACKED: tuple[type[Base], ...] = (Workspace, Task)
+    LOADED_FIELD = "loaded"
+
+    def __init__(self, redis_db_manager: RedisDatabaseManager):
+        self.redis_db_manager = redis_db_manager
+
+    @staticmethod
+    def key(model: type[Base], owner_name: str) -> str:
+        return f"name_index:{model.__name__.lower()}:{owner_name}"
+
+    @classmethod
+    def version_key(cls, model: type[Base], owner_name: str) -> str:
+        return f"{cls.key(model, owner_name)}:version"
+
+    @staticmethod
+    def _field(name: str) -> str:
+        # Prefixed so that no name can clash with LOADED_FIELD
+        return f"name:{name}"
+
+    def resolve(self, session: Session, model: type[Base], owner_name: str, name: str) -> int | None:
+        """Returns the id of the record named `name`, or None if the owner has none."""
+        redis_conn = self.redis_db_manager.get_connection()
+        key = self.key(model, owner_name)
+        item_id, loaded = redis_conn.hmget(key, [self._field(name), self.LOADED_FIELD])
+        if item_id is not None:
+            return int(item_id)
+        if loaded:
+            return None
+        return self._load(session, model, owner_name).get(name)
+
+    def _load(self, session: Session, model: type[Base], owner_name: str) -> dict[str, int]:
+        redis_conn = self.redis_db_manager.get_connection()
+        key, version_key = self.key(model, owner_name), self.version_key(model, owner_name)
+        version = redis_conn.get(version_key)
+        rows = session.execute(
+            select(model.name, model.id)
+            .where(model.owner_name == owner_name)
+            .order_by(model.id.desc())
+        ).all()
+        # Descending order, so the lowest id of a repeated name is the one kept
+        ids = dict(rows)
+        mapping: dict[str, Any] = {self._field(name): item_id for name, item_id in ids.items()}
+        mapping[self.LOADED_FIELD] = 1
+        with redis_conn.pipeline() as pipeline:
+            try:
+                pipeline.watch(version_key)
+                if pipeline.get(version_key) == version:
+                    pipeline.multi()
+                    pipeline.delete(key)
+                    pipeline.hset(key, mapping=mapping)
+                    pipeline.execute()
+            except WatchError:
+                # A name changed while the rows were read, the next lookup loads again
+                pass
+        return ids
+
+    def add(self, model: type[Base], owner_name: str, name: str, item_id: int) -> None:
+        """Indexes a new name, unless the owner's index isn't loaded or the name is already taken."""
+        key = self.key(model, owner_name)
+        pipeline = self.redis_db_manager.pipeline()
+        pipeline.incr(self.version_key(model, owner_name))
+        pipeline.hexists(key, self.LOADED_FIELD)
+        _, loaded = pipeline.execute()
+        if loaded:
+            self.redis_db_manager.get_connection().hsetnx(key, self._field(name), item_id)
+
+    def remove(self, model: type[Base], owner_name: str, name: str, item_id: int) -> None:
+        """
+        Drops a name that no longer points to `item_id`.
+
+        Another record with the same name may exist, so the owner's index is
+        reloaded on the next lookup instead of guessing which one it is.
+        """
+        key = self.key(model, owner_name)
+        pipeline = self.redis_db_manager.pipeline()
+        pipeline.incr(self.version_key(model, owner_name))
+        pipeline.hget(key, self._field(name))
+        _, indexed_id = pipeline.execute()
+        if indexed_id is not None and int(indexed_id) == int(item_id):
+            self.redis_db_manager.get_connection().delete(key)
+
+    def forget_owner(self, owner_name: str, *models: type[Base]) -> None:
+        """Drops the owner's indexes of `models` in one round trip, used after writes that touch many records at once."""
+        pipeline = self.redis_db_manager.pipeline()
+        pipeline.delete(*(self.key(model, owner_name) for model in models))
+        for model in models:
+            pipeline.incr(self.version_key(model, owner_name))
+        pipeline.execute()
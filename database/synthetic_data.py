@@ -0,0 +1,298 @@
+"""
+Deterministic synthetic populations for benchmarks and load tests.
+
+Generates registered users, workspaces per user and task trees per workspace
+from the distributions of a `Population` and bulk inserts them into any
+configured database. The same population and seed always give the same rows,
+with ids following the ones already in the database.
+
+Usage: python -m database.synthetic_data [database url] [--users 1000] [--workspaces 1-3] [--tasks 50-500]
+                                         [--depth 1-6] [--branching 1-4] [--completed 0.5] [--seed 0]
+
+The database url defaults to DATABASE_URL from the settings, a new SQLite file
+gets the schema from the models. E.g. about a million tasks:
+    python -m database.synthetic_data sqlite:///bench.db --users 2000 --workspaces 1-3 --tasks 100-400
+"""
+import argparse
+import logging
+import random
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field
+from typing import Any
+
+from sqlalchemy import Connection, Engine, Table, create_engine, event, func, insert, select
+
+from core.models_sql_alchemy.models import Base, Task, User, UserState, Workspace
+from core.services.task_tree import path_segment
+from database.postgres import allocate_ids, copy_rows, create_postgres_engine, is_postgres
+from resources.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Rows per INSERT or COPY, and per reported step
+BATCH_SIZE = 20_000
+TASK_COLUMNS = ("id", "workspace_id", "parent_id", "path", "name", "description", "completed", "weight",
+                "owner_name")
+
+Range = tuple[int, int]
+
+
+@dataclass(frozen=True)
+class Population:
+    """
+    Shape of a generated population, ranges are inclusive and drawn from uniformly.
+
+    Attributes:
+        users: Registered users, each with a user state.
+        workspaces_per_user: Workspaces owned by every user.
+        tasks_per_workspace: Tasks in every workspace, split into as many trees as it takes.
+        depth: Levels of every tree, a single root task is 1.
+        branching: Children of every task above the bottom level of its tree.
+        weights: Task weight -> relative frequency.
+        completion_ratio: Chance of every task to be completed.
+        description_ratio: Chance of every task to have a description.
+        prefix: Start of the generated usernames, keeps them apart from real ones.
+    """
+    users: int = 100
+    workspaces_per_user: Range = (1, 3)
+    tasks_per_workspace: Range = (10, 100)
+    depth: Range = (1, 5)
+    branching: Range = (1, 4)
+    weights: dict[float, float] = field(default_factory=lambda: {1.0: 0.7, 2.0: 0.2, 5.0: 0.1})
+    completion_ratio: float = 0.5
+    description_ratio: float = 0.3
+    seed: int = 0
+    prefix: str = "synthetic"
+
+    def __post_init__(self) -> None:
+        for name in ("workspaces_per_user", "tasks_per_workspace", "depth", "branching"):
+            low, high = getattr(self, name)
+            if not 0 <= low <= high:
+                raise ValueError(f"{name} must be a range 0 <= low <= high, got {low}-{high}")
+        if self.depth[0] < 1 or self.branching[0] < 1:
+            raise ValueError("Trees need a depth and branching of at least 1")
+        if not self.weights or min(self.weights.values()) < 0:
+            raise ValueError("weights must map weights to non-negative frequencies")
+        for name in ("completion_ratio", "description_ratio"):
+            if not 0 <= getattr(self, name) <= 1:
+                raise ValueError(f"{name} must be between 0 and 1")
+
+
+@dataclass
+class GenerationReport:
+    users: int = 0
+    workspaces: int = 0
+    tasks: int = 0
+    seconds: float = 0.0
+
+    def __str__(self) -> str:
+        rate = f", {self.tasks / self.seconds:,.0f} tasks/s" if self.seconds else ""
+        return (f"Generated {self.users} users, {self.workspaces} workspaces and {self.tasks} tasks "
+                f"in {self.seconds:.1f}s{rate}")
+
+
+class _Ids:
+    """Consecutive ids of a table, taken from its sequence on PostgreSQL so later inserts don't collide."""
+
+    def __init__(self, connection: Connection, table: Table):
+        self._connection = connection
+        self._table = table
+        self._postgres = connection.dialect.name == "postgresql"
+        self._next = 0 if self._postgres else (connection.scalar(select(func.max(table.c.id))) or 0) + 1
+
+    def take(self, count: int) -> Sequence[int]:
+        if self._postgres:
+            return allocate_ids(self._connection, self._table, count)
+        ids = range(self._next, self._next + count)
+        self._next += count
+        return ids
+
+
+def _load(connection: Connection, table: Table, columns: Sequence[str], rows: list[tuple[Any, ...]]) -> None:
+    if not rows:
+        return
+    if connection.dialect.name == "postgresql":
+        copy_rows(connection, table, columns, rows)
+    else:
+        connection.execute(insert(table), [dict(zip(columns, row)) for row in rows])
+
+
+def _full_tree_size(depth: int, branching: Range) -> int:
+    """Tasks of a tree of `depth` levels with the average branching, what a tree is cut to at most."""
+    average = sum(branching) / 2
+    return max(1, round(sum(average ** level for level in range(depth))))
+
+
+def _tree_shape(rng: random.Random, size: int, depth: int, branching: Range) -> list[int]:
+    """
+    Parent positions of the tasks of a tree of at most `size` tasks, -1 for the root.
+
+    Levels are filled one after another with a random number of children per
+    task, so every parent comes before its children and a tree reaches its
+    depth before it runs out of tasks.
+    """
+    parents = [-1]
+    level = [0]
+    for _ in range(depth - 1):
+        next_level = []
+        for parent in level:
+            for _ in range(rng.randint(*branching)):
+                if len(parents) == size:
+                    return parents
+                next_level.append(len(parents))
+                parents.append(parent)
+        level = next_level
+    return parents
+
+
+def _tree_rows(rng: random.Random, population: Population, tree: tuple[int, str, list[int]],
+               ids: Sequence[int]) -> list[tuple[Any, ...]]:
+    workspace_id, owner_name, parents = tree
+    weights = rng.choices(list(population.weights), list(population.weights.values()), k=len(parents))
+    completion, description = population.completion_ratio, population.description_ratio
+    random_ = rng.random
+    paths: list[str] = []
+    rows = []
+    for task_id, parent, weight in zip(ids, parents, weights):
+        path = (paths[parent] if parent >= 0 else "") + path_segment(task_id)
+        paths.append(path)
+        rows.append((task_id, workspace_id, ids[parent] if parent >= 0 else None, path, f"Task {task_id}",
+                     f"Generated task {task_id}" if random_() < description else None,
+                     random_() < completion, weight, owner_name))
+    return rows
+
+
+def generate(connection: Connection,
+             population: Population,
+             batch_size: int = BATCH_SIZE,
+             report: Callable[[GenerationReport], None] | None = None) -> GenerationReport:
+    """
+    Inserts a population, committing after every batch of tasks.
+
+    Users and workspaces go in first, then the tasks of every workspace tree by
+    tree. Ids are consecutive after the largest existing one (taken from the
+    sequences on PostgreSQL), and rows are loaded with executemany INSERTs, or
+    COPY on PostgreSQL.
+
+    Args:
+        connection: Connection without an open transaction.
+        report: Called after every committed batch of tasks with the counts so far.
+
+    Returns:
+        Counts of the inserted rows.
+    """
+    start = time.perf_counter()
+    rng = random.Random(population.seed)
+    result = GenerationReport()
+
+    usernames = [f"{population.prefix}{index}" for index in range(population.users)]
+    _load(connection, User.__table__, ("username", "telegram_username", "active"),
+          [(username, username, True) for username in usernames])
+    _load(connection, UserState.__table__, ("telegram_username", "state"),
+          [(username, None) for username in usernames])
+    result.users = len(usernames)
+
+    owners = [username for username in usernames for _ in range(rng.randint(*population.workspaces_per_user))]
+    workspace_ids = _Ids(connection, Workspace.__table__).take(len(owners))
+    _load(connection, Workspace.__table__, ("id", "name", "description", "owner_name"),
+          [(workspace_id, f"Workspace {workspace_id}", None, owner)
+           for workspace_id, owner in zip(workspace_ids, owners)])
+    result.workspaces = len(owners)
+    connection.commit()
+
+    task_ids = _Ids(connection, Task.__table__)
+    # Values are drawn apart from the tree shapes, task by task at insert time,
+    # so the batch size doesn't change the generated rows
+    values_rng = random.Random(f"{population.seed}:values")
+    trees: list[tuple[int, str, list[int]]] = []
+    pending = 0
+
+    def flush() -> None:
+        nonlocal pending
+        ids = task_ids.take(pending)
+        rows: list[tuple[Any, ...]] = []
+        for tree in trees:
+            rows += _tree_rows(values_rng, population, tree, ids[len(rows):len(rows) + len(tree[2])])
+        _load(connection, Task.__table__, TASK_COLUMNS, rows)
+        connection.commit()
+        result.tasks += len(rows)
+        trees.clear()
+        pending = 0
+        if report is not None:
+            result.seconds = time.perf_counter() - start
+            report(result)
+
+    for workspace_id, owner in zip(workspace_ids, owners):
+        budget = rng.randint(*population.tasks_per_workspace)
+        while budget > 0:
+            depth = rng.randint(*population.depth)
+            parents = _tree_shape(rng, min(_full_tree_size(depth, population.branching), budget), depth,
+                                  population.branching)
+            budget -= len(parents)
+            trees.append((workspace_id, owner, parents))
+            pending += len(parents)
+            if pending >= batch_size:
+                flush()
+    if trees:
+        flush()
+
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def _fast_sqlite_load(engine: Engine) -> None:
+    """A generated database can be generated again, so SQLite skips syncing to disk while loading."""
+    @event.listens_for(engine, "connect")
+    def configure(dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA synchronous = OFF")
+        cursor.execute("PRAGMA journal_mode = MEMORY")
+        cursor.close()
+
+
+def _range(value: str) -> Range:
+    low, _, high = value.partition("-")
+    return int(low), int(high or low)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Inserts a deterministic synthetic population")
+    parser.add_argument("url", nargs="?", help="database url, DATABASE_URL from the settings by default")
+    parser.add_argument("--users", type=int, default=Population.users)
+    parser.add_argument("--workspaces", type=_range, default=Population.workspaces_per_user,
+                        help="workspaces per user, e.g. 1-3")
+    parser.add_argument("--tasks", type=_range, default=Population.tasks_per_workspace,
+                        help="tasks per workspace, e.g. 50-500")
+    parser.add_argument("--depth", type=_range, default=Population.depth, help="levels per tree, e.g. 1-6")
+    parser.add_argument("--branching", type=_range, default=Population.branching, help="children per task, e.g. 1-4")
+    parser.add_argument("--completed", type=float, default=Population.completion_ratio,
+                        help="share of completed tasks")
+    parser.add_argument("--seed", type=int, default=Population.seed)
+    parser.add_argument("--prefix", default=Population.prefix, help="start of the generated usernames")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    population = Population(users=args.users, workspaces_per_user=args.workspaces, tasks_per_workspace=args.tasks,
+                            depth=args.depth, branching=args.branching, completion_ratio=args.completed,
+                            seed=args.seed, prefix=args.prefix)
+    url = args.url or get_settings().database_url
+    if is_postgres(url):
+        engine = create_postgres_engine(url)
+    else:
+        engine = create_engine(url)
+        if engine.dialect.name == "sqlite":
+            _fast_sqlite_load(engine)
+        Base.metadata.create_all(engine)
+    try:
+        with engine.connect() as connection:
+            result = generate(connection, population, args.batch_size,
+                              report=lambda progress: logger.info("%s", progress))
+    finally:
+        engine.dispose()
+    logger.info("%s", result)
+
+
+if __name__ == '__main__':
+    main()
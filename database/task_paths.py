@@ -0,0 +1,52 @@
+"""
+Backfill of the materialized `tasks.path` column, run by the migration that adds it.
+"""
+from collections.abc import Callable, Sequence
+from typing import Any
+
+from sqlalchemy import Connection, bindparam, func, select, update
+from sqlalchemy.orm import aliased
+
+from core.models_sql_alchemy.models import Task
+from core.services.task_tree import child_path, path_segment
+from database.backfill import Backfill, BackfillProgress, run_backfill
+
+
+def _fetch_without_path(connection: Connection, _: str | None, batch_size: int) -> Sequence[Any]:
+    # Tasks whose parent already has a path, so the tree is filled top-down
+    parent = aliased(Task)
+    return connection.execute(
+        select(Task.id, Task.parent_id, parent.path)
+        .outerjoin(parent, Task.parent_id == parent.id)
+        .where(Task.path.is_(None), (Task.parent_id.is_(None)) | (parent.path.is_not(None)))
+        .order_by(Task.id)
+        .limit(batch_size)
+    ).all()
+
+
+def _set_paths(connection: Connection, rows: Sequence[Any]) -> None:
+    table = Task.__table__
+    connection.execute(
+        update(table).where(table.c.id == bindparam("task_id")).values(path=bindparam("task_path")),
+        [{"task_id": task_id,
+          "task_path": path_segment(task_id) if parent_id is None else child_path(parent_path, task_id)}
+         for task_id, parent_id, parent_path in rows])
+
+
+def backfill_paths(connection: Connection,
+                   batch_size: int = 1000,
+                   pause: float = 0.0,
+                   report: Callable[[BackfillProgress], None] | None = None) -> int:
+    """
+    Fills missing task paths top-down.
+
+    Every batch takes tasks without a path whose parent already has one, so a
+    stopped backfill simply continues where it stopped. Tasks in a parent cycle
+    or below a missing parent are never reached and keep no path.
+
+    Returns:
+        Number of updated tasks.
+    """
+    total = connection.scalar(select(func.count()).select_from(Task).where(Task.path.is_(None)))
+    backfill = Backfill("tasks.path", _fetch_without_path, _set_paths, batch_size=batch_size, total=total, pause=pause)
+    return run_backfill(connection, backfill, report)
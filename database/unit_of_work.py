@@ -0,0 +1,198 @@
+"""
+Units of work: one session and one commit shared by every repository call in a scope.
+
+A scope is opened with `unit_of_work(db_manager)`, e.g. by the bot around
+each incoming update, and is tracked in a context variable, so repository
+calls anywhere below it, in the same task or thread, join it instead of
+committing a transaction each. Scopes of different managers don't mix, and a
+scope opened inside another one of the same manager joins the outer one.
+
+Read-only units read from a replica of the manager when it has any, unless
+their reader, e.g. the chat of the update, committed a write shortly before.
+Reads that fill a cache shared by every reader go to the primary regardless,
+see `UnitOfWork.primary_reads`.
+"""
+from collections.abc import Callable, Hashable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+from sqlalchemy import event, exc
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from database.database_manager import SQLDatabaseManager
+
+
+class ReadOnlyError(exc.SQLAlchemyError):
+    """A write was attempted in a read-only unit of work."""
+
+
+# Marks the sessions of read-only units in Session.info. The guards are listened to once for all
+# sessions, listeners added to a session instance cost more than the reads of a cache miss.
+READ_ONLY = "read_only"
+
+
+@event.listens_for(Session, "before_flush")
+def _refuse_flush(session: Session, *_: Any) -> None:
+    if session.info.get(READ_ONLY) and (session.new or session.dirty or session.deleted):
+        raise ReadOnlyError("Changes can't be flushed in a read-only unit of work")
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _refuse_writes(state: ORMExecuteState) -> None:
+    if state.session.info.get(READ_ONLY) and (state.is_insert or state.is_update or state.is_delete):
+        raise ReadOnlyError("Statements that write can't run in a read-only unit of work")
+
+
+class UnitOfWork:
+    """
+    Session of a scope, opened on first use, and the work that waits for its commit.
+
+    Read-only units never flush, refuse every INSERT, UPDATE and DELETE and end
+    their transaction without a commit.
+
+    Args:
+        reader: Whose work the unit does, a committed write makes their next reads
+                use the primary, see `SQLDatabaseManager.note_write`.
+        replica: Read from a replica, only for read-only units.
+    """
+    def __init__(self,
+                 db_manager: SQLDatabaseManager,
+                 read_only: bool = False,
+                 reader: Hashable | None = None,
+                 replica: bool = False):
+        self.db_manager = db_manager
+        self.read_only = read_only
+        self.reader = reader
+        self.replica = replica and read_only
+        # Something was written, results read since then aren't committed yet
+        self.dirty = False
+        # Data of the repositories that lives as long as the transaction, e.g. task parent links
+        self.state: dict[Hashable, Any] = {}
+        self._session: Session | None = None
+        # Session of the primary for the reads of `primary_reads` in a unit that reads from a replica
+        self._primary: Session | None = None
+        self._primary_reads = 0
+        self._after_commit: list[Callable[[], None]] = []
+
+    @property
+    def session(self) -> Session:
+        if self.replica and self._primary_reads:
+            if self._primary is None:
+                self._primary = self._open(self.db_manager.get_session())
+            return self._primary
+        if self._session is None:
+            self._session = self._open(self.db_manager.get_replica_session() if self.replica
+                                       else self.db_manager.get_session())
+        return self._session
+
+    def _open(self, session: Session) -> Session:
+        if self.read_only:
+            session.autoflush = False
+            session.info[READ_ONLY] = True
+        return session
+
+    @contextmanager
+    def primary_reads(self) -> Iterator[None]:
+        """
+        Sends the reads of the scope to the primary, for results shared with other readers.
+
+        A replica may still miss a write of another reader, a result read from it
+        and cached would outlive the invalidation that write already did.
+        """
+        self._primary_reads += 1
+        try:
+            yield
+        finally:
+            self._primary_reads -= 1
+
+    def written(self) -> None:
+        """
+        Marks the unit as changed by a repository write.
+
+        Raises:
+            ReadOnlyError: If the unit is read-only.
+        """
+        if self.read_only:
+            raise ReadOnlyError("Records can't be written in a read-only unit of work")
+        self.dirty = True
+
+    def on_commit(self, callback: Callable[[], None]) -> None:
+        """Runs callback after the unit is committed, drops it on rollback"""
+        self._after_commit.append(callback)
+
+    def finish(self, failed: bool) -> None:
+        """Commits the unit, or rolls it back when it failed or is read-only, then runs the after-commit work."""
+        session, self._session = self._session, None
+        primary, self._primary = self._primary, None
+        callbacks, self._after_commit = self._after_commit, []
+        self.state.clear()
+        if primary is not None:
+            # Only units reading from a replica have one, they are read-only
+            primary.rollback()
+            primary.close()
+        if session is None:
+            return
+        try:
+            if failed or self.read_only:
+                session.rollback()
+            else:
+                session.commit()
+        finally:
+            session.close()
+        if not failed and self.dirty:
+            self.db_manager.note_write(self.reader)
+        if not failed:
+            for callback in callbacks:
+                callback()
+
+
+_units: ContextVar[tuple[UnitOfWork, ...]] = ContextVar("units_of_work", default=())
+_reader: ContextVar[Hashable | None] = ContextVar("reader", default=None)
+
+
+def current_unit(db_manager: SQLDatabaseManager) -> UnitOfWork | None:
+    """The unit of work of `db_manager` the caller runs in, if any."""
+    for unit in reversed(_units.get()):
+        if unit.db_manager is db_manager:
+            return unit
+    return None
+
+
+@contextmanager
+def unit_of_work(db_manager: SQLDatabaseManager,
+                 read_only: bool = False,
+                 reader: Hashable | None = None) -> Iterator[UnitOfWork]:
+    """
+    Shares one session between the repository calls of the scope, committed when the scope ends.
+
+    Joins the current unit of `db_manager` when there is one; the outer unit
+    then commits, and a read-only scope doesn't make it read-only. An exception
+    leaving the scope rolls the unit back.
+
+    Args:
+        reader: Whose work the scope does, e.g. a chat id. Units opened below it
+                without a reader of their own, of any manager, do it for them too.
+
+    Raises:
+        ReadOnlyError: From a write in a new read-only unit.
+    """
+    reader_token = _reader.set(reader) if reader is not None else None
+    try:
+        unit = current_unit(db_manager)
+        if unit is not None:
+            yield unit
+            return
+        reader = _reader.get()
+        unit = UnitOfWork(db_manager, read_only, reader, replica=read_only and db_manager.reads_from_replica(reader))
+        token = _units.set((*_units.get(), unit))
+        failed = True
+        try:
+            yield unit
+            failed = False
+        finally:
+            _units.reset(token)
+            unit.finish(failed)
+    finally:
+        if reader_token is not None:
+            _reader.reset(reader_token)
@@ -1,34 +1,81 @@
-from pydantic import BaseSettings
+from functools import lru_cache
 
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
-class Settings(BaseSettings):
-    redis_url: str = "redis://localhost"
 
-    class Config:
-        env_file = ".env"
+class Settings(BaseSettings):
+    """
+    Deployment settings, read from the environment and the .env file.
 
+    Field names are the environment variable names, case-insensitively
+    (e.g. DATABASE_URL, DB_POOL_SIZE, REDIS_HOST). "none" unsets an optional value.
+    """
+    # Telegram
+    token: str = ""
+    # Bot API endpoint with {0} for the token and {1} for the method, e.g. a local Bot API server
+    telegram_api_url: str | None = None
 
-class Settings(BaseSettings):
     # Database
-    DB_URL: PostgresDsn = Field(..., env="DATABASE_URL")
-    DB_POOL_SIZE: int = 5
+    database_url: str = "sqlite:///database/progresser.db"
+    db_echo: bool = False
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    # Executions before psycopg prepares a statement on the server, None disables it (PgBouncer)
+    db_prepare_threshold: int | None = 2
+    # Read replicas as a JSON list, e.g. ["postgresql://replica1/progresser"]; read-only handlers read from them
+    database_replica_urls: list[str] = []
+    # Seconds the reads of a chat stay on the primary after it wrote, longer than the replication lag
+    replica_sticky_seconds: float = 5.0
+
+    # Redis
+    redis_host: str = "localhost"
+    redis_port: int = 6379
+    redis_db: int = 0
+    redis_username: str = "default"
+    redis_password: str = "null"
+    # Seconds a cached query result lives, None keeps it until it is invalidated
+    cache_ttl: int | None = None
+
+    # Concurrency
+    max_concurrent_handlers: int = 32
+    # Worker processes of `python -m telegram_bot.supervisor`
+    bot_workers: int = 1
+    # Processes rendering big /view messages and parsing big messages, 0 keeps them on the event loop
+    offload_workers: int = 2
+    # Seconds such work may block the event loop before it's sent to those processes
+    offload_inline_budget: float = 0.005
+
+    # Startup
+    # Created once the pools are warmed up, for a readiness probe
+    ready_file: str | None = None
+    # Connections of each pool opened before the bot reports ready
+    warm_up_connections: int = 5
+    # Cache entries of this many recently active users are loaded before the bot reports ready, 0 skips it
+    cache_warm_up_users: int = 1000
+    cache_warm_up_max_keys: int = 10_000
+    cache_warm_up_seconds: float = 10.0
+    # Seconds the warmed entries live at most, also when cache_ttl is None
+    cache_warm_up_ttl: int = 3600
 
-    # Auth
-    SECRET_KEY: str = Field(..., min_length=32)
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Logging
+    log_level: str = "INFO"
+    log_json: bool = False
 
-    # App
-    DEBUG: bool = False
-    ALLOWED_HOSTS: list[str] = ["localhost"]
+    # Monitoring, see telegram_bot.monitor
+    monitor_interval: float = 0.5
+    # Seconds the event loop may be stuck before its stack is logged, 0 turns the sampling off
+    loop_block_threshold: float = 0.5
+    monitor_report_seconds: float = 60.0
 
-    # Pydantic Config
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
-        extra="ignore",  # Ignore extra env vars
-        case_sensitive=True
+        extra="ignore",
+        env_parse_none_str="none",
     )
 
 
-# Singleton instance
-settings = Settings()
\ No newline at end of file
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Settings of the process, read once."""
+    return Settings()
@@ -0,0 +1,103 @@
+import copy
+import json
+import logging
+import queue
+from dataclasses import dataclass
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any
+
+DEFAULT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Attributes every LogRecord has, everything else was passed through `extra=`
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+_exception_formatter = logging.Formatter()
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line."""
+    def format(self, record: logging.LogRecord) -> str:
+        payload: dict[str, Any] = {
+            "time": self.formatTime(record),
+            "logger": record.name,
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    Puts records on the queue with their message frozen, formatting happens in the listener thread.
+
+    The stock `prepare` formats every record on the calling thread, which is the
+    work we want to keep off the event loop. Only the message is rendered here,
+    because its arguments may be mutable objects that change before the listener
+    gets to the record. Tracebacks are rendered here as well, they refer to
+    frames of the calling thread.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+@dataclass(frozen=True)
+class Rotation:
+    """Size after which the log file is rotated and number of rotated files to keep."""
+    max_bytes: int = 10 * 1024 * 1024
+    backup_count: int = 5
+
+
+def setup_logging(filename: str = 'telegram_bot/bot.log',
+                  *,
+                  level: int | str = logging.INFO,
+                  module_levels: dict[str, int | str] | None = None,
+                  json_output: bool = False,
+                  rotation: Rotation = Rotation()) -> QueueListener:
+    """
+    Configures the root logger to hand records to a queue, while a background
+    thread writes them to a size-rotated file.
+
+    Callers on the event loop only pay for putting a record on the queue,
+    the file I/O and formatting happen in the listener thread.
+
+    Args:
+        filename: Path of the log file.
+        level: Level of the root logger.
+        module_levels: Per-logger levels, e.g. {"sqlalchemy.engine": "WARNING"}.
+        json_output: Write one JSON object per line instead of plain text.
+        rotation: When the file is rotated and how many rotated files are kept.
+
+    Returns:
+        The started listener, call `stop()` on shutdown to flush pending records.
+    """
+    file_handler = RotatingFileHandler(filename,
+                                       maxBytes=rotation.max_bytes,
+                                       backupCount=rotation.backup_count,
+                                       encoding='utf-8')
+    file_handler.setFormatter(JsonFormatter() if json_output else logging.Formatter(DEFAULT_FORMAT))
+
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_DeferredQueueHandler(log_queue))
+    root.setLevel(level)
+
+    for name, module_level in (module_levels or {}).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -0,0 +1,28 @@
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+def signal_ready(path: str | None) -> None:
+    """
+    Announces that the bot can serve messages.
+
+    Logs it and, if `path` is set, creates the file a readiness probe checks
+    for. The file is written under a temporary name and renamed, so a probe
+    never sees it half written.
+    """
+    logger.info("Ready to serve")
+    if path is None:
+        return
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile("w", dir=directory, delete=False, encoding="utf-8") as file:
+        file.write(str(os.getpid()))
+    os.replace(file.name, path)
+
+
+def clear_ready(path: str | None) -> None:
+    """Withdraws the readiness file on shutdown."""
+    if path is not None and os.path.exists(path):
+        os.remove(path)
@@ -21,7 +21,20 @@ class Statics:
                         "Name - _\n"
                         "Description - _\n"
                         "Weight - _\n"
-                        "Completed - _\n"
+                        "Completed - _\n",
+        "/create_Tasks": "To create many Tasks at once send them in one message:\n"
+                         "Separate Tasks with an empty line\n"
+                         "Indent a Task to make it a child of the Task above it\n"
+                         "Workspace Name is taken from the previous Task if omitted\n"
+                         "Fields are the same as in /create_Task, for example\n"
+                         "Workspace Name - _\n"
+                         "Name - _\n"
+                         "\n"
+                         "    Name - _\n"
+                         "    Weight - _\n"
+                         "\n"
+                         "    Name - _\n"
+                         "    Completed - _\n"
     }
     COMPONENTS_PROGRESS = {
 
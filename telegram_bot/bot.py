@@ -1,36 +1,58 @@
 import asyncio
+import io
 import logging
-import os
-import re
-import textwrap
-from typing import Any, Dict, Type
+import tempfile
+from contextlib import AsyncExitStack, contextmanager
+from functools import wraps
+from typing import Any
 
-from dotenv import load_dotenv
 from pydantic import ValidationError
 from sqlalchemy.exc import SQLAlchemyError
-from telebot import types
+from telebot import asyncio_helper, types
 from telebot.async_telebot import AsyncTeleBot
 
 from core.models_sql_alchemy.models import Task as BDTask
 from core.models_sql_alchemy.models import User as BDUser
-from core.models_sql_alchemy.models import UserState as BDUserState
 from core.models_sql_alchemy.models import Workspace as BDWorkspace
 from core.schemas_pydantic.schemas import Task
-from database.database_manager import DatabaseService
+from core.services.form_parser import GENERIC_FORM, FormParseError, compile_form_schema
+from core.services.offload import Offloader
+from core.services.task_batch import parse_task_blocks
+from core.services.task_tree import iter_dfs
+from core.services.view_render import create_progress_bar, create_telegram_progress_bar, render_view
+from core.services.workspace_transfer import (
+    iter_csv_export,
+    iter_csv_import,
+    iter_json_export,
+    iter_json_import,
+)
+from database.cache_warmup import WarmUpLimits, warm_up_cache
+from database.database_manager import get_redis_manager, get_sql_manager
+from database.database_service import DatabaseService
+from database.repositories.change_events import PROGRESS_FIELDS, VIEW_FIELDS, SubtreeEntries, register_region
+from database.unit_of_work import unit_of_work
+from resources.config import Settings, get_settings
+from resources.logging_config import setup_logging
+from resources.readiness import clear_ready, signal_ready
 from resources.statics import Statics
+from telegram_bot.monitor import LoopMonitor
 
-# --- Configuration ---
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO,
-    filename='telegram_bot/bot.log',
-    filemode='w',
-    encoding='utf-8'
-)
+EXPORT_FORMATS = {"json": iter_json_export, "csv": iter_csv_export}
+IMPORT_FORMATS = {"json": iter_json_import, "csv": iter_csv_import}
+EXPORT_SPOOL_SIZE = 1024 * 1024
+# Words of a command naming a record: the command, the class and at least one word of the name
+RECORD_COMMAND_WORDS = 3
+# Levels of subtasks shown below the viewed record, 0 shows its direct children only
+VIEW_DEPTH = 2
+# Rendered /view messages kept, the oldest one is dropped past it
+RENDERED_VIEWS_SIZE = 1000
+# Marks users whose state isn't in `Bot.cached_state`, None there is a user without a state
+NOT_CACHED = object()
 
 
 class Bot:
-    def __init__(self, token):
+    def __init__(self, token: str | None = None, settings: Settings | None = None):
+        self.settings = settings or get_settings()
         self.CLASS_FROM_STATE = {
             # "/create_TaskList": (TaskList, BDTaskList, BDWorkspace),
             "/create_Task": (Task, BDTask, BDWorkspace)
@@ -38,57 +60,102 @@ class Bot:
         self.AVAILABLE_CLASSES = {BDWorkspace.__name__: BDWorkspace,
                              BDTask.__name__: BDTask,
                              }
-        self.bot = AsyncTeleBot(token=token)
+        if self.settings.telegram_api_url:
+            asyncio_helper.API_URL = self.settings.telegram_api_url
+        self.bot = AsyncTeleBot(token=token or self.settings.token)
+        # Handlers past the limit wait instead of piling up database work. A running handler may
+        # hold a pooled connection for one of its units of work, more would wait for one on the event loop
+        self.handler_slots = asyncio.Semaphore(min(self.settings.max_concurrent_handlers,
+                                                   self.settings.db_pool_size + self.settings.db_max_overflow))
+        # Big renders and parses run in other processes instead of stalling every chat
+        self.offloader = Offloader(max_workers=self.settings.offload_workers,
+                                   inline_budget=self.settings.offload_inline_budget)
+        self.monitor = LoopMonitor(interval=self.settings.monitor_interval,
+                                   block_threshold=self.settings.loop_block_threshold,
+                                   report_seconds=self.settings.monitor_report_seconds)
         self.cached_state = {}
+        # Progress and rendered views are dropped when their record or a task below it changes
+        self.rendered_views: dict[tuple[int, type], str] = {}
+        self.views_region = SubtreeEntries(self.rendered_views, VIEW_FIELDS)
+        register_region("progress", SubtreeEntries(Statics.COMPONENTS_PROGRESS, PROGRESS_FIELDS))
+        register_region("rendered views", self.views_region)
         self.logger = logging.getLogger(__name__)  # Logger for Bot
         self.database = DatabaseService()
         self.handlers = []
         self.register_handlers()
 
     def handler(self, **kwargs):  # Custom decorator factory
+        """Registers a handler, which runs its database work in units of work, see `unit`."""
         def decorator(func):
             @self.bot.message_handler(**kwargs)  # Extract register logic to here
+            @wraps(func)
             async def wrapper(message):
-                return await func(message)  # self here and await
+                async with AsyncExitStack() as slots:
+                    with self.monitor.queued(message):
+                        await slots.enter_async_context(self.handler_slots)
+                    with self.monitor.running():
+                        return await func(message)  # self here and await
 
             return wrapper  # Return function for decoration
 
         return decorator
 
+    @contextmanager
+    def unit(self, message, read_only: bool = False):
+        """
+        A unit of work for database calls of an update, committed when the block ends.
+
+        Blocks hold no awaits, replies are sent once the unit committed, so no update keeps
+        a connection, a transaction or SQLite's write lock open while it waits on Telegram.
+
+        Args:
+            read_only: The block only reads, the unit never commits and refuses writes. It
+                       reads from a replica unless the chat wrote within the sticky window.
+        """
+        try:
+            with unit_of_work(get_sql_manager(), read_only=read_only, reader=message.chat.id):
+                yield
+        except BaseException:
+            # A state set in a rolled back unit isn't stored, the next lookup reads it again
+            self.cached_state.pop(message.chat.username, None)
+            raise
+
     def register_handlers(self):
         """Registers handlers that have been decorated"""
 
-        @self.handler(func=lambda message: message.text == 'Новый' or message.text == '/create_user')
+        @self.handler(func=lambda message: message.text in {'Новый', '/create_user'})
         async def create_new_user(message):
             self.log(message)
             chat = message.chat
             try:
-                self.database.create_user(chat.username)
-                self.logger.info(f"Created new user: {chat.username}")
+                with self.unit(message):
+                    self.database.create_user(chat.username)
+            # TODO Buttons for commands
+            except SQLAlchemyError:
+                self.logger.error("Error upon creating user with username - %s. \n Full message - %s",
+                                  chat.username, message, exc_info=True)
+                await self.bot.reply_to(message, "There was an error with your request")
+            else:
+                self.logger.info("Created new user: %s", chat.username)
                 await self.bot.reply_to(message,
                                         f"Successfully registered you in the system with username: {chat.username}. \n"
                                         "You can change your username with command /update_username.\n"
                                         "You can use command /view to check your workspaces\n"
                                         "You can use command /create_workspace to create new workspace")
-            # TODO Buttons for commands
-            except SQLAlchemyError:
-                self.logger.error(
-                    f"Error upon creating user with username - {chat.username}. \n Full message - {message}",
-                    exc_info=True)
-                await self.bot.reply_to(message, "There was an error with your request")
 
         @self.handler(commands=['create_workspace'])
         async def create_workspace_handler(message):
             username = message.chat.username
             try:
-                self.logger.info(f"User {username} triggered /create_workspace")  # log here
-                self.set_state(username, "creating workspace")  # Move to the NAME_WORKSPACE state
-                await self.bot.send_message(message.chat.id, "What name would you like to give your workspace?")
+                self.logger.info("User %s triggered /create_workspace", username)  # log here
+                with self.unit(message):
+                    self.set_state(username, "creating workspace")  # Move to the NAME_WORKSPACE state
             except SQLAlchemyError:
-                self.logger.error(
-                    f"Error upon triggering /create_workspace with username - {username}. \n Full message - {message}",
-                    exc_info=True)
+                self.logger.error("Error upon triggering /create_workspace with username - %s. \n Full message - %s",
+                                  username, message, exc_info=True)
                 await self.bot.send_message(message.chat.id, "There was an error with your request")
+            else:
+                await self.bot.send_message(message.chat.id, "What name would you like to give your workspace?")
 
         @self.handler(func=lambda message: str(message.text).startswith('/create'))
         async def create_something_handler(message):
@@ -99,22 +166,27 @@ class Bot:
             chat_id = message.chat.id
             workspace_name = message.text
             username = message.chat.username
-            self.logger.info(
-                f"User {username} triggered /create_workspace and entered workspace name - {workspace_name}")
+            self.logger.info("User %s triggered /create_workspace and entered workspace name - %s",
+                             username, workspace_name)
             try:
-                self.database.create(BDWorkspace, {"name": workspace_name, "owner_name": username})
-                self.logger.info(f"Creating new Workspace for {username} named {workspace_name}")
-                await self.bot.send_message(chat_id,
-                                            f"Successfully created Workspace named: {workspace_name}.\n"
-                                            "You can use command /view to check your workspaces")
+                with self.unit(message):
+                    self.database.create(BDWorkspace, {"name": workspace_name, "owner_name": username})
+                    self.clear_state(username)
             # TODO Buttons for commands
             except SQLAlchemyError:
-                self.logger.error(
-                    f"Error upon creating Workspace for {username} named {workspace_name}. \n Full message - {message}",
-                    exc_info=True)
-                await self.bot.reply_to(message, "There was an error with your request")
-            finally:
+                self.logger.error("Error upon creating Workspace for %s named %s. \n Full message - %s",
+                                  username, workspace_name, message, exc_info=True)
                 self.clear_state(username)
+                await self.bot.reply_to(message, "There was an error with your request")
+            else:
+                self.logger.info("Creating new Workspace for %s named %s", username, workspace_name)
+                await self.bot.send_message(chat_id,
+                                            f"Successfully created Workspace named: {workspace_name}.\n"
+                                            "You can use command /view to check your workspaces")
+
+        @self.handler(func=lambda message: self.check_state_and_create(message.chat.username) == "/create_Tasks")
+        async def process_tasks_with_state(message):
+            await self._process_tasks_with_state(message)
 
         @self.handler(func=lambda message: self.check_state_and_create(message.chat.username) in list(self.CLASS_FROM_STATE.keys()))
         async def process_something_with_state(message):
@@ -125,18 +197,30 @@ class Bot:
             try:
                 await self._view_something(message)
             except Exception as e:
-                self.logger.error(e)
+                self.logger.error("%s", e)
                 await self.bot.reply_to(message, "There was an error with your request")
 
+        @self.handler(func=lambda message: str(message.text).startswith('/export'))
+        async def export_something(message):
+            try:
+                await self._export_something(message)
+            except Exception as e:
+                self.logger.error("%s", e, exc_info=True)
+                await self.bot.reply_to(message, "There was an error with your request")
+
+        @self.handler(content_types=['document'])
+        async def import_something(message):
+            await self._import_something(message)
+
         @self.handler(commands=['start'])
         async def send_start(message):
             self.log(message)
             keyboard = types.ReplyKeyboardMarkup(resize_keyboard=True)
-            print(message)
             username = message.chat.username
-            db_user = self.database.get_by_custom_field(BDUser, "telegram_username", username)
+            with self.unit(message, read_only=True):
+                db_user = self.database.get_by_custom_field(BDUser, "telegram_username", username)
             if db_user:
-                await self.bot.reply_to(message, f"Hello, {db_user.username}, how can I help you? \n"
+                await self.bot.reply_to(message, f"Hello, {db_user['username']}, how can I help you? \n"
                                                  '"/view component name" view your workspaces \n'
                                                  "/create_workspace to create new workspace")
             else:
@@ -158,29 +242,28 @@ class Bot:
         @self.handler()
         async def unprocessed_message(message):
             self.log(self.check_state_and_create(message.chat.username))
-            self.logger.info(self.check_state_and_create(message.chat.username) == "creating workspace")
-            self.logger.info(f"There is an unprocessed message: {message.text}\n Full message - {message}")
+            self.logger.info("There is an unprocessed message: %s\n Full message - %s", message.text, message)
 
     # TODO update parse_message, so it can parse message with no explicit fields
-    def parse_message(self, message) -> Dict[str, Any]:
+    def parse_message(self, message, cls: type | None = None) -> dict[str, Any]:
         """
         Parses a multi-line message string to extract key-value pairs.
 
         The message is expected to be in the format "key - value" on separate lines.
-        The extracted key-value pairs are stored in a dictionary, which is then returned.
-        A boolean dictionary is used to convert string representations of booleans to actual boolean types.
+        Without `cls` the keys are kept as written, with a Pydantic `cls` the labels
+        are matched against its field aliases and the result is keyed by field name.
+        Yes/no values of boolean fields are converted to actual booleans.
 
         Args:
             message: A telegram message object containing the text to parse.  Specifically the `message.text` attribute is used.
+            cls: Optional Pydantic model the form is parsed for.
 
         Returns:
-            A dictionary containing the extracted key-value pairs.  The keys are strings
-            extracted from the message, and the values are strings or booleans (if the key
-            is "Completed" and the value can be converted to a boolean).  Returns a dictionary.
+            A dictionary containing the extracted key-value pairs.
 
         Raises:
-            KeyError: If the value for 'Completed' is not found in the `boolean_dict`.
-            AttributeError: Can be raised by the `re.match` or string operations.
+            FormParseError: With the number and text of every invalid line.
+            AttributeError: If the message has no text.
 
         Example:
             Given a message with the following text:
@@ -195,139 +278,118 @@ class Bot:
                 "Due Date": "2023-12-25"
             }
         """
-        self.logger.info(f"User {message.chat.username} triggered parse_message message - {message.text}")
-        text = message.text
-        result = {}
-        boolean_dict = {
-            "Да": True,
-            "Нет": False,
-            "1": True,
-            "0": False,
-            "Y": True,
-            "N": False,
-            "True": True,
-            "False": False,
-            "Yes": True,
-            "No": False,
-        }
+        self.logger.debug("User %s triggered parse_message message - %s", message.chat.username, message.text)
+        schema = compile_form_schema(cls) if cls is not None else GENERIC_FORM
         try:
-            lines = text.splitlines()
-
-            for line in lines:
-                match = re.match(r"^(.*?)\s*-\s*(.*)$", line)  # Captures before and after ' - '
-
-                if match:
-                    field = match.group(1).strip()
-                    value = match.group(2).strip()
-                    if field == "Completed":
-                        value = boolean_dict[value]
-                    # if field == "Weight": float(value)
-                    result[field] = str(value)
-            self.logger.info(f"User {message.chat.username} finished parse_message - successfully")
-        except (AttributeError,KeyError) as e:
-            self.logger.error(f"Error parsing message - {e}\n Full message - {message}")
+            result = schema.parse(message.text)
+        except (AttributeError, FormParseError) as e:
+            self.logger.error("Error parsing message - %s\n Full message - %s", e, message)
             raise e
-        finally:
-            return result
+        self.logger.debug("User %s finished parse_message - successfully", message.chat.username)
+        return result
 
-    def validate_message(self, message, cls: Type) -> Any:
-        self.logger.info(f"User {message.chat.username} triggered validate_message for class {cls}")
-        try:
-            parsed_dict = self.parse_message(message)
-        except (AttributeError, KeyError) as e:
-            raise e
+    def validate_message(self, message, cls: type) -> Any:
+        self.logger.debug("User %s triggered validate_message for class %s", message.chat.username, cls)
+        parsed_dict = self.parse_message(message, cls)
 
         try:
-            validated_model = cls(**parsed_dict)
-            self.logger.info(f"User {message.chat.username} finished validate_message - successfully")
+            validated_model = cls.model_validate(parsed_dict)
+            self.logger.debug("User %s finished validate_message - successfully", message.chat.username)
             return validated_model
         except ValidationError as e:
-            self.logger.error(f"Error validation message from user {message.chat.username}\n"
-                              f"Message - {parsed_dict}\n"
-                              f"Error - {e}")
+            self.logger.error("Error validation message from user %s\nMessage - %s\nError - %s",
+                              message.chat.username, parsed_dict, e)
             raise e
 
     def _process_something_with_state(self, message, send_additional_error_info: bool = False):
         chat_id = message.chat.id
         username = message.chat.username
         try:
-            self.logger.info(f"User {username} triggered process_something_with_state")
+            self.logger.info("User %s triggered process_something_with_state", username)
             state = self.check_state_and_create(message.chat.username)
             cls, bd_cls, bd_cls_parent = self.CLASS_FROM_STATE[state]
             validated_model_dict = self.validate_message(message, cls).__dict__
 
-            workspace_record = self.database.get_by_custom_fields(bd_cls_parent,
-                                                               owner_name = username,
-                                                               name = validated_model_dict["workspace_name"]
-                                                               )
-            if not workspace_record:
-                send_additional_error_info = True
-                raise SQLAlchemyError(f"Parent record with Name {validated_model_dict["workspace_name"]} in {bd_cls_parent.__name__} doesn't exist")
-            else:
-                workspace_record = workspace_record[0].__dict__
-                del validated_model_dict["workspace_name"]
-                validated_model_dict["workspace_id"] = workspace_record["id"]
-
-            if validated_model_dict["parent_name"]:
-                parent_record = self.database.get_by_custom_fields(bd_cls,
-                                                                   owner_name = username,
-                                                                   name = validated_model_dict["parent_name"]
-                                                                   )
-                if not parent_record:
+            with self.unit(message):
+                workspace_id = self.database.resolve_name_id(bd_cls_parent, username, validated_model_dict["workspace_name"])
+                if workspace_id is None:
                     send_additional_error_info = True
-                    raise SQLAlchemyError(f"Parent record with Name {validated_model_dict["parent_name"]} in {bd_cls.__name__} doesn't exist")
-                else:
-                    parent_record = parent_record[0].__dict__
-                    validated_model_dict["parent_id"] = parent_record["id"]
-            del validated_model_dict["parent_name"]
-
-            validated_model_dict["owner_name"] = username
-            self.database.create(bd_cls, validated_model_dict)
-            self.logger.info(f"User {message.chat.username} finished process_something_with_state - successfully\n"
-                             f"created {cls} with fields {validated_model_dict}\n")
+                    raise SQLAlchemyError(f"Parent record with Name {validated_model_dict["workspace_name"]} in {bd_cls_parent.__name__} doesn't exist")
+                del validated_model_dict["workspace_name"]
+                validated_model_dict["workspace_id"] = workspace_id
+
+                if validated_model_dict["parent_name"]:
+                    parent_id = self.database.resolve_name_id(bd_cls, username, validated_model_dict["parent_name"])
+                    if parent_id is None:
+                        send_additional_error_info = True
+                        raise SQLAlchemyError(f"Parent record with Name {validated_model_dict["parent_name"]} in {bd_cls.__name__} doesn't exist")
+                    validated_model_dict["parent_id"] = parent_id
+                del validated_model_dict["parent_name"]
+
+                validated_model_dict["owner_name"] = username
+                self.database.create(bd_cls, validated_model_dict)
+                self.clear_state(username)
+            self.logger.info("User %s finished process_something_with_state - successfully\n"
+                             "created %s with fields %s\n", username, cls, validated_model_dict)
             return self.bot.send_message(chat_id,
                                          f"Successfully created {cls.__name__} named: {validated_model_dict["name"]}.\n"
                                          f"You can use command /view_{cls.__name__} to check your {cls.__name__}\n")
         except SQLAlchemyError as e:
-            self.logger.error(
-                f"Error upon processing message for {username}. \n"
-                f"Error - {str(e)}\n"
-                f"Full message - {message}",
-                exc_info=True)
+            self.logger.error("Error upon processing message for %s. \nError - %s\nFull message - %s",
+                              username, e, message, exc_info=True)
             error_text = "There was an error with your request"
-            if send_additional_error_info: error_text = error_text + f"\n{str(e)}"
+            if send_additional_error_info:
+                error_text = error_text + f"\n{str(e)}"
             return self.bot.send_message(chat_id, error_text)
+        except FormParseError as e:
+            self.logger.error("Error parsing message for %s - %s", username, e)
+            return self.bot.send_message(chat_id, f"There was an error with your request\n{e}")
         except (ValidationError, AttributeError, KeyError):
-            self.logger.error(f"re raising error")
+            self.logger.error("re raising error")
             return self.bot.send_message(chat_id, "There was an error with your request")
         finally:
             self.clear_state(username)
 
+    async def _process_tasks_with_state(self, message):
+        chat_id = message.chat.id
+        username = message.chat.username
+        try:
+            self.logger.info("User %s triggered process_tasks_with_state", username)
+            rows = await self.offloader.run(parse_task_blocks, message.text, size=len(message.text))
+            with self.unit(message):
+                created = self.database.create_tree(username, rows)
+                self.clear_state(username)
+            self.logger.info("User %s finished process_tasks_with_state - created %s tasks", username, created)
+            return await self.bot.send_message(chat_id,
+                                               f"Successfully created {created} Tasks.\n"
+                                               f"You can use command /view_Task to check your Task\n")
+        except (SQLAlchemyError, FormParseError) as e:
+            self.logger.error("Error upon processing tasks for %s. \nError - %s", username, e, exc_info=True)
+            return await self.bot.send_message(chat_id, f"There was an error with your request\n{e}")
+        finally:
+            self.clear_state(username)
+
     def set_state(self, telegram_username, state):
-        self.check_state_and_create(telegram_username)
-        self.database.update(BDUserState, telegram_username, {"state": state})
+        self.database.set_state(telegram_username, state)
         self.cached_state[telegram_username] = state
 
     def check_state_and_create(self, telegram_username):
-        try:
-            if self.cached_state[telegram_username]:
-                return self.cached_state[telegram_username]
-        except KeyError:
-            self.cached_state[telegram_username] = None
-        if not (state := self.database.get_by_id(BDUserState, telegram_username)):
-            self.database.create(BDUserState, {"telegram_username": telegram_username, "state": None})
-            return None
-        else:
+        # A cached None is a user without a state, it is a hit like any other state
+        state = self.cached_state.get(telegram_username, NOT_CACHED)
+        if state is not NOT_CACHED:
             return state
+        # Read through the repository cache, only a user without a state row is written
+        state = self.database.get_or_create_state(telegram_username)
+        self.cached_state[telegram_username] = state
+        return state
 
     def clear_state(self, telegram_username):
-        if self.database.get_by_id(BDUserState, telegram_username):
-            self.database.delete(BDUserState, telegram_username)
-        if self.cached_state[telegram_username]:
-            del self.cached_state[telegram_username]
+        # The row is kept with an empty state, so the next lookup has nothing to create
+        if self.cached_state.get(telegram_username, NOT_CACHED) is not None:
+            self.set_state(telegram_username, None)
 
     def log(self, message):
-        self.logger.info(message)
+        self.logger.info("%s", message)
 
     def about(self, message):
         return self.bot.send_message(message.chat.id,
@@ -337,17 +399,19 @@ class Bot:
         username = message.chat.username
         try:
             state = message.text
-            self.logger.info(f"User {username} triggered {message.text}")
-            self.set_state(username, state)
-            await self.bot.send_message(message.chat.id, Statics.MESSAGE_FROM_STATE[state])
+            self.logger.info("User %s triggered %s", username, message.text)
+            with self.unit(message):
+                self.set_state(username, state)
         except SQLAlchemyError:
-            self.logger.error(
-                f"Error upon triggering {message.text} with username - {username}. \n Full message - {message}",
-                exc_info=True)
+            self.logger.error("Error upon triggering %s with username - %s. \n Full message - %s",
+                              message.text, username, message, exc_info=True)
             await self.bot.send_message(message.chat.id, "There was an error with your request")
+        else:
+            await self.bot.send_message(message.chat.id, Statics.MESSAGE_FROM_STATE[state])
 
     async def _view_all(self, message):
-        username = message.chat.username
+        """Not implemented yet: a keyboard over every record of the user"""
+        # username = message.chat.username
         # records = self.database.get_by_custom_fields(self.AVAILABLE_CLASSES[split_text[1]],
         #                                              name=' '.join(split_text[2:]),
         #                                              owner_name=username, session=session)
@@ -363,9 +427,9 @@ class Bot:
     async def _view_something(self, message):
         text = message.text
         username = message.chat.username
-        self.logger.info(f"User {username} triggered _view_something")
+        self.logger.info("User %s triggered _view_something", username)
         split_text = text.split()
-        if len(split_text) < 3:
+        if len(split_text) < RECORD_COMMAND_WORDS:
             await self.bot.send_message(message.chat.id,
                                          "Please specify what you want to view\n"
                                          "Example: /view Workspace Workspace_Name")
@@ -374,105 +438,161 @@ class Bot:
                                          "Component not found, please check the spelling"
                                          f"it should be one of {self.AVAILABLE_CLASSES.keys()}")
         else:
-            session = self.database.create_session()
-            records = self.database.get_by_custom_fields(self.AVAILABLE_CLASSES[split_text[1]],
-                                               name=' '.join(split_text[2:]),
-                                               owner_name=username,session=session)
+            cls = self.AVAILABLE_CLASSES[split_text[1]]
+            # A write committed from here on may change what the view shows
+            generation = self.views_region.generation
+            with self.unit(message, read_only=True):
+                records = self.database.get_by_custom_fields(cls, name=' '.join(split_text[2:]), owner_name=username)
+                msg = self.rendered_views.get((records[0]["id"], cls)) if records else None
+                if records and msg is None:
+                    record_progress, children = self._load_view(cls, records[0])
             if not records:
                 await self.bot.send_message(message.chat.id,
                                              f"Record with name {split_text[2]} in component {split_text[1]} doesn't exist")
             else:
                 record = records[0]
-                record_progress = self._calculate_progress(record)
-                self.database.close_session(session)
-                msg = f"{Bot.create_telegram_progress_bar(record_progress)}\n"\
-                          f"{record.name}\n"
-                if record.description:
-                    text_wrap = textwrap.wrap(record.description, width=100)
-                    for row in text_wrap:
-                        msg += f"{row}\n"
-                child_records = record.child_tasks
-                for child in child_records:
-                    progress_bar = Statics.COMPONENTS_PROGRESS[(child.id,child.__class__)]
-                    progress_bar = Bot.create_telegram_progress_bar(progress_bar)
-                    msg += f"    {child.name:<{50}} {progress_bar}\n"
+                if msg is None:
+                    description = record["description"] or None
+                    # Rendered once the unit ended, so no connection waits for the render
+                    # Sized in output lines, a long description wraps into about one line per 100 characters
+                    msg = await self.offloader.run(render_view, record["name"], record_progress, description, children,
+                                                   size=len(children) + len(description or "") // 100)
+                    if generation == self.views_region.generation:
+                        if len(self.rendered_views) >= RENDERED_VIEWS_SIZE:
+                            del self.rendered_views[next(iter(self.rendered_views))]
+                        self.rendered_views[(record["id"], cls)] = msg
                 await self.bot.send_message(message.chat.id,msg)
 
-
-    def _calculate_progress(self, record) -> float:
-            cls = record.__class__
-            if (record.id,cls) in Statics.COMPONENTS_PROGRESS.keys():
-                return Statics.COMPONENTS_PROGRESS[(record.id, cls)]
-            else:
-                sum_completed = 0
-                sum_all = 0
-                child_records = record.child_tasks
-                if not child_records and cls == BDTask:
-                    Statics.COMPONENTS_PROGRESS[(record.id,cls)] = record.completed * 100
-                    return record.completed * 100
-                for rec in child_records:
-                    rec_progress = self._calculate_progress(rec) / 100
-                    sum_all += rec.weight
-                    if rec.completed:
-                        sum_completed += rec_progress * rec.weight
-                record_progress = sum_completed / sum_all * 100 if sum_all > 0 else 0
-                Statics.COMPONENTS_PROGRESS[(record.id,cls)] = record_progress
-                return record_progress
-
-    @staticmethod
-    def create_progress_bar(progress: float, total_length: int = 10, filled_char: str = "█",
-                            empty_char: str = "░") -> str:
+    def _load_view(self, cls, record):
         """
-        Generates a text-based progress bar.
+        Loads the progress of a record and the (depth, name, progress) of the tasks /view shows below it.
 
-        Args:
-            progress: A float representing the progress percentage (0.0 to 100.0).
-            total_length: The total length of the progress bar in characters.
-            filled_char: The character to use for the filled portion of the bar.
-            empty_char: The character to use for the empty portion of the bar.
-
-        Returns:
-            A string representing the progress bar.
-        Raises:
-            ValueError: If progress is not a float between 0 and 100.
+        Reads the record's tasks with one query, in the caller's unit of work.
         """
-        if not isinstance(progress, (int, float)):
-            raise TypeError("Progress must be a number (int or float)")
-
-        if not 0 <= progress <= 100:
-            raise ValueError("Progress must be between 0 and 100")
-
-        filled_length = int(total_length * progress / 100)
-        bar = filled_char * filled_length + empty_char * (total_length - filled_length)
-        return bar
+        tasks = self.database.get_subtree(cls, record["id"])
+        record_progress = self._calculate_progress(cls, record, tasks)
+        children_of: dict[int | None, list[dict[str, Any]]] = {}
+        for task in tasks:
+            children_of.setdefault(task["parent_id"], []).append(task)
+        roots = children_of.get(None if cls is BDWorkspace else record["id"], [])
+        children = [(depth, child["name"], Statics.COMPONENTS_PROGRESS[(child["id"], BDTask)])
+                    for child, _, depth in iter_dfs(roots, lambda task: children_of.get(task["id"], []),
+                                                    max_depth=VIEW_DEPTH, key=lambda task: task["id"])]
+        return record_progress, children
+
+
+    async def _export_something(self, message):
+        username = message.chat.username
+        self.logger.info("User %s triggered _export_something", username)
+        split_text = message.text.split()
+        file_format = split_text.pop() if split_text[-1] in EXPORT_FORMATS else "json"
+        if len(split_text) < RECORD_COMMAND_WORDS or split_text[1] != BDWorkspace.__name__:
+            await self.bot.send_message(message.chat.id,
+                                        "Please specify what you want to export\n"
+                                        "Example: /export Workspace Workspace_Name csv")
+            return
+        name = ' '.join(split_text[2:])
+        with self.unit(message, read_only=True):
+            records = self.database.get_by_custom_fields(BDWorkspace, name=name, owner_name=username)
+        if not records:
+            await self.bot.send_message(message.chat.id,
+                                        f"Record with name {name} in component {BDWorkspace.__name__} doesn't exist")
+            return
+        workspace = records[0]
+        # Streamed with a session of its own, no unit is held open while the document is sent
+        tasks = self.database.iter_workspace_tree(workspace["id"])
+        with tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE) as document:
+            for chunk in EXPORT_FORMATS[file_format](workspace, tasks):
+                document.write(chunk.encode('utf-8'))
+            document.seek(0)
+            await self.bot.send_document(message.chat.id, document,
+                                         visible_file_name=f"{workspace['name']}.{file_format}")
+
+    async def _import_something(self, message):
+        username = message.chat.username
+        file_name = message.document.file_name or ""
+        file_format = file_name.rsplit('.', 1)[-1].lower()
+        self.logger.info("User %s triggered _import_something with %s", username, file_name)
+        if file_format not in IMPORT_FORMATS:
+            await self.bot.reply_to(message, f"Only {', '.join(IMPORT_FORMATS)} files exported with /export can be imported")
+            return
+        try:
+            file_info = await self.bot.get_file(message.document.file_id)
+            content = await self.bot.download_file(file_info.file_path)
+            with io.TextIOWrapper(io.BytesIO(content), encoding='utf-8', newline='') as stream, self.unit(message):
+                name, count = self.database.import_tree(username, IMPORT_FORMATS[file_format](stream))
+        except (SQLAlchemyError, ValueError, KeyError) as e:
+            self.logger.error("Error upon importing %s for %s - %s", file_name, username, e, exc_info=True)
+            await self.bot.reply_to(message, f"There was an error with your request\n{e}")
+        else:
+            await self.bot.reply_to(message, f"Successfully imported Workspace named: {name} with {count} Tasks.")
 
-    @staticmethod
-    def create_telegram_progress_bar(progress: float) -> str:
+    def _calculate_progress(self, cls, record, tasks) -> float:
         """
-        Creates a Telegram-friendly progress bar using Unicode characters.  Includes
-        percentage.
+        Progress of a workspace or task record, cached with the progress of every task below it.
 
         Args:
-            progress:  A float representing the progress (0.0 - 100.0)
-
-        Returns:
-            A string representing a Telegram-compatible progress bar
+            cls: BDWorkspace or BDTask.
+            record: The record as a dict.
+            tasks: Rows of the record's tasks, see `TaskRepository.get_subtree`.
         """
-        bar = Bot.create_progress_bar(progress, total_length=10)  # Adjust length as needed
-        percentage = f"{progress:.1f}%"  # Format percentage with one decimal place
-        return f"[{bar}] {percentage}"  # Combine bar and percentage
+        key = (record["id"], cls)
+        # A cached record with an uncached task below it is computed again, /view shows their progress too
+        if key in Statics.COMPONENTS_PROGRESS and all((task["id"], BDTask) in Statics.COMPONENTS_PROGRESS
+                                                      for task in tasks):
+            return Statics.COMPONENTS_PROGRESS[key]
+        # Imported on first use, NumPy is the slowest import of the bot
+        from core.services.progress_engine import progress_of_rows  # noqa: PLC0415
+        record_progress, tasks_progress = progress_of_rows(tasks, None if cls is BDWorkspace else record["id"])
+        for task_id, task_progress in tasks_progress.items():
+            Statics.COMPONENTS_PROGRESS[(task_id, BDTask)] = task_progress
+        Statics.COMPONENTS_PROGRESS[key] = record_progress
+        return record_progress
+
+    # Kept on Bot for callers of the former static methods
+    create_progress_bar = staticmethod(create_progress_bar)
+    create_telegram_progress_bar = staticmethod(create_telegram_progress_bar)
 
     async def start_polling(self):
         self.log("Starting bot polling...")
-        await self.bot.polling()
+        self.monitor.start()
+        try:
+            await self.bot.polling()
+        finally:
+            await self.monitor.stop()
 
 
-async def main():
-    load_dotenv()
-    token = os.getenv('TOKEN')
+async def warm_up(settings: Settings, telegram_bot: Bot | None = None) -> None:
+    """Opens the pooled connections and preloads the cache before updates are taken."""
+    # The schema is set up by `python -m database.migrate` before the bot starts
+    await asyncio.gather(
+        asyncio.to_thread(get_sql_manager().warm_up, settings.warm_up_connections),
+        asyncio.to_thread(get_redis_manager().warm_up, settings.warm_up_connections),
+    )
+    if telegram_bot is not None:
+        await telegram_bot.offloader.warm_up()
+    if settings.cache_warm_up_users:
+        await asyncio.to_thread(warm_up_cache, get_sql_manager(), get_redis_manager(),
+                                WarmUpLimits.from_settings(settings), progress=Statics.COMPONENTS_PROGRESS)
 
-    telegram_bot = Bot(token)
-    await telegram_bot.start_polling()
+
+async def main():
+    settings = get_settings()
+    listener = setup_logging(level=settings.log_level,
+                             json_output=settings.log_json,
+                             module_levels={"sqlalchemy.engine": logging.WARNING})
+
+    telegram_bot = None
+    try:
+        telegram_bot = Bot(settings=settings)
+        await warm_up(settings, telegram_bot)
+        signal_ready(settings.ready_file)
+        await telegram_bot.start_polling()
+    finally:
+        if telegram_bot is not None:
+            telegram_bot.offloader.shutdown()
+        clear_ready(settings.ready_file)
+        listener.stop()
 
 
 if __name__ == '__main__':
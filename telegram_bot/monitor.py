@@ -0,0 +1,136 @@
+"""
+Measures how far the bot falls behind: event loop lag, handlers waiting for
+a slot and running, and the age of the updates being handled.
+
+The numbers are logged every `report_seconds` as one record whose fields are
+passed through `extra=`, so JSON logs (LOG_JSON) carry them as separate keys,
+and `LoopMonitor.snapshot()` returns them for anything else that wants them.
+When the loop doesn't get back to the monitor for `block_threshold` seconds,
+a watchdog thread logs the stack the loop thread is stuck in.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+class LoopMonitor:
+    def __init__(self, interval: float = 0.5, block_threshold: float = 0.5, report_seconds: float = 60.0):
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self.report_seconds = report_seconds
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.waiting = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.max_update_age = 0.0
+        self.handled = 0
+        self.blocked = 0
+        self._last_tick = time.monotonic()
+        self._sampled_tick: float | None = None
+        self._loop_thread: int | None = None
+        self._task: asyncio.Task | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stopped = threading.Event()
+
+    @contextmanager
+    def queued(self, message) -> Iterator[None]:
+        """Counts a handler waiting for a slot, and the age of its update."""
+        date = getattr(message, "date", None)
+        if isinstance(date, (int, float)):
+            self.max_update_age = max(self.max_update_age, time.time() - date)
+        self.waiting += 1
+        try:
+            yield
+        finally:
+            self.waiting -= 1
+
+    @contextmanager
+    def running(self) -> Iterator[None]:
+        """Counts a handler that got its slot."""
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.handled += 1
+
+    def snapshot(self, reset: bool = False) -> dict[str, Any]:
+        """Current numbers; maxima and counts cover the time since the last reset."""
+        stats = {
+            "loop_lag_ms": round(self.lag * 1000, 1),
+            "max_loop_lag_ms": round(self.max_lag * 1000, 1),
+            "handlers_waiting": self.waiting,
+            "handlers_in_flight": self.in_flight,
+            "max_handlers_in_flight": self.max_in_flight,
+            "max_update_age_s": round(self.max_update_age, 1),
+            "handled": self.handled,
+            "blocked_samples": self.blocked,
+        }
+        if reset:
+            self.max_lag = self.max_update_age = 0.0
+            self.max_in_flight = self.in_flight
+            self.handled = self.blocked = 0
+        return stats
+
+    def start(self) -> None:
+        """Starts measuring, must be called on the event loop of the bot."""
+        if self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._measure())
+        if self.block_threshold > 0:
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+
+    async def _measure(self) -> None:
+        last_report = time.monotonic()
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            self._last_tick = now = time.monotonic()
+            self.lag = max(now - expected, 0.0)
+            self.max_lag = max(self.max_lag, self.lag)
+            if now - last_report >= self.report_seconds:
+                last_report = now
+                stats = self.snapshot(reset=True)
+                logger.info("Loop stats %s", stats, extra=stats)
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(min(self.interval, self.block_threshold) / 2):
+            tick = self._last_tick
+            stalled = time.monotonic() - tick - self.interval
+            if stalled < self.block_threshold or tick == self._sampled_tick:
+                continue
+            # One sample per stall, taken while the loop thread is still stuck
+            self._sampled_tick = tick
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            self.blocked += 1
+            logger.warning("Event loop blocked for %.2fs in:\n%s",
+                           stalled, "".join(traceback.format_stack(frame)))
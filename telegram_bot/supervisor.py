@@ -0,0 +1,314 @@
+"""
+Runs the bot as several worker processes behind one supervisor.
+
+The supervisor is the only process that takes updates from Telegram, by long
+polling or through `Supervisor.dispatch` from a webhook. Each update goes to
+the worker picked by consistent hashing of its chat id, so one chat is always
+served by the same worker, in order, and adding a worker only moves about
+1/N of the chats.
+
+Usage: python -m telegram_bot.supervisor [workers]
+
+The number of workers defaults to the BOT_WORKERS setting. SIGHUP restarts
+the workers one by one; updates sent to a restarting worker wait in its queue.
+"""
+import asyncio
+import bisect
+import hashlib
+import logging
+import multiprocessing
+import signal
+import sys
+import threading
+import weakref
+from collections.abc import Awaitable, Callable, Hashable, Iterable
+from multiprocessing.context import BaseContext
+from multiprocessing.process import BaseProcess
+from multiprocessing.queues import Queue
+from multiprocessing.synchronize import Event
+from typing import Any
+
+from resources.config import Settings, get_settings
+from resources.logging_config import setup_logging
+from resources.readiness import clear_ready, signal_ready
+
+logger = logging.getLogger(__name__)
+
+# Points per worker on the ring, enough for an even split of chats
+HASH_REPLICAS = 128
+# Put on a worker's queue to make it finish the updates it has and exit
+STOP = None
+
+Update = dict[str, Any]
+WorkerTarget = Callable[[int, Queue, Event, Settings], None]
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hashing of keys onto `nodes`, stable across processes and restarts."""
+
+    def __init__(self, nodes: Iterable[int], replicas: int = HASH_REPLICAS):
+        points = sorted((_hash(f"{node}:{replica}"), node) for node in nodes for replica in range(replicas))
+        if not points:
+            raise ValueError("HashRing needs at least one node")
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key: Hashable) -> int:
+        index = bisect.bisect(self._hashes, _hash(str(key)))
+        return self._nodes[index % len(self._nodes)]
+
+
+def chat_id_of(update: Update) -> int | None:
+    """Id of the chat an update belongs to, None for updates without a chat (e.g. inline queries)."""
+    for field in ("message", "edited_message", "channel_post", "edited_channel_post"):
+        if field in update:
+            return update[field]["chat"]["id"]
+    message = update.get("callback_query", {}).get("message")
+    if message:
+        return message["chat"]["id"]
+    return None
+
+
+def routing_key(update: Update) -> Hashable:
+    """The chat id, or the update id for updates that no chat orders."""
+    chat_id = chat_id_of(update)
+    return chat_id if chat_id is not None else f"update:{update['update_id']}"
+
+
+async def consume(updates: Queue, handle: Callable[[Update], Awaitable[Any]]) -> int:
+    """
+    Handles the updates of `updates` until STOP, then waits for the handlers still running.
+
+    Updates of one chat are handled one after the other in arrival order,
+    updates of different chats concurrently. Returns the number of updates handled.
+    """
+    chat_locks: weakref.WeakValueDictionary[Hashable, asyncio.Lock] = weakref.WeakValueDictionary()
+    pending: set[asyncio.Task] = set()
+
+    async def handle_in_order(update: Update) -> None:
+        # Tasks start and locks are granted first come first served, which keeps a chat's order
+        lock = chat_locks.setdefault(routing_key(update), asyncio.Lock())
+        async with lock:
+            try:
+                await handle(update)
+            except Exception:
+                logger.exception("Update %s failed", update.get("update_id"))
+
+    handled = 0
+    while (update := await asyncio.to_thread(updates.get)) is not STOP:
+        task = asyncio.create_task(handle_in_order(update))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+        handled += 1
+    await asyncio.gather(*pending)
+    return handled
+
+
+async def _serve(index: int, updates: Queue, ready: Event, settings: Settings) -> None:
+    # Imported here, the supervisor itself never loads the bot and its dependencies
+    from telebot import types  # noqa: PLC0415
+
+    from telegram_bot.bot import Bot, warm_up  # noqa: PLC0415
+
+    listener = setup_logging(filename=f"telegram_bot/bot.{index}.log",
+                             level=settings.log_level,
+                             json_output=settings.log_json,
+                             module_levels={"sqlalchemy.engine": logging.WARNING})
+    telegram_bot = None
+    try:
+        telegram_bot = Bot(settings=settings)
+        await warm_up(settings, telegram_bot)
+        ready.set()
+        telegram_bot.monitor.start()
+        handled = await consume(updates,
+                                lambda update: telegram_bot.bot.process_new_updates([types.Update.de_json(update)]))
+        logger.info("Worker %s stopped after %s updates", index, handled)
+    finally:
+        if telegram_bot is not None:
+            await telegram_bot.monitor.stop()
+            telegram_bot.offloader.shutdown()
+        listener.stop()
+
+
+def run_worker(index: int, updates: Queue, ready: Event, settings: Settings) -> None:
+    """Entry point of a worker process: a bot fed from `updates` instead of polling, sets `ready` once warmed up."""
+    asyncio.run(_serve(index, updates, ready, settings))
+
+
+class Supervisor:
+    """
+    Starts `workers` processes running `target` and routes updates to them.
+
+    Every worker owns a queue that outlives its process, so restarting a
+    worker loses none of the updates routed to it, and a ready event that
+    is cleared whenever a process of it starts.
+    """
+
+    def __init__(self,
+                 workers: int,
+                 settings: Settings,
+                 target: WorkerTarget = run_worker,
+                 context: BaseContext | None = None):
+        # Spawned, not forked: workers must not share the supervisor's sockets and pools
+        self._context = context or multiprocessing.get_context("spawn")
+        self.settings = settings
+        self.target = target
+        self.ring = HashRing(range(workers))
+        self.queues: list[Queue] = [self._context.Queue() for _ in range(workers)]
+        self.ready: list[Event] = [self._context.Event() for _ in range(workers)]
+        self.processes: list[BaseProcess | None] = [None] * workers
+        self._restarting: set[int] = set()
+        self._restart_requested = threading.Event()
+        self._stopping = False
+
+    def _start_worker(self, index: int) -> None:
+        self.ready[index].clear()
+        process = self._context.Process(target=self.target,
+                                        args=(index, self.queues[index], self.ready[index], self.settings),
+                                        name=f"bot-worker-{index}",
+                                        # Not a daemon, daemons can't start the bot's offload pool
+                                        daemon=False)
+        process.start()
+        self.processes[index] = process
+
+    def _wait_ready(self, indexes: Iterable[int], timeout: float | None) -> None:
+        """
+        Waits for each of the workers to be warmed up.
+
+        Raises:
+            TimeoutError: If one of them isn't ready within `timeout` seconds.
+        """
+        for index in indexes:
+            if not self.ready[index].wait(timeout):
+                raise TimeoutError(f"Worker {index} wasn't ready within {timeout}s")
+            logger.info("Worker %s is ready", index)
+
+    def start(self, timeout: float | None = None) -> None:
+        """Starts every worker and returns once all of them are warmed up."""
+        for index in range(len(self.processes)):
+            self._start_worker(index)
+        self._wait_ready(range(len(self.processes)), timeout)
+
+    def dispatch(self, update: Update) -> int:
+        """Queues `update` for the worker of its chat and returns that worker's index."""
+        index = self.ring.node_for(routing_key(update))
+        self.queues[index].put(update)
+        return index
+
+    def _join(self, index: int, timeout: float) -> None:
+        process = self.processes[index]
+        process.join(timeout)
+        if process.is_alive():
+            logger.warning("Worker %s didn't stop within %ss, terminating it", index, timeout)
+            process.terminate()
+            process.join()
+
+    def restart(self, index: int, timeout: float = 30.0) -> None:
+        """
+        Lets worker `index` finish the updates queued before this call, then replaces it.
+
+        Updates dispatched meanwhile stay queued for the new process.
+        """
+        self._restarting.add(index)
+        try:
+            self.queues[index].put(STOP)
+            self._join(index, timeout)
+            self._start_worker(index)
+            self._wait_ready([index], timeout)
+        finally:
+            self._restarting.discard(index)
+
+    def restart_all(self, timeout: float = 30.0) -> None:
+        """Rolling restart, e.g. after a deploy: one worker at a time is down."""
+        for index in range(len(self.processes)):
+            self.restart(index, timeout)
+
+    def request_restart(self) -> None:
+        """Asks `poll` for a rolling restart; safe to call from a signal handler."""
+        self._restart_requested.set()
+
+    def check_workers(self) -> list[int]:
+        """Restarts workers that exited on their own and returns their indexes."""
+        revived = []
+        for index, process in enumerate(self.processes):
+            if process is None or process.is_alive() or index in self._restarting or self._stopping:
+                continue
+            logger.error("Worker %s exited with code %s, restarting it", index, process.exitcode)
+            if process.exitcode < 0:
+                # Killed by a signal, maybe while holding the queue's read lock; the updates
+                # still buffered in the old queue are lost along with the ones it was handling
+                self.queues[index] = self._context.Queue()
+            self._start_worker(index)
+            revived.append(index)
+        return revived
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """Lets every worker finish its queued updates, then waits for them to exit."""
+        self._stopping = True
+        for index, process in enumerate(self.processes):
+            if process is not None:
+                self.queues[index].put(STOP)
+        for index, process in enumerate(self.processes):
+            if process is not None:
+                self._join(index, timeout)
+
+    async def poll(self, token: str, timeout: int = 20) -> None:
+        """Long polls Telegram and dispatches the updates until `stop` is called or the task is cancelled."""
+        # Raw dicts, the workers parse them; the supervisor never builds telebot objects
+        from telebot import asyncio_helper  # noqa: PLC0415
+
+        offset = None
+        restarts: set[asyncio.Task] = set()
+        while not self._stopping:
+            if self._restart_requested.is_set():
+                self._restart_requested.clear()
+                task = asyncio.create_task(asyncio.to_thread(self.restart_all))
+                restarts.add(task)
+                task.add_done_callback(restarts.discard)
+            self.check_workers()
+            try:
+                updates = await asyncio_helper.get_updates(token, offset, None, timeout,
+                                                             request_timeout=timeout + 10)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Polling failed, retrying")
+                await asyncio.sleep(1)
+                continue
+            for update in updates:
+                self.dispatch(update)
+                offset = update["update_id"] + 1
+        await asyncio.gather(*restarts)
+
+
+async def main() -> None:
+    settings = get_settings()
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else settings.bot_workers
+    listener = setup_logging(filename="telegram_bot/supervisor.log",
+                             level=settings.log_level,
+                             json_output=settings.log_json)
+    supervisor = Supervisor(workers, settings)
+    try:
+        await asyncio.to_thread(supervisor.start)
+        signal_ready(settings.ready_file)
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGHUP, supervisor.request_restart)
+        polling = asyncio.create_task(supervisor.poll(settings.token))
+        for stop_signal in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(stop_signal, polling.cancel)
+        try:
+            await polling
+        except asyncio.CancelledError:
+            logger.info("Stopping %s workers", workers)
+    finally:
+        clear_ready(settings.ready_file)
+        await asyncio.to_thread(supervisor.stop)
+        listener.stop()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
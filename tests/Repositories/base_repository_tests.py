@@ -1,17 +1,20 @@
 import pytest
+from redis.client import Pipeline
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session, close_all_sessions
 
 from core.models_sql_alchemy.models import Base, User
 from database.database_manager import RedisDatabaseManager, SQLDatabaseManager
 from database.repositories.base_repository import BaseRepository
 
-sql_string = "sqlite:///:memory:"
 
 @pytest.fixture
-def repository():
-    manager = SQLDatabaseManager(sql_string)
+def repository(database_url):
+    manager = SQLDatabaseManager(database_url)
     repository = BaseRepository(manager, RedisDatabaseManager())
     yield repository
+    repository.redis_db_manager.get_connection().flushdb()
+    close_all_sessions()
     Base.metadata.drop_all(manager.engine)
 
 def test_create_success(repository):
@@ -172,3 +175,66 @@ def test_get_all_failure(repository):
     users_from_db = repository.get_all(User)
 
     assert [] == users_from_db
+
+def test_upsert_inserts_and_updates(repository):
+    assert repository.upsert(User, ["username"], {"username": "Acie", "telegram_username": "Acie"}) == \
+        {"username": "Acie", "active": True, "telegram_username": "Acie"}
+
+    updated = repository.upsert(User, ["username"], {"username": "Acie", "telegram_username": "Other"})
+
+    assert updated["telegram_username"] == "Other"
+    assert repository.get_by_id(User, "Acie")["telegram_username"] == "Other"
+
+def test_upsert_only_keys_keeps_record(repository):
+    repository.create(User, username="Acie", active=False, telegram_username="Acie")
+
+    assert repository.upsert(User, ["username"], {"username": "Acie"}) == \
+        {"username": "Acie", "active": False, "telegram_username": "Acie"}
+
+def test_get_many_by_id_round_trips(repository, mocker):
+    for username in ["Acie", "Bob", "Cid"]:
+        repository.create(User, username=username, active=True, telegram_username=username)
+    repository.get_by_id(User, "Bob")
+    redis_conn = repository.redis_db_manager.get_connection()
+    execute = mocker.spy(Pipeline, "execute")
+
+    records = repository.get_many_by_id(User, ["Cid", "Bob", "Acie"])
+
+    assert [record["username"] for record in records] == ["Cid", "Bob", "Acie"]
+    # One pipeline reads the cache, one caches the misses
+    assert execute.call_args_list == [mocker.call(mocker.ANY)] * 2
+    # The misses were cached on the way
+    assert repository.get_many_by_id(User, ["Acie", "Cid"]) == [records[2], records[0]]
+    assert redis_conn.get("get_by_id:user:item_id:Acie") is not None
+
+def test_redis_client_is_shared(repository):
+    manager = repository.redis_db_manager
+    assert manager.get_connection() is manager.get_connection()
+
+def test_get_many_by_id_hits_misses_and_unknown_ids(repository, mocker):
+    for username in ["Acie", "Bob", "Cid", "Dee"]:
+        repository.create(User, username=username, active=True, telegram_username=username)
+    repository.get_many_by_id(User, ["Bob", "Dee"])
+    scalars = mocker.spy(Session, "scalars")
+
+    records = repository.get_many_by_id(User, ["Dee", "Nobody", "Acie", "Bob", "Cid", "Acie", "Ghost"],
+                                        chunk_size=2)
+
+    assert [record and record["username"] for record in records] == \
+        ["Dee", None, "Acie", "Bob", "Cid", "Acie", None]
+    # Misses Nobody, Acie, Cid, Ghost in two IN queries of at most two ids
+    assert scalars.call_args_list == [mocker.call(mocker.ANY, mocker.ANY)] * 2
+    scalars.reset_mock()
+    assert repository.get_many_by_id(User, ["Ghost", "Cid"]) == [None, records[4]]
+    scalars.assert_not_called()
+
+def test_get_many_by_id_after_update(repository):
+    repository.create(User, username="Acie", active=True, telegram_username="Acie")
+    repository.get_many_by_id(User, ["Acie"])
+
+    repository.update(User, "Acie", telegram_username="Other")
+
+    assert repository.get_many_by_id(User, ["Acie"])[0]["telegram_username"] == "Other"
+
+def test_get_many_by_id_empty(repository):
+    assert repository.get_many_by_id(User, []) == []
@@ -0,0 +1,95 @@
+import pytest
+from sqlalchemy.orm import close_all_sessions
+
+from core.models_sql_alchemy.models import Base, Task, User, UserState, Workspace
+from database import cache_warmup
+from database.cache_warmup import WarmUpLimits, recent_users, warm_up_cache
+from database.database_manager import RedisDatabaseManager, SQLDatabaseManager
+from database.repositories.all_repositories import UserRepository
+from database.repositories.base_repository import BaseRepository, cache_key, cache_stats
+
+
+@pytest.fixture
+def repository(database_url):
+    manager = SQLDatabaseManager(database_url, echo=False)
+    repository = UserRepository(manager, RedisDatabaseManager())
+    for username in ["Quiet", "Busy", "Newest"]:
+        repository.create(username)
+    for username in ["Busy", "Newest"]:
+        BaseRepository.create(repository, Workspace, name="Home", owner_name=username)
+    workspace_ids = {workspace["owner_name"]: workspace["id"] for workspace in repository.get_all(Workspace)}
+    BaseRepository.create(repository, Task, name="Old", workspace_id=workspace_ids["Busy"], owner_name="Busy")
+    BaseRepository.create(repository, Task, name="Done", workspace_id=workspace_ids["Newest"],
+                          owner_name="Newest", completed=True, weight=3)
+    BaseRepository.create(repository, Task, name="Todo", workspace_id=workspace_ids["Newest"],
+                          owner_name="Newest", weight=1)
+    repository.set_state("Busy", "/create_Task")
+    redis_conn = repository.redis_db_manager.get_connection()
+    # As after a deploy: SQL has the data, the cache is empty
+    redis_conn.flushdb()
+    cache_stats.reset()
+    yield repository
+    redis_conn.flushdb()
+    close_all_sessions()
+    Base.metadata.drop_all(manager.engine)
+
+def test_recent_users_by_latest_task(repository):
+    with repository.db_manager.get_session() as session:
+        assert recent_users(session, 10) == ["Newest", "Busy", "Quiet"]
+        assert recent_users(session, 1) == ["Newest"]
+
+def test_warm_up_serves_first_requests_from_cache(repository):
+    progress = {}
+    report = warm_up_cache(repository.db_manager, repository.redis_db_manager, progress=progress)
+
+    assert (report.users, report.truncated) == (3, False)
+    assert repository.get_by_id(UserState, "Busy") == {"telegram_username": "Busy", "state": "/create_Task"}
+    [workspace] = repository.get_by_custom_fields(Workspace, name="Home", owner_name="Newest")
+    assert repository.get_by_custom_fields(Workspace, owner_name="Quiet") == []
+    assert cache_stats.misses.total() == 0
+    assert progress[(workspace["id"], Workspace)] == pytest.approx(75)
+    assert report.progress_entries == len(progress)
+    # Both workspaces of the recent users and their three tasks
+    assert sorted(progress.values()) == [0.0, 0.0, 0.0, 75.0, 100.0]
+
+def test_warm_up_keeps_cached_values(repository):
+    redis_conn = repository.redis_db_manager.get_connection()
+    redis_conn.set(cache_key("get_by_id", UserState, "Busy"), '{"telegram_username": "Busy", "state": "newer"}')
+
+    warm_up_cache(repository.db_manager, repository.redis_db_manager)
+
+    assert repository.get_by_id(UserState, "Busy")["state"] == "newer"
+
+def test_warm_up_key_budget(repository):
+    report = warm_up_cache(repository.db_manager, repository.redis_db_manager,
+                           WarmUpLimits(max_keys=1, batch_size=1))
+
+    assert (report.users, report.truncated) == (1, True)
+    assert repository.get_by_id(UserState, "Newest") is not None
+    repository.get_by_id(UserState, "Quiet")
+    assert cache_stats.misses["get_by_id"] == 1
+
+def test_warm_up_entries_expire(repository):
+    limits = WarmUpLimits(ttl=60)
+    warm_up_cache(repository.db_manager, repository.redis_db_manager, limits)
+
+    ttl = repository.redis_db_manager.get_connection().ttl(cache_key("get_by_id", UserState, "Busy"))
+    assert 0 < ttl <= limits.ttl
+
+def test_warm_up_skips_models_invalidated_after_the_read(repository, mocker):
+    load_entries = cache_warmup._load_entries
+
+    def write_meanwhile(session, usernames):
+        loaded = load_entries(session, usernames)
+        # Committed and invalidated after the batch read its rows
+        repository.set_state("Busy", "/create_Workspace")
+        return loaded
+    mocker.patch.object(cache_warmup, "_load_entries", side_effect=write_meanwhile)
+
+    report = warm_up_cache(repository.db_manager, repository.redis_db_manager)
+
+    # The state of every user
+    assert report.skipped == report.users
+    assert repository.get_by_id(UserState, "Busy")["state"] == "/create_Workspace"
+    assert repository.get_by_id(User, "Busy")["username"] == "Busy"
+    assert cache_stats.misses["get_by_id"] == 1
@@ -0,0 +1,126 @@
+import pytest
+from sqlalchemy.orm import close_all_sessions
+
+from core.models_sql_alchemy.models import Base, Task, User, Workspace
+from database.database_manager import RedisDatabaseManager, SQLDatabaseManager
+from database.repositories.all_repositories import TaskRepository
+from database.repositories.change_events import (
+    CREATED,
+    DELETED,
+    PROGRESS_FIELDS,
+    VIEW_FIELDS,
+    CacheRegion,
+    SubtreeEntries,
+    register_region,
+    unregister_region,
+)
+
+
+class Recorder(CacheRegion):
+    models = (Task, Workspace)
+
+    def __init__(self):
+        self.calls = []
+
+    def invalidate(self, changes):
+        self.calls.append(list(changes))
+
+@pytest.fixture
+def repository(database_url):
+    manager = SQLDatabaseManager(database_url, echo=False)
+    repository = TaskRepository(manager, RedisDatabaseManager())
+    repository.create(User, username="Acie", telegram_username="Acie")
+    repository.create(Workspace, name="Home", owner_name="Acie")
+    repository.create(Workspace, name="Work", owner_name="Acie")
+    repository.create(Task, name="Root", workspace_id=1, owner_name="Acie")
+    repository.create(Task, name="Child", workspace_id=1, owner_name="Acie", parent_id=1)
+    repository.create(Task, name="Leaf", workspace_id=1, owner_name="Acie", parent_id=2)
+    repository.create(Task, name="Sibling", workspace_id=1, owner_name="Acie", parent_id=1)
+    repository.create(Task, name="Other", workspace_id=2, owner_name="Acie")
+    yield repository
+    for name in ("progress", "views", "recorder"):
+        unregister_region(name)
+    repository.redis_db_manager.get_connection().flushdb()
+    close_all_sessions()
+    Base.metadata.drop_all(manager.engine)
+
+@pytest.fixture
+def progress():
+    entries = {(task_id, Task): 0.0 for task_id in range(1, 6)} | {(1, Workspace): 0.0, (2, Workspace): 0.0}
+    register_region("progress", SubtreeEntries(entries, PROGRESS_FIELDS))
+    return entries
+
+def test_completing_a_task_drops_the_progress_above_it(repository, progress):
+    repository.update(Task, 3, completed=True)
+
+    assert set(progress) == {(4, Task), (5, Task), (2, Workspace)}
+
+def test_changes_outside_the_fields_keep_entries(repository, progress):
+    entries = dict(progress)
+    views = dict(progress)
+    register_region("views", SubtreeEntries(views, VIEW_FIELDS))
+
+    repository.update(Task, 3, description="Details")
+
+    assert progress == entries
+    assert set(views) == {(4, Task), (5, Task), (2, Workspace)}
+
+def test_moving_a_task_drops_both_subtrees(repository, progress):
+    repository.update(Task, 3, parent_id=5, workspace_id=2)
+
+    assert set(progress) == {(4, Task)}
+
+def test_created_and_deleted_tasks_drop_their_ancestors(repository, progress):
+    repository.create(Task, name="New", workspace_id=2, owner_name="Acie", parent_id=5)
+    assert (5, Task) not in progress and (2, Workspace) not in progress
+    assert (1, Workspace) in progress
+
+    repository.delete(Task, 4)
+    assert set(progress) == {(2, Task), (3, Task)}
+
+def test_changes_of_a_unit_are_published_once_after_commit(repository):
+    recorder = Recorder()
+    register_region("recorder", recorder)
+
+    with pytest.raises(RuntimeError), repository.transaction():
+        repository.update(Task, 3, completed=True)
+        raise RuntimeError()
+    assert recorder.calls == []
+
+    with repository.transaction():
+        repository.update(Task, 3, completed=True)
+        repository.update(Task, 4, completed=False)
+        repository.create(Workspace, name="Garden", owner_name="Acie")
+        assert recorder.calls == []
+    [changes] = recorder.calls
+    assert [(change.model, change.item_id, change.kind) for change in changes] == [
+        (Task, 3, "updated"), (Workspace, 3, CREATED)]
+    assert changes[0].fields == {"completed"}
+    assert changes[0].ancestor_ids == (1, 2)
+
+def test_tree_writes_publish_their_tasks(repository, progress):
+    recorder = Recorder()
+    register_region("recorder", recorder)
+
+    repository.create_tree("Acie", [{"name": "Batch", "workspace_name": "Work", "parent_name": "Other"}])
+    assert (5, Task) not in progress and (2, Workspace) not in progress
+
+    repository.import_tree("Acie", iter([("workspace", {"name": "Imported"}),
+                                         ("task", {"id": 1, "name": "Imported task", "weight": 1})]))
+    assert (repository.resolve_name_id(Task, "Acie", "Batch"),
+            repository.resolve_name_id(Task, "Acie", "Imported task")) == (6, 7)
+    [tasks], [workspace, imported] = recorder.calls
+    assert tasks.ancestor_ids == (5,)
+    assert (workspace.model, imported.model, imported.item_id) == (Workspace, Task, None)
+
+def test_deleted_user_forgets_name_indexes(repository):
+    recorder = Recorder()
+    recorder.models = (User,)
+    register_region("recorder", recorder)
+    assert repository.resolve_name_id(Workspace, "Acie", "Home") == 1
+
+    repository.delete(User, "Acie")
+
+    [[change]] = recorder.calls
+    assert change.kind == DELETED and change.before["username"] == "Acie"
+    assert repository.redis_db_manager.get_connection().exists("name_index:workspace:Acie") == 0
@@ -0,0 +1,66 @@
+import os
+import shutil
+import socket
+import subprocess
+
+import pytest
+
+SQLITE_URL = "sqlite:///:memory:"
+
+
+def find_postgres_binary(name):
+    bin_dir = os.getenv("POSTGRES_BIN")
+    if bin_dir:
+        path = os.path.join(bin_dir, name)
+        return path if os.access(path, os.X_OK) else None
+    return shutil.which(name)
+
+
+def skip_without_postgres(reason):
+    """Skips, or fails when REQUIRE_POSTGRES is set, so a run meant to cover PostgreSQL can't pass without it."""
+    if os.getenv("REQUIRE_POSTGRES"):
+        pytest.fail(f"{reason}, but REQUIRE_POSTGRES is set")
+    pytest.skip(reason)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="session")
+def postgres_server(tmp_path_factory):
+    """
+    Local PostgreSQL started from a temporary data directory for the whole session.
+
+    Uses initdb and pg_ctl from POSTGRES_BIN or the PATH, skips when they or psycopg are missing.
+    """
+    try:
+        import psycopg  # noqa: F401, PLC0415
+    except ImportError:
+        skip_without_postgres("psycopg is not installed")
+    initdb, pg_ctl = find_postgres_binary("initdb"), find_postgres_binary("pg_ctl")
+    if initdb is None or pg_ctl is None:
+        skip_without_postgres("PostgreSQL server binaries not found, set POSTGRES_BIN")
+
+    data_dir = tmp_path_factory.mktemp("postgres")
+    port = free_port()
+    subprocess.run([initdb, "-D", str(data_dir), "-U", "postgres", "-A", "trust"],
+                   check=True, capture_output=True)
+    subprocess.run([pg_ctl, "-D", str(data_dir), "-l", str(data_dir / "server.log"), "-w",
+                    "-o", f"-p {port} -k {data_dir} -c listen_addresses=127.0.0.1 -c fsync=off", "start"],
+                   check=True, capture_output=True)
+    try:
+        yield f"postgresql+psycopg://postgres@127.0.0.1:{port}/postgres"
+    finally:
+        subprocess.run([pg_ctl, "-D", str(data_dir), "-m", "immediate", "-w", "stop"],
+                       check=False, capture_output=True)
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def database_url(request):
+    """Runs a test against SQLite and against the local PostgreSQL."""
+    if request.param == "sqlite":
+        return SQLITE_URL
+    return request.getfixturevalue("postgres_server")
@@ -0,0 +1,131 @@
+import shutil
+
+import pytest
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, inspect, select, text
+
+from core.models_sql_alchemy.models import Base, Task
+from database.backfill import Backfill, checkpoints, run_backfill
+from database.migrate import alembic_config, include_name, upgrade
+
+LEGACY_DATABASE = "database/progresser.db"
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    yield engine
+    engine.dispose()
+
+
+def current_revision(engine):
+    with engine.connect() as connection:
+        return MigrationContext.configure(connection).get_current_revision()
+
+
+def schema_differences(engine):
+    with engine.connect() as connection:
+        context = MigrationContext.configure(connection, opts={"include_name": include_name})
+        return compare_metadata(context, Base.metadata)
+
+
+def test_upgrade_new_database_matches_models(engine):
+    upgrade(engine)
+
+    assert current_revision(engine) == "0003"
+    assert schema_differences(engine) == []
+
+
+def test_upgrade_database_made_by_create_all(engine):
+    Base.metadata.create_all(engine)
+
+    upgrade(engine)
+
+    assert current_revision(engine) == "0003"
+    assert schema_differences(engine) == []
+
+
+def test_upgrade_legacy_database_backfills_paths(engine, tmp_path):
+    shutil.copy(LEGACY_DATABASE, tmp_path / "test.db")
+
+    upgrade(engine)
+
+    assert schema_differences(engine) == []
+    with engine.connect() as connection:
+        rows = connection.execute(select(Task.id, Task.path)).all()
+    assert rows and all(path is not None for _, path in rows)
+
+
+def test_downgrade_and_upgrade_again(engine):
+    upgrade(engine)
+    config = alembic_config()
+    with engine.connect() as connection:
+        config.attributes["connection"] = connection
+        command.downgrade(config, "0002")
+        connection.commit()
+    assert "path" not in {column["name"] for column in inspect(engine).get_columns("tasks")}
+
+    upgrade(engine)
+    assert current_revision(engine) == "0003"
+
+
+def make_numbers(engine, count):
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE numbers (id INTEGER PRIMARY KEY, doubled INTEGER)"))
+        connection.execute(text("INSERT INTO numbers (id) VALUES (:id)"), [{"id": i} for i in range(1, count + 1)])
+
+
+def fetch_after(connection, last_key, batch_size):
+    return connection.execute(text("SELECT id FROM numbers WHERE id > :last ORDER BY id LIMIT :limit"),
+                              {"last": int(last_key or 0), "limit": batch_size}).all()
+
+
+def double(connection, rows):
+    connection.execute(text("UPDATE numbers SET doubled = id * 2 WHERE id = :id"), [{"id": row[0]} for row in rows])
+
+
+def test_run_backfill_resumes_after_failure(engine):
+    numbers = 25
+    make_numbers(engine, numbers)
+    applied = []
+    failing_batch = 2
+
+    def failing_apply(connection, rows):
+        if len(applied) == failing_batch:
+            raise RuntimeError("stopped")
+        applied.append(rows[-1][0])
+        double(connection, rows)
+
+    with engine.connect() as connection:
+        with pytest.raises(RuntimeError):
+            run_backfill(connection, Backfill("numbers", fetch_after, failing_apply, batch_size=5))
+        connection.rollback()
+        last_key, done = connection.execute(select(checkpoints.c.last_key, checkpoints.c.done)).one()
+        assert (last_key, done) == ("10", 10)
+
+        reports = []
+        backfill = Backfill("numbers", fetch_after, double, batch_size=5, total=numbers)
+        assert run_backfill(connection, backfill, report=reports.append) == numbers - done
+        assert [str(report) for report in reports][-1] == "numbers: 25/25 (100%)"
+        assert connection.execute(text("SELECT count(*) FROM numbers WHERE doubled = id * 2")).scalar() == numbers
+        # A finished backfill leaves no checkpoint behind
+        assert connection.execute(select(checkpoints)).all() == []
+
+
+def test_run_backfill_commits_every_batch(engine):
+    make_numbers(engine, 10)
+    seen_committed = []
+
+    def apply(connection, rows):
+        double(connection, rows)
+        with engine.connect() as other:
+            seen_committed.append(other.execute(text("SELECT count(*) FROM numbers WHERE doubled IS NOT NULL"))
+                                  .scalar())
+
+    with engine.connect() as connection:
+        run_backfill(connection, Backfill("numbers", fetch_after, apply, batch_size=4))
+
+    # Another connection sees the previous batches, not the one still in progress
+    assert seen_committed == [0, 4, 8]
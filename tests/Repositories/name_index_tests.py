@@ -0,0 +1,102 @@
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.orm import Session, close_all_sessions
+
+from core.models_sql_alchemy.models import Base, Task, User, Workspace
+from database.database_manager import RedisDatabaseManager, SQLDatabaseManager
+from database.repositories.base_repository import BaseRepository
+from database.repositories.name_index import NameIndex
+
+
+@pytest.fixture
+def repository(database_url):
+    manager = SQLDatabaseManager(database_url)
+    repo = BaseRepository(manager, RedisDatabaseManager())
+    repo.create(User, username="Acie", telegram_username="Acie")
+    repo.create(User, username="Other", telegram_username="Other")
+    repo.create(Workspace, name="Home", owner_name="Acie")
+
+    yield repo
+
+    repo.redis_db_manager.get_connection().flushdb()
+    close_all_sessions()
+    Base.metadata.drop_all(manager.engine)
+
+def test_resolve_loads_owner_index_once(repository, mocker):
+    spy = mocker.spy(Session, "execute")
+
+    assert repository.resolve_name_id(Workspace, "Acie", "Home") == 1
+    assert repository.resolve_name_id(Workspace, "Acie", "Missing") is None
+    assert repository.resolve_name_id(Workspace, "Acie", "Home") == 1
+    spy.assert_called_once()
+
+def test_create_updates_index_incrementally(repository, mocker):
+    repository.resolve_name_id(Workspace, "Acie", "Home")
+    repository.create(Workspace, name="Work", owner_name="Acie")
+    repository.create(Workspace, name="Work", owner_name="Other")
+    repository.create(Task, name="Work", workspace_id=1, owner_name="Acie")
+    spy = mocker.spy(Session, "execute")
+
+    assert (repository.resolve_name_id(Workspace, "Acie", "Work"),
+            repository.resolve_name_id(Workspace, "Acie", "Home")) == (2, 1)
+    spy.assert_not_called()
+
+def test_duplicate_name_keeps_lowest_id(repository):
+    repository.resolve_name_id(Workspace, "Acie", "Home")
+    repository.create(Workspace, name="Home", owner_name="Acie")
+
+    assert repository.resolve_name_id(Workspace, "Acie", "Home") == 1
+
+def test_rename_and_delete(repository):
+    repository.create(Workspace, name="Work", owner_name="Acie")
+    repository.resolve_name_id(Workspace, "Acie", "Home")
+
+    repository.update(Workspace, 1, name="House")
+    assert repository.resolve_name_id(Workspace, "Acie", "Home") is None
+    assert repository.resolve_name_id(Workspace, "Acie", "House") == 1
+
+    repository.delete(Workspace, 1)
+    assert (repository.resolve_name_id(Workspace, "Acie", "House"),
+            repository.resolve_name_id(Workspace, "Acie", "Work")) == (None, 2)
+
+def test_rolled_back_create_is_not_indexed(repository):
+    repository.resolve_name_id(Workspace, "Acie", "Home")
+
+    with pytest.raises(RuntimeError):
+        with repository.transaction():
+            repository.create(Workspace, name="Work", owner_name="Acie")
+            raise RuntimeError()
+
+    assert repository.resolve_name_id(Workspace, "Acie", "Work") is None
+
+def test_unrelated_writes_keep_index(repository):
+    repository.resolve_name_id(Workspace, "Acie", "Home")
+    repository.create(Workspace, name="Garden", owner_name="Other")
+    repository.update(User, "Other", active=False)
+
+    key = NameIndex.key(Workspace, "Acie")
+    assert repository.redis_db_manager.get_connection().hget(key, "name:Home") == "1"
+
+def test_name_added_during_load_is_not_lost(repository):
+    index = NameIndex(repository.redis_db_manager)
+    session = MagicMock()
+    work_id = 2
+
+    def rows_then_create(_):
+        # Created and committed after the index query read its rows
+        index.add(Workspace, "Acie", "Work", work_id)
+        return MagicMock(all=lambda: [("Home", 1)])
+    session.execute.side_effect = rows_then_create
+    assert index.resolve(session, Workspace, "Acie", "Work") is None
+
+    session.execute.side_effect = None
+    session.execute.return_value.all.return_value = [("Work", work_id), ("Home", 1)]
+    assert index.resolve(session, Workspace, "Acie", "Work") == work_id
+
+def test_load_replaces_stale_names(repository):
+    key = NameIndex.key(Workspace, "Acie")
+    repository.redis_db_manager.get_connection().hset(key, "name:Gone", 42)
+
+    assert repository.resolve_name_id(Workspace, "Acie", "Home") == 1
+    assert repository.resolve_name_id(Workspace, "Acie", "Gone") is None
@@ -0,0 +1,102 @@
+import sqlite3
+import time
+
+import pytest
+from sqlalchemy.orm import close_all_sessions
+
+from core.models_sql_alchemy.models import Task, User, Workspace
+from database.database_manager import RedisDatabaseManager, SQLDatabaseManager
+from database.repositories.all_repositories import TaskRepository
+from database.repositories.base_repository import cache_key
+from database.unit_of_work import unit_of_work
+
+STICKY_SECONDS = 0.2
+
+@pytest.fixture
+def files(tmp_path):
+    return tmp_path / "primary.db", tmp_path / "replica.db"
+
+def replicate(files):
+    """Stub replication step: copies the primary over the replica."""
+    primary_path, replica_path = files
+    with sqlite3.connect(primary_path) as primary, sqlite3.connect(replica_path) as replica:
+        primary.backup(replica)
+
+@pytest.fixture
+def repository(files):
+    primary_path, replica_path = files
+    manager = SQLDatabaseManager(f"sqlite:///{primary_path}", echo=False,
+                                 replica_urls=[f"sqlite:///{replica_path}"],
+                                 replica_sticky_seconds=STICKY_SECONDS)
+    repository = TaskRepository(manager, RedisDatabaseManager())
+    repository.create(User, username="Acie", telegram_username="Acie")
+    repository.create(Workspace, name="Home", owner_name="Acie")
+    repository.create(Task, name="Root", workspace_id=1, owner_name="Acie")
+    replicate(files)
+    yield repository
+    repository.redis_db_manager.get_connection().flushdb()
+    close_all_sessions()
+    for engine in [manager.engine, *manager.replica_engines]:
+        engine.dispose()
+
+def add_child(repository):
+    repository.create(Task, name="Child", workspace_id=1, owner_name="Acie", parent_id=1)
+
+def test_uncached_reads_go_to_the_replica(repository, files):
+    add_child(repository)
+    time.sleep(STICKY_SECONDS)
+
+    with unit_of_work(repository.db_manager, read_only=True):
+        assert repository.get_descendants(1) == []
+    replicate(files)
+    with unit_of_work(repository.db_manager, read_only=True):
+        assert [task["name"] for task in repository.get_descendants(1)] == ["Child"]
+
+def test_cache_misses_read_the_primary(repository):
+    repository.create(User, username="Bob", telegram_username="Bob")
+    repository.create(Workspace, name="Work", owner_name="Acie")
+    time.sleep(STICKY_SECONDS)
+
+    with unit_of_work(repository.db_manager, read_only=True, reader=2) as unit:
+        assert unit.replica
+        assert repository.get_by_id(User, "Bob")["username"] == "Bob"
+        [work] = repository.get_many_by_id(Workspace, [2])
+        assert work == {"id": 2, "name": "Work", "description": None, "owner_name": "Acie"}
+        assert repository.resolve_name_id(Workspace, "Acie", "Work") == work["id"]
+    # Cached although a write was committed just now, the primary had it
+    repository.create(User, username="Carol", telegram_username="Carol")
+    with unit_of_work(repository.db_manager, read_only=True, reader=2):
+        assert repository.get_by_custom_fields(User, username="Carol")
+    assert repository.redis_db_manager.get_connection().get(
+        cache_key("get_by_custom_fields", User, username="Carol")) is not None
+
+def test_reader_reads_its_writes_within_the_sticky_window(repository, files):
+    with unit_of_work(repository.db_manager, reader=1):
+        add_child(repository)
+
+    with unit_of_work(repository.db_manager, read_only=True, reader=2):
+        assert repository.get_descendants(1) == []
+    with unit_of_work(repository.db_manager, read_only=True, reader=1):
+        assert repository.get_descendants(1)
+
+    time.sleep(STICKY_SECONDS)
+    with unit_of_work(repository.db_manager, read_only=True, reader=1):
+        assert repository.get_descendants(1) == []
+    replicate(files)
+    with unit_of_work(repository.db_manager, read_only=True, reader=1):
+        assert repository.get_descendants(1)
+
+def test_units_that_write_read_from_the_primary(repository):
+    add_child(repository)
+    time.sleep(STICKY_SECONDS)
+
+    with unit_of_work(repository.db_manager, reader=2):
+        assert repository.get_descendants(1)
+
+def test_without_replicas_everything_reads_the_primary(tmp_path):
+    manager = SQLDatabaseManager(f"sqlite:///{tmp_path / 'primary.db'}", echo=False)
+    manager.note_write(1)
+
+    assert not manager.reads_from_replica(None)
+    assert manager.get_replica_session().get_bind() is manager.engine
+    manager.engine.dispose()
@@ -0,0 +1,71 @@
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from core.models_sql_alchemy.models import Base, Task, User, UserState, Workspace
+from core.services.task_tree import path_depth, path_segment
+from database.database_manager import SQLDatabaseManager
+from database.synthetic_data import Population, generate
+
+POPULATION = Population(users=5, workspaces_per_user=(1, 2), tasks_per_workspace=(20, 60),
+                        depth=(2, 4), branching=(1, 3), seed=7)
+
+@pytest.fixture
+def engine(database_url):
+    manager = SQLDatabaseManager(database_url, echo=False)
+    yield manager.engine
+    Base.metadata.drop_all(manager.engine)
+    manager.engine.dispose()
+
+def rows(engine, model):
+    with Session(engine) as session:
+        return [tuple(row) for row in session.execute(select(model.__table__).order_by(*model.__table__.primary_key))]
+
+def test_population_shape(engine):
+    with engine.connect() as connection:
+        report = generate(connection, POPULATION, batch_size=50)
+
+    assert (report.users, report.workspaces) == (POPULATION.users, len(rows(engine, Workspace)))
+    assert len(rows(engine, UserState)) == POPULATION.users
+    with Session(engine) as session:
+        tasks = {task.id: task for task in session.scalars(select(Task))}
+        per_workspace = session.execute(select(Task.workspace_id, func.count()).group_by(Task.workspace_id)).all()
+    assert report.tasks == len(tasks)
+    smallest, largest = POPULATION.tasks_per_workspace
+    assert all(smallest <= count <= largest for _, count in per_workspace)
+    for task in tasks.values():
+        parent = tasks.get(task.parent_id)
+        expected = (parent.path if parent else "") + path_segment(task.id)
+        assert task.path == expected
+        assert parent is None or (parent.workspace_id, parent.owner_name) == (task.workspace_id, task.owner_name)
+        assert path_depth(task.path) < POPULATION.depth[1]
+        assert task.weight in POPULATION.weights
+    completed_share = sum(task.completed for task in tasks.values()) / len(tasks)
+    assert completed_share == pytest.approx(POPULATION.completion_ratio, abs=0.2)
+
+def test_same_seed_same_rows_whatever_the_batch_size(engine, tmp_path):
+    other = SQLDatabaseManager(f"sqlite:///{tmp_path / 'other.db'}", echo=False).engine
+    with engine.connect() as connection:
+        generate(connection, POPULATION, batch_size=7)
+    with other.connect() as connection:
+        generate(connection, POPULATION, batch_size=1000)
+
+    for model in (User, Workspace, Task):
+        assert rows(engine, model) == rows(other, model)
+    other.dispose()
+
+def test_ids_follow_existing_rows(engine):
+    with engine.connect() as connection:
+        first = generate(connection, POPULATION)
+        more = Population(users=2, tasks_per_workspace=(5, 5), seed=7, prefix="more")
+        second = generate(connection, more)
+
+    with Session(engine) as session:
+        assert session.scalar(select(func.count()).select_from(Task)) == first.tasks + second.tasks
+        assert session.scalar(select(func.count()).select_from(User).where(User.username.like("more%"))) == more.users
+
+@pytest.mark.parametrize("options", [dict(depth=(0, 2)), dict(branching=(3, 1)),
+                                     dict(completion_ratio=1.5), dict(weights={})])
+def test_population_rejects_invalid_distributions(options):
+    with pytest.raises(ValueError):
+        Population(**options)
@@ -0,0 +1,134 @@
+import pytest
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, close_all_sessions
+
+from core.models_sql_alchemy.models import Base, Task, User, Workspace
+from core.services.task_tree import path_segment
+from database.database_manager import RedisDatabaseManager, SQLDatabaseManager
+from database.repositories.all_repositories import TaskRepository
+from database.task_paths import backfill_paths
+
+
+@pytest.fixture
+def repository(database_url):
+    manager = SQLDatabaseManager(database_url, echo=False)
+    repository = TaskRepository(manager, RedisDatabaseManager())
+    repository.create(User, username="Acie", telegram_username="Acie")
+    repository.create(Workspace, name="Home", owner_name="Acie")
+    yield repository
+    close_all_sessions()
+    Base.metadata.drop_all(manager.engine)
+
+def expected_path(tasks, task):
+    path = ""
+    while task is not None:
+        path = path_segment(task.id) + path
+        task = tasks.get(task.parent_id)
+    return path
+
+def assert_paths_consistent(session):
+    tasks = {task.id: task for task in session.execute(select(Task)).scalars()}
+    for task in tasks.values():
+        assert task.path == expected_path(tasks, task), task.name
+
+def names(records):
+    return [record["name"] for record in records]
+
+def test_create_sets_path(repository):
+    repository.create(Task, name="A", workspace_id=1, owner_name="Acie")
+    repository.create(Task, name="B", workspace_id=1, owner_name="Acie", parent_id=1)
+
+    with repository.db_manager.get_session() as session:
+        assert_paths_consistent(session)
+    assert repository.get_depth(2) == 1
+
+def test_move_rewrites_subtree(repository):
+    for name, parent_id in [("A", None), ("B", 1), ("C", 2), ("D", 3), ("E", None)]:
+        repository.create(Task, name=name, workspace_id=1, owner_name="Acie", parent_id=parent_id)
+
+    repository.update(Task, 2, parent_id=5)
+    with repository.transaction():
+        # Later moves in the same transaction see the rewritten paths
+        repository.update(Task, 3, parent_id=1)
+        repository.update(Task, 1, parent_id=2)
+
+    with repository.db_manager.get_session() as session:
+        assert_paths_consistent(session)
+    assert names(repository.get_descendants(5)) == ["B", "A", "C", "D"]
+    assert names(repository.get_ancestors(4)) == ["E", "B", "A", "C"]
+    assert repository.get_depth(4) == len(repository.get_ancestors(4))
+
+def test_delete_removes_subtree(repository):
+    for name, parent_id in [("A", None), ("B", 1), ("C", 2), ("D", None)]:
+        repository.create(Task, name=name, workspace_id=1, owner_name="Acie", parent_id=parent_id)
+
+    repository.delete(Task, 2)
+
+    assert names(repository.get_descendants(1)) == []
+    assert repository.get_by_id(Task, 3) is None
+
+def test_create_tree_and_import_tree_set_paths(repository):
+    repository.create(Task, name="Existing", workspace_id=1, owner_name="Acie")
+    repository.create_tree("Acie", [
+        {"name": "Attached", "workspace_name": "Home", "parent_index": None, "parent_name": "Existing"},
+        {"name": "Nested", "workspace_name": "Home", "parent_index": 0},
+        {"name": "Top", "workspace_name": "Home", "parent_index": None},
+    ])
+    repository.import_tree("Acie", iter([
+        ("workspace", {"name": "Imported"}),
+        ("task", {"id": 10, "parent_id": None, "name": "Root", "completed": False, "weight": 1}),
+        ("task", {"id": 11, "parent_id": 10, "name": "Child", "completed": False, "weight": 1}),
+        ("task", {"id": 12, "parent_id": 11, "name": "Grandchild", "completed": False, "weight": 1}),
+    ]), batch_size=1)
+
+    with repository.db_manager.get_session() as session:
+        assert_paths_consistent(session)
+    assert names(repository.get_descendants(1)) == ["Attached", "Nested"]
+
+def test_subtree_progress(repository):
+    repository.create(Task, name="Outside", workspace_id=1, owner_name="Acie", completed=True)
+    repository.create(Task, name="Root", workspace_id=1, owner_name="Acie")
+    repository.create(Task, name="Done", workspace_id=1, owner_name="Acie", parent_id=2, completed=True, weight=3)
+    repository.create(Task, name="Todo", workspace_id=1, owner_name="Acie", parent_id=2, weight=1)
+
+    assert repository.subtree_progress(2) == pytest.approx(75)
+    assert repository.subtree_progress(3) == pytest.approx(100)
+
+def test_get_subtree(repository):
+    repository.create(Workspace, name="Work", owner_name="Acie")
+    for name, parent_id in [("A", None), ("B", 1), ("C", 2), ("D", None)]:
+        repository.create(Task, name=name, workspace_id=1, owner_name="Acie", parent_id=parent_id)
+    repository.create(Task, name="Elsewhere", workspace_id=2, owner_name="Acie")
+
+    assert names(repository.get_subtree(Workspace, 1)) == ["A", "B", "C", "D"]
+    assert names(repository.get_subtree(Task, 2)) == ["B", "C"]
+    assert repository.get_subtree(Workspace, 2)[0]["parent_id"] is None
+
+def test_query_unknown_task(repository):
+    with pytest.raises(SQLAlchemyError):
+        repository.get_descendants(42)
+
+def test_backfill_paths(database_url):
+    engine = create_engine(database_url)
+    Base.metadata.create_all(engine)
+    tasks = 50
+    with engine.begin() as connection:
+        connection.execute(insert(User), {"username": "Acie", "active": True})
+        connection.execute(insert(Workspace), {"id": 1, "name": "Home", "owner_name": "Acie"})
+        # Written without the repository, so without paths
+        connection.execute(insert(Task), [
+            {"id": task_id, "workspace_id": 1, "parent_id": task_id // 2 or None, "name": str(task_id),
+             "completed": False, "weight": 1, "owner_name": "Acie"}
+            for task_id in range(1, tasks + 1)])
+
+    reports = []
+    try:
+        with engine.connect() as connection:
+            assert backfill_paths(connection, batch_size=7, report=reports.append) == tasks
+            assert backfill_paths(connection) == 0
+        with Session(engine) as session:
+            assert_paths_consistent(session)
+        assert reports[-1].done == reports[-1].total == tasks
+    finally:
+        Base.metadata.drop_all(engine)
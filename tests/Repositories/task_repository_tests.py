@@ -0,0 +1,170 @@
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import close_all_sessions
+
+from core.models_sql_alchemy.models import Base, Task, User, Workspace
+from core.services.task_tree import TaskCycleError, path_segment
+from database.database_manager import RedisDatabaseManager, SQLDatabaseManager
+from database.repositories import all_repositories
+from database.repositories.all_repositories import TaskRepository
+
+
+@pytest.fixture
+def repository(database_url):
+    manager = SQLDatabaseManager(database_url)
+    repository = TaskRepository(manager, RedisDatabaseManager())
+    repository.create(User, username="Acie", telegram_username="Acie")
+    repository.create(Workspace, name="Home", owner_name="Acie")
+    yield repository
+    close_all_sessions()
+    Base.metadata.drop_all(manager.engine)
+
+def get_tasks(repository):
+    with repository.db_manager.get_session() as session:
+        return {task.name: task for task in session.execute(select(Task)).scalars()}
+
+def test_create_tree_success(repository):
+    repository.create(Task, name="Existing", workspace_id=1, owner_name="Acie")
+    rows = [
+        {"name": "Parent", "workspace_name": "Home", "parent_index": None, "weight": 5},
+        {"name": "Child", "workspace_name": "Home", "parent_index": 0, "completed": True},
+        {"name": "Grandchild", "workspace_name": "Home", "parent_index": 1},
+        {"name": "Attached", "workspace_name": "Home", "parent_index": None, "parent_name": "Existing"},
+    ]
+
+    assert repository.create_tree("Acie", rows) == len(rows)
+
+    tasks = get_tasks(repository)
+    assert tasks["Parent"].parent_id is None
+    assert tasks["Parent"].weight == rows[0]["weight"]
+    assert tasks["Child"].parent_id == tasks["Parent"].id
+    assert tasks["Child"].completed is True
+    assert tasks["Grandchild"].parent_id == tasks["Child"].id
+    assert tasks["Attached"].parent_id == tasks["Existing"].id
+    assert {task.owner_name for task in tasks.values()} == {"Acie"}
+
+def test_create_tree_missing_workspace(repository):
+    rows = [{"name": "Parent", "workspace_name": "Work", "parent_index": None}]
+
+    with pytest.raises(SQLAlchemyError, match="Work"):
+        repository.create_tree("Acie", rows)
+    assert get_tasks(repository) == {}
+
+def test_create_tree_missing_parent_rolls_back(repository):
+    rows = [
+        {"name": "First", "workspace_name": "Home", "parent_index": None},
+        {"name": "Second", "workspace_name": "Home", "parent_index": None, "parent_name": "Nope"},
+    ]
+
+    with pytest.raises(SQLAlchemyError, match="Nope"):
+        repository.create_tree("Acie", rows)
+    assert get_tasks(repository) == {}
+
+def test_import_tree_and_export_round_trip(repository):
+    records = [
+        ("workspace", {"name": "Imported", "description": "From file"}),
+        ("task", {"id": 100, "parent_id": None, "name": "Root", "completed": False, "weight": 2}),
+        ("task", {"id": 101, "parent_id": 100, "name": "Child", "completed": True, "weight": 1}),
+        ("task", {"id": 90, "parent_id": 101, "name": "Grandchild", "completed": False, "weight": 1}),
+        ("task", {"id": 102, "parent_id": None, "name": "Second root", "completed": False, "weight": 1}),
+    ]
+
+    assert repository.import_tree("Acie", iter(records), batch_size=2) == ("Imported", 4)
+
+    [workspace] = repository.get_by_custom_fields(Workspace, name="Imported", owner_name="Acie")
+    exported = list(repository.iter_workspace_tree(workspace["id"], chunk_size=1))
+    assert [task["name"] for task in exported] == ["Root", "Second root", "Child", "Grandchild"]
+    ids = {task["name"]: task["id"] for task in exported}
+    assert exported[2]["parent_id"] == ids["Root"]
+    assert exported[3]["parent_id"] == ids["Child"]
+
+def test_import_tree_loads_batches_with_copy_on_postgres(repository, mocker):
+    copy_rows = mocker.spy(all_repositories, "copy_rows")
+    records = [("workspace", {"name": "Imported"})] + [
+        ("task", {"id": task_id, "parent_id": task_id // 2 or None, "name": str(task_id),
+                  "completed": False, "weight": 1})
+        for task_id in range(1, 11)]
+
+    assert repository.import_tree("Acie", iter(records), batch_size=4) == ("Imported", 10)
+
+    postgres = repository.db_manager.engine.dialect.name == "postgresql"
+    assert copy_rows.call_count == (3 if postgres else 0)
+    with repository.db_manager.get_session() as session:
+        tasks = {task.name: task for task in session.execute(select(Task)).scalars()}
+    for name, task in tasks.items():
+        parent = tasks.get(str(int(name) // 2))
+        assert task.parent_id == (parent.id if parent else None)
+        assert task.path == (parent.path if parent else "") + path_segment(task.id)
+
+def test_import_tree_child_before_parent(repository):
+    records = [
+        ("workspace", {"name": "Imported"}),
+        ("task", {"id": 2, "parent_id": 1, "name": "Child", "completed": False, "weight": 1}),
+        ("task", {"id": 1, "parent_id": None, "name": "Root", "completed": False, "weight": 1}),
+    ]
+
+    with pytest.raises(SQLAlchemyError):
+        repository.import_tree("Acie", iter(records))
+    assert repository.get_by_custom_fields(Workspace, name="Imported", owner_name="Acie") == []
+
+@pytest.mark.parametrize("record, error", [
+    ("task", "isn't a task"),
+    ({"id": 2, "name": "Too heavy", "weight": 101}, "isn't a valid task"),
+    ({"id": 2, "name": "x" * 256}, "isn't a valid task"),
+    ({"id": "2", "name": "Text id"}, "has no valid id"),
+])
+def test_import_tree_rejects_invalid_tasks(repository, record, error):
+    records = [
+        ("workspace", {"name": "Imported"}),
+        ("task", {"id": 1, "parent_id": None, "name": "Root", "completed": False, "weight": 1}),
+        ("task", record),
+    ]
+
+    with pytest.raises(ValueError, match=f"Record 2 of the import {error}"):
+        repository.import_tree("Acie", iter(records))
+    assert repository.get_by_custom_fields(Workspace, name="Imported", owner_name="Acie") == []
+
+def test_import_tree_existing_workspace(repository):
+    with pytest.raises(SQLAlchemyError, match="already exists"):
+        repository.import_tree("Acie", iter([("workspace", {"name": "Home"})]))
+
+def test_update_parent_cycle_rejected(repository):
+    repository.create(Task, name="A", workspace_id=1, owner_name="Acie")
+    repository.create(Task, name="B", workspace_id=1, owner_name="Acie", parent_id=1)
+    repository.create(Task, name="C", workspace_id=1, owner_name="Acie", parent_id=2)
+
+    with pytest.raises(TaskCycleError):
+        repository.update(Task, 1, parent_id=3)
+    with pytest.raises(TaskCycleError):
+        repository.update(Task, 2, parent_id=2)
+    assert get_tasks(repository)["A"].parent_id is None
+
+def test_update_parent_move_success(repository):
+    repository.create(Task, name="A", workspace_id=1, owner_name="Acie")
+    repository.create(Task, name="B", workspace_id=1, owner_name="Acie", parent_id=1)
+    repository.create(Task, name="C", workspace_id=1, owner_name="Acie")
+
+    with repository.transaction():
+        # Checks within one transaction see the moves made before them
+        repository.update(Task, 2, parent_id=3)
+        repository.update(Task, 1, parent_id=2)
+        with pytest.raises(TaskCycleError):
+            repository.update(Task, 3, parent_id=1)
+
+    tasks = get_tasks(repository)
+    assert tasks["B"].parent_id == tasks["C"].id
+    assert tasks["A"].parent_id == tasks["B"].id
+
+def test_update_parent_deep_chain(repository):
+    depth = 10_000
+    with repository.db_manager.get_session() as session:
+        session.add_all(Task(id=task_id, name=str(task_id), workspace_id=1, owner_name="Acie",
+                             parent_id=task_id - 1 if task_id > 1 else None)
+                        for task_id in range(1, depth + 1))
+        session.commit()
+
+    with pytest.raises(TaskCycleError):
+        repository.update(Task, 1, parent_id=depth)
+    assert repository.update(Task, depth, parent_id=1)
+    assert get_tasks(repository)["1"].parent_id is None
@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import close_all_sessions
+
+from core.models_sql_alchemy.models import Base, User, UserState
+from database.database_manager import RedisDatabaseManager, SQLDatabaseManager
+from database.repositories.all_repositories import UserRepository
+from database.repositories.base_repository import cache_key
+from database.unit_of_work import ReadOnlyError, current_unit, unit_of_work
+
+
+@pytest.fixture
+def repository(database_url):
+    manager = SQLDatabaseManager(database_url, echo=False)
+    repository = UserRepository(manager, RedisDatabaseManager())
+    yield repository
+    repository.redis_db_manager.get_connection().flushdb()
+    close_all_sessions()
+    Base.metadata.drop_all(manager.engine)
+
+@pytest.fixture
+def commits(repository):
+    counted = []
+    event.listen(repository.db_manager.engine, "commit", counted.append)
+    return counted
+
+def test_calls_in_a_unit_share_one_commit(repository, commits):
+    with unit_of_work(repository.db_manager):
+        repository.create("Acie")
+        repository.set_state("Acie", "/create_Task")
+        assert repository.get_or_create_state("Acie") == "/create_Task"
+        with repository.transaction():
+            repository.delete(UserState, "Acie")
+    assert len(commits) == 1
+
+    # Without a unit every call commits on its own
+    commits.clear()
+    repository.create("Bob")
+    assert len(commits) == 1
+    commits.clear()
+    repository.set_state("Bob", "/create_Task")
+    assert len(commits) == 1
+    assert repository.get_by_id(UserState, "Acie") is None
+
+def test_failed_unit_rolls_back_and_drops_after_commit_work(repository):
+    done = []
+    with pytest.raises(ValueError):
+        with unit_of_work(repository.db_manager) as unit:
+            repository.create("Acie")
+            unit.on_commit(lambda: done.append(True))
+            raise ValueError("handler failed")
+
+    assert repository.get_by_id(User, "Acie") is None
+    assert not done
+
+def test_read_only_unit_reads_without_commit_and_refuses_writes(repository, commits):
+    repository.create("Acie")
+    commits.clear()
+
+    with unit_of_work(repository.db_manager, read_only=True):
+        assert repository.get_by_id(User, "Acie")["username"] == "Acie"
+        with pytest.raises(ReadOnlyError):
+            repository.set_state("Acie", "state")
+        with pytest.raises(ReadOnlyError):
+            repository.update(User, "Acie", active=False)
+    with pytest.raises(ReadOnlyError), repository.transaction(read_only=True):
+        repository.create("Bob")
+
+    assert commits == []
+    assert repository.get_by_id(User, "Acie")["active"] is True
+    assert repository.get_by_id(User, "Bob") is None
+
+def test_results_seeing_uncommitted_writes_are_not_cached(repository):
+    redis_conn = repository.redis_db_manager.get_connection()
+    with unit_of_work(repository.db_manager):
+        repository.get_by_id(User, "Acie")
+        assert redis_conn.get(cache_key("get_by_id", User, "Acie")) == "null"
+        repository.create("Acie")
+        assert repository.get_by_custom_fields(User, username="Acie")
+        assert redis_conn.get(cache_key("get_by_custom_fields", User, username="Acie")) is None
+
+    assert repository.get_by_custom_fields(User, username="Acie")
+    assert redis_conn.get(cache_key("get_by_custom_fields", User, username="Acie")) is not None
+
+def test_caches_are_invalidated_after_the_commit(repository):
+    repository.create("Acie")
+    redis_conn = repository.redis_db_manager.get_connection()
+    key = cache_key("get_by_id", User, "Acie")
+    assert repository.get_by_id(User, "Acie")["active"] is True
+
+    with pytest.raises(ValueError), unit_of_work(repository.db_manager):
+        repository.update(User, "Acie", active=False)
+        raise ValueError("handler failed")
+    assert redis_conn.get(key) is not None
+
+    with unit_of_work(repository.db_manager):
+        repository.update(User, "Acie", active=False)
+        # Other readers may still get the committed record until the commit
+        assert redis_conn.get(key) is not None
+        assert repository.get_by_id(User, "Acie")["active"] is False
+    assert redis_conn.get(key) is None
+    assert repository.get_by_id(User, "Acie")["active"] is False
+
+async def test_concurrent_tasks_have_units_of_their_own(repository):
+    entered = asyncio.Barrier(2)
+
+    async def handle(username):
+        with unit_of_work(repository.db_manager) as unit:
+            await entered.wait()
+            repository.get_by_id(User, username)
+            assert current_unit(repository.db_manager) is unit
+            return unit
+
+    first, second = await asyncio.gather(handle("Acie"), handle("Bob"))
+    assert first is not second
+    assert current_unit(repository.db_manager) is None
+
+def test_units_of_other_managers_dont_mix(repository, tmp_path):
+    other = SQLDatabaseManager(f"sqlite:///{tmp_path / 'other.db'}", echo=False)
+    with unit_of_work(other) as other_unit:
+        assert current_unit(repository.db_manager) is None
+        repository.create("Acie")
+        assert current_unit(other) is other_unit
+    assert repository.get_by_id(User, "Acie") is not None
+    other.engine.dispose()
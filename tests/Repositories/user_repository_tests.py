@@ -0,0 +1,82 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.orm import close_all_sessions
+
+from core.models_sql_alchemy.models import Base, User, UserState
+from database.database_manager import RedisDatabaseManager, SQLDatabaseManager
+from database.repositories.all_repositories import UserRepository
+from database.repositories.base_repository import BaseRepository
+
+
+@pytest.fixture
+def repository(database_url):
+    manager = SQLDatabaseManager(database_url)
+    repository = UserRepository(manager, RedisDatabaseManager())
+    repository.create("Acie")
+    yield repository
+    repository.redis_db_manager.get_connection().flushdb()
+    close_all_sessions()
+    Base.metadata.drop_all(manager.engine)
+
+def test_set_state_updates_existing_row(repository):
+    assert repository.get_by_id(UserState, "Acie")["state"] is None
+
+    repository.set_state("Acie", "/create_Task")
+
+    assert repository.get_by_id(UserState, "Acie")["state"] == "/create_Task"
+
+def test_set_state_creates_missing_row(repository):
+    # A user without a state row, as created before states existed
+    BaseRepository.create(repository, User, username="Other", telegram_username="Other")
+
+    repository.set_state("Other", "/create_Task")
+    repository.set_state("Other", None)
+
+    assert repository.get_by_id(UserState, "Other") == {"telegram_username": "Other", "state": None}
+
+def test_create_registered_user_keeps_state(repository):
+    repository.set_state("Acie", "/create_Task")
+
+    assert repository.create("Acie") is True
+    assert repository.get_or_create_state("Acie") == "/create_Task"
+
+def test_simultaneous_first_messages(database_url, tmp_path):
+    if database_url.startswith("sqlite"):
+        # Threads need a database they share, an in-memory one is per connection
+        database_url = f"sqlite:///{tmp_path / 'progresser.db'}"
+    manager = SQLDatabaseManager(database_url, echo=False)
+    messages = 8
+    barrier = threading.Barrier(messages)
+
+    def first_message(_):
+        repository = UserRepository(manager, RedisDatabaseManager())
+        barrier.wait()
+        repository.create("Acie")
+        return repository.get_or_create_state("Acie")
+
+    try:
+        with ThreadPoolExecutor(messages) as pool:
+            states = list(pool.map(first_message, range(messages)))
+
+        assert states == [None] * messages
+        with manager.get_session() as session:
+            assert session.scalar(select(func.count()).select_from(User)) == 1
+            assert session.scalar(select(func.count()).select_from(UserState)) == 1
+    finally:
+        close_all_sessions()
+        Base.metadata.drop_all(manager.engine)
+
+def test_get_or_create_state_writes_only_missing_rows(repository, mocker):
+    BaseRepository.create(repository, User, username="Other", telegram_username="Other")
+    upsert = mocker.spy(UserRepository, "upsert")
+
+    assert repository.get_or_create_state("Acie") is None
+    assert repository.get_or_create_state("Acie") is None
+    upsert.assert_not_called()
+
+    assert repository.get_or_create_state("Other") is None
+    assert repository.get_or_create_state("Other") is None
+    upsert.assert_called_once()
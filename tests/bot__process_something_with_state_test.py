@@ -5,6 +5,7 @@ import pytest
 from dotenv import load_dotenv
 
 from core.models_sql_alchemy.models import Task, User, Workspace
+from database.database_manager import RedisDatabaseManager, SQLDatabaseManager, get_redis_manager, use_managers
 from telegram_bot.bot import Bot
 
 load_dotenv()
@@ -12,8 +13,10 @@ token = os.getenv('TOKEN')
 chat_id_dotenv = os.getenv('CHAT_ID')
 
 @pytest.fixture
-def bot(mocker):
+def bot(mocker, tmp_path):
     """Pytest fixture to create a Bot instance."""
+    # A database of its own, so the tests neither depend on nor change database/progresser.db
+    use_managers(SQLDatabaseManager(f"sqlite:///{tmp_path / 'bot.db'}", echo=False), RedisDatabaseManager())
     bot_instance = Bot(token)
     bot_instance.database.create_user("test_user")
     mocker.patch.object(bot_instance.bot, "send_message", new_callable=AsyncMock)
@@ -22,6 +25,8 @@ def bot(mocker):
 
     # Teardown/Cleanup code:
     bot_instance.database.delete(User,"test_user")
+    get_redis_manager().get_connection().flushdb()
+    use_managers()
 
 
 def create_message_mock(text, username="test_user", chat_id=chat_id_dotenv):
@@ -47,17 +52,17 @@ def test_process_task_with_parent_success(bot):
     message_mock = create_message_mock(message_text)
 
     bot.database.create(Workspace, {"name": workspace_name, "owner_name": username})
-    workspace_id = bot.database.get_by_custom_field(Workspace, "name", workspace_name).id
+    workspace_id = bot.database.get_by_custom_field(Workspace, "name", workspace_name)["id"]
     bot.database.create(Task, {"name": parent_name, "workspace_id": workspace_id, "owner_name": username})
     bot.set_state(username, "/create_Task")  # Set the state
 
     bot._process_something_with_state(message_mock)
 
     db_record = bot.database.get_by_custom_field(cls, "name", name) # Assert that DB was called
-    assert db_record.name == name
-    assert db_record.parent_id is not None
-    assert db_record.workspace_id == workspace_id
-    assert db_record.owner_name == username
+    assert db_record["name"] == name
+    assert db_record["parent_id"] is not None
+    assert db_record["workspace_id"] == workspace_id
+    assert db_record["owner_name"] == username
     #check that bot.send message was called.# Real token is optional. Bot object initialization
 
     bot.bot.send_message.assert_called_once_with(chat_id_dotenv,
@@ -83,10 +88,10 @@ def test_process_task_no_parent_success(bot):
 
     db_record = bot.database.get_by_custom_field(cls, "name", name) # Assert that DB was called
 
-    assert db_record.name == name
-    assert db_record.parent_id is None
-    assert db_record.workspace_id == workspace_record.id
-    assert db_record.owner_name == username
+    assert db_record["name"] == name
+    assert db_record["parent_id"] is None
+    assert db_record["workspace_id"] == workspace_record["id"]
+    assert db_record["owner_name"] == username
 
     bot.bot.send_message.assert_called_once_with(chat_id_dotenv,
                                               f"Successfully created {cls.__name__} named: {name}.\n"
@@ -143,4 +148,4 @@ def test_process_task_error_no_parent_task(bot):
                                                  f"There was an error with your request\n"
                                                  f"Parent record with Name {parent_name} in {cls.__name__} doesn't exist"
                                                  )
-    assert bot.check_state_and_create("test_user") is None
\ No newline at end of file
+    assert bot.check_state_and_create("test_user") is None
@@ -3,10 +3,16 @@ import os
 import pytest
 from dotenv import load_dotenv
 
-from core.models_sql_alchemy.models import Task
+from core.models_sql_alchemy.models import Task, Workspace
 from resources.statics import Statics
 from telegram_bot.bot import Bot
 
+# Progress values the tests expect, in percent
+COMPLETE = 100.0
+THREE_QUARTERS = 75.0
+HALF = 50.0
+QUARTER = 25.0
+
 
 @pytest.fixture
 def bot():
@@ -16,25 +22,43 @@ def bot():
     Statics.COMPONENTS_PROGRESS.clear()
     return Bot(token)
 
+def task_row(task_id, name, completed, weight=1, parent_id=None):
+    """A task as `TaskRepository.get_subtree` returns it."""
+    return {"id": task_id, "name": name, "completed": completed, "weight": weight, "parent_id": parent_id}
+
 def test_calculate_progress_already_in_cache(bot):
     # Arrange
-    task = Task(id=1, name="Test Task", completed=False, child_tasks=[])
-    Statics.COMPONENTS_PROGRESS[(1, Task)] = 50.0  # Pre-populate the cache
+    task = task_row(1, "Test Task", completed=False)
+    Statics.COMPONENTS_PROGRESS[(1, Task)] = HALF  # Pre-populate the cache
 
     # Act
-    progress = bot._calculate_progress(task)
+    progress = bot._calculate_progress(Task, task, [task])
 
     # Assert
-    assert progress == 50.0
+    assert progress == HALF
     assert len(Statics.COMPONENTS_PROGRESS) == 1  # Cache should not be modified
 
 
+def test_calculate_progress_cached_without_its_tasks(bot):
+    # Arrange
+    parent = task_row(1, "Parent", completed=False)
+    child = task_row(2, "Child", completed=True, parent_id=1)
+    Statics.COMPONENTS_PROGRESS[(1, Task)] = HALF  # The child's progress isn't cached
+
+    # Act
+    progress = bot._calculate_progress(Task, parent, [parent, child])
+
+    # Assert
+    assert progress == COMPLETE
+    assert Statics.COMPONENTS_PROGRESS[(2, Task)] == COMPLETE
+
+
 def test_calculate_progress_no_children_completed_false(bot):
     # Arrange
-    task = Task(id=1, name="Test Task", completed=False, child_tasks=[])
+    task = task_row(1, "Test Task", completed=False)
 
     # Act
-    progress = bot._calculate_progress(task)
+    progress = bot._calculate_progress(Task, task, [task])
 
     # Assert
     assert progress == 0.0
@@ -43,24 +67,24 @@ def test_calculate_progress_no_children_completed_false(bot):
 
 def test_calculate_progress_no_children_completed_true(bot):
     # Arrange
-    task = Task(id=1, name="Test Task", completed=True, child_tasks=[])
+    task = task_row(1, "Test Task", completed=True)
 
     # Act
-    progress = bot._calculate_progress(task)
+    progress = bot._calculate_progress(Task, task, [task])
 
     # Assert
-    assert progress == 100.0
-    assert Statics.COMPONENTS_PROGRESS[(1,Task)] == 100.0
+    assert progress == COMPLETE
+    assert Statics.COMPONENTS_PROGRESS[(1,Task)] == COMPLETE
 
 
 def test_calculate_progress_with_children_no_completion(bot):
     # Arrange
-    child1 = Task(id=2, name="Child 1", completed=False, weight=1, child_tasks=[])
-    child2 = Task(id=3, name="Child 2", completed=False, weight=1, child_tasks=[])
-    parent = Task(id=1, name="Parent", completed=False, child_tasks=[child1, child2])
+    parent = task_row(1, "Parent", completed=False)
+    child1 = task_row(2, "Child 1", completed=False, weight=1, parent_id=1)
+    child2 = task_row(3, "Child 2", completed=False, weight=1, parent_id=1)
 
     # Act
-    progress = bot._calculate_progress(parent)
+    progress = bot._calculate_progress(Task, parent, [parent, child1, child2])
 
     # Assert
     assert progress == 0.0
@@ -71,86 +95,120 @@ def test_calculate_progress_with_children_no_completion(bot):
 
 def test_calculate_progress_with_children_some_completion(bot):
     # Arrange
-    child1 = Task(id=2, name="Child 1", completed=True, weight=1, child_tasks=[])
-    child2 = Task(id=3, name="Child 2", completed=False, weight=1, child_tasks=[])
-    parent = Task(id=1, name="Parent", completed=False, child_tasks=[child1, child2])
+    parent = task_row(1, "Parent", completed=False)
+    child1 = task_row(2, "Child 1", completed=True, weight=1, parent_id=1)
+    child2 = task_row(3, "Child 2", completed=False, weight=1, parent_id=1)
 
     # Act
-    progress = bot._calculate_progress(parent)
+    progress = bot._calculate_progress(Task, parent, [parent, child1, child2])
 
     # Assert
-    assert progress == 50.0
-    assert Statics.COMPONENTS_PROGRESS[(1,Task)] == 50.0
-    assert Statics.COMPONENTS_PROGRESS[(2,Task)] == 100.0
+    assert progress == HALF
+    assert Statics.COMPONENTS_PROGRESS[(1,Task)] == HALF
+    assert Statics.COMPONENTS_PROGRESS[(2,Task)] == COMPLETE
     assert Statics.COMPONENTS_PROGRESS[(3,Task)] == 0.0
 
 
 def test_calculate_progress_with_children_all_completion(bot):
     # Arrange
-    child1 = Task(id=2, name="Child 1", completed=True, weight=0.5, child_tasks=[])
-    child2 = Task(id=3, name="Child 2", completed=True, weight=0.5, child_tasks=[])
-    parent = Task(id=1, name="Parent", completed=False, child_tasks=[child1, child2])
+    parent = task_row(1, "Parent", completed=False)
+    child1 = task_row(2, "Child 1", completed=True, weight=0.5, parent_id=1)
+    child2 = task_row(3, "Child 2", completed=True, weight=0.5, parent_id=1)
 
     # Act
-    progress = bot._calculate_progress(parent)
+    progress = bot._calculate_progress(Task, parent, [parent, child1, child2])
 
     # Assert
-    assert progress == 100.0
-    assert Statics.COMPONENTS_PROGRESS[(1,Task)] == 100.0
-    assert Statics.COMPONENTS_PROGRESS[(2,Task)] == 100.0
-    assert Statics.COMPONENTS_PROGRESS[(3,Task)] == 100.0
+    assert progress == COMPLETE
+    assert Statics.COMPONENTS_PROGRESS[(1,Task)] == COMPLETE
+    assert Statics.COMPONENTS_PROGRESS[(2,Task)] == COMPLETE
+    assert Statics.COMPONENTS_PROGRESS[(3,Task)] == COMPLETE
 
 
 def test_calculate_progress_with_nested_children(bot):
     # Arrange
-    grandchild1 = Task(id=4, name="Grandchild 1", completed=True, weight=10, child_tasks=[])
-    child1 = Task(id=2, name="Child 1", completed=True, weight=5, child_tasks=[grandchild1])
-    child2 = Task(id=3, name="Child 2", completed=False, weight=5, child_tasks=[])
-    parent = Task(id=1, name="Parent", completed=False, child_tasks=[child1, child2])
+    parent = task_row(1, "Parent", completed=False)
+    child1 = task_row(2, "Child 1", completed=True, weight=5, parent_id=1)
+    child2 = task_row(3, "Child 2", completed=False, weight=5, parent_id=1)
+    grandchild1 = task_row(4, "Grandchild 1", completed=True, weight=10, parent_id=2)
 
     # Act
-    progress = bot._calculate_progress(parent)
+    progress = bot._calculate_progress(Task, parent, [parent, child1, child2, grandchild1])
 
     # Assert
-    assert progress == 50.0
-    assert Statics.COMPONENTS_PROGRESS[(1,Task)] == 50.0
-    assert Statics.COMPONENTS_PROGRESS[(2,Task)] == 100.0
+    assert progress == HALF
+    assert Statics.COMPONENTS_PROGRESS[(1,Task)] == HALF
+    assert Statics.COMPONENTS_PROGRESS[(2,Task)] == COMPLETE
     assert Statics.COMPONENTS_PROGRESS[(3,Task)] == 0
-    assert Statics.COMPONENTS_PROGRESS[(4,Task)] == 100.0
+    assert Statics.COMPONENTS_PROGRESS[(4,Task)] == COMPLETE
 
 def test_calculate_progress_with_children_different_weights(bot):
     # Arrange
-    child4 = Task(id=5, name="Child 4", completed=True, weight=5, child_tasks=[])
-    child3 = Task(id=4, name="Child 3", completed=False, weight=10, child_tasks=[])
-    child1 = Task(id=2, name="Child 1", completed=True, weight=20, child_tasks=[])
-    child2 = Task(id=3, name="Child 2", completed=False, weight=65, child_tasks=[])
-    parent = Task(id=1, name="Parent", completed=False, child_tasks=[child1, child2, child3, child4])
+    parent = task_row(1, "Parent", completed=False)
+    child1 = task_row(2, "Child 1", completed=True, weight=20, parent_id=1)
+    child2 = task_row(3, "Child 2", completed=False, weight=65, parent_id=1)
+    child3 = task_row(4, "Child 3", completed=False, weight=10, parent_id=1)
+    child4 = task_row(5, "Child 4", completed=True, weight=5, parent_id=1)
 
     # Act
-    progress = bot._calculate_progress(parent)
+    progress = bot._calculate_progress(Task, parent, [parent, child1, child2, child3, child4])
 
     # Assert
-    assert progress == 25.0
+    assert progress == QUARTER
     # 5 + 0  + 20 + 0 = 25
     # 5 + 10 + 20 + 65 = 100
-    assert Statics.COMPONENTS_PROGRESS[(1,Task)] == 25.0
-    assert Statics.COMPONENTS_PROGRESS[(2,Task)] == 100.0
+    assert Statics.COMPONENTS_PROGRESS[(1,Task)] == QUARTER
+    assert Statics.COMPONENTS_PROGRESS[(2,Task)] == COMPLETE
     assert Statics.COMPONENTS_PROGRESS[(3,Task)] == 0
     assert Statics.COMPONENTS_PROGRESS[(4,Task)] == 0
-    assert Statics.COMPONENTS_PROGRESS[(5,Task)] == 100.0
+    assert Statics.COMPONENTS_PROGRESS[(5,Task)] == COMPLETE
 
 
 def test_calculate_progress_with_zero_sum_all(bot):
     # Arrange
-    child1 = Task(id=2, name="Child 1", completed=False, weight=0, child_tasks=[])
-    child2 = Task(id=3, name="Child 2", completed=False, weight=0, child_tasks=[])
-    parent = Task(id=1, name="Parent", completed=False, child_tasks=[child1, child2])
+    parent = task_row(1, "Parent", completed=False)
+    child1 = task_row(2, "Child 1", completed=False, weight=0, parent_id=1)
+    child2 = task_row(3, "Child 2", completed=False, weight=0, parent_id=1)
 
     # Act
-    progress = bot._calculate_progress(parent)
+    progress = bot._calculate_progress(Task, parent, [parent, child1, child2])
 
     # Assert
     assert progress == 0.0  # Should not raise ZeroDivisionError
     assert Statics.COMPONENTS_PROGRESS[(1,Task)] == 0.0
     assert Statics.COMPONENTS_PROGRESS[(2,Task)] == 0.0
-    assert Statics.COMPONENTS_PROGRESS[(3,Task)] == 0.0
\ No newline at end of file
+    assert Statics.COMPONENTS_PROGRESS[(3,Task)] == 0.0
+
+
+def test_calculate_progress_of_workspace(bot):
+    # Arrange
+    workspace = {"id": 1, "name": "Home"}
+    done = task_row(2, "Done", completed=True, weight=3)
+    todo = task_row(3, "Todo", completed=False, weight=1)
+
+    # Act
+    progress = bot._calculate_progress(Workspace, workspace, [done, todo])
+
+    # Assert
+    assert progress == THREE_QUARTERS
+    assert Statics.COMPONENTS_PROGRESS[(1,Workspace)] == THREE_QUARTERS
+    assert Statics.COMPONENTS_PROGRESS[(2,Task)] == COMPLETE
+    assert Statics.COMPONENTS_PROGRESS[(3,Task)] == 0.0
+
+
+def test_calculate_progress_of_nested_workspace(bot):
+    # Arrange
+    workspace = {"id": 1, "name": "Home"}
+    parent = task_row(2, "Parent", completed=True, weight=1)
+    done = task_row(3, "Done", completed=True, weight=1, parent_id=2)
+    todo = task_row(4, "Todo", completed=False, weight=1, parent_id=2)
+    other = task_row(5, "Other", completed=True, weight=2)
+
+    # Act
+    progress = bot._calculate_progress(Workspace, workspace, [parent, done, todo, other])
+
+    # Assert
+    assert progress == pytest.approx(70.0)
+    # 0.5 * 1 + 1 + 0 + 2 = 3.5 out of 1 + 1 + 1 + 2 = 5, every task of the workspace counts
+    assert Statics.COMPONENTS_PROGRESS[(2,Task)] == HALF
+    assert Statics.COMPONENTS_PROGRESS[(5,Task)] == COMPLETE
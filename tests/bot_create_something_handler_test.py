@@ -32,7 +32,7 @@ def mock_message():
 async def test__create_something_handler_success(bot_instance, mock_message):
     # Test the correct behavior
     mock_message.text = "/create_Task"
-    assert correct_class(bot_instance,mock_message.text) == True
+    assert correct_class(bot_instance,mock_message.text) is True
 
     with (
         patch.object(bot_instance, 'set_state', new_callable=AsyncMock) as mock_set_state,
@@ -70,11 +70,11 @@ async def test__create_something_handler_success(bot_instance, mock_message):
 async def test__create_something_handler_invalid_command(bot_instance, mock_message):
     # Setting what is sent
     mock_message.text = "/invalid_command"
-    assert correct_class(bot_instance,mock_message.text) == False
+    assert correct_class(bot_instance,mock_message.text) is False
     with (
         patch.object(bot_instance.bot, 'send_message', new_callable=AsyncMock) as mock_send_message
     ):
-        with pytest.raises(Exception) as e:
+        with pytest.raises(Exception):
             # Run the test by, setting the action
             await bot_instance._create_something_handler(mock_message)
 
@@ -82,4 +82,4 @@ async def test__create_something_handler_invalid_command(bot_instance, mock_mess
         mock_send_message.assert_not_called()
 
 def correct_class(bot_instance, text: str):
-    return text in list(bot_instance.CLASS_FROM_STATE.keys())
\ No newline at end of file
+    return text in list(bot_instance.CLASS_FROM_STATE.keys())
@@ -69,5 +69,5 @@ def test_parse_message_log_error(bot):
     try:
       bot.parse_message(message_mock)
       bot.logger.error.assert_called()
-    except:
-      pass
\ No newline at end of file
+    except Exception:
+      pass
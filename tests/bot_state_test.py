@@ -0,0 +1,47 @@
+import os
+from unittest.mock import MagicMock
+
+import pytest
+from dotenv import load_dotenv
+
+from database.database_service import DatabaseService
+from telegram_bot.bot import Bot
+
+
+@pytest.fixture
+def bot():
+    """Pytest fixture to create a Bot instance with a mocked database."""
+    load_dotenv()
+    bot_instance = Bot(os.getenv('TOKEN'))
+    bot_instance.database = MagicMock(spec=DatabaseService)
+    return bot_instance
+
+
+def test_state_is_read_once(bot):
+    bot.database.get_or_create_state.return_value = "/create_Task"
+
+    assert bot.check_state_and_create("Acie") == "/create_Task"
+    assert bot.check_state_and_create("Acie") == "/create_Task"
+
+    bot.database.get_or_create_state.assert_called_once_with("Acie")
+
+
+def test_cached_empty_state_is_a_hit(bot):
+    bot.database.get_or_create_state.return_value = None
+
+    for _ in range(3):
+        assert bot.check_state_and_create("Acie") is None
+
+    bot.database.get_or_create_state.assert_called_once_with("Acie")
+
+
+def test_clear_state_writes_only_a_set_state(bot):
+    bot.set_state("Acie", "/create_Task")
+    bot.database.set_state.reset_mock()
+
+    bot.clear_state("Acie")
+    bot.clear_state("Acie")
+
+    bot.database.set_state.assert_called_once_with("Acie", None)
+    assert bot.check_state_and_create("Acie") is None
+    bot.database.get_or_create_state.assert_not_called()
@@ -0,0 +1,117 @@
+import os
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from dotenv import load_dotenv
+from sqlalchemy.exc import SQLAlchemyError
+
+from core.models_sql_alchemy.models import User, UserState, Workspace
+from database.database_manager import (
+    RedisDatabaseManager,
+    SQLDatabaseManager,
+    get_redis_manager,
+    get_sql_manager,
+    use_managers,
+)
+from database.unit_of_work import current_unit
+from resources.statics import Statics
+from telegram_bot.bot import Bot
+
+load_dotenv()
+
+
+@pytest.fixture
+def bot(tmp_path):
+    """A Bot with a database of its own whose replies record what was committed when they were sent."""
+    use_managers(SQLDatabaseManager(f"sqlite:///{tmp_path / 'bot.db'}", echo=False), RedisDatabaseManager())
+    # Progress cached by other tests may carry the ids of this database's records
+    Statics.COMPONENTS_PROGRESS.clear()
+    bot_instance = Bot(os.getenv('TOKEN'))
+    bot_instance.database.create_user("Acie")
+    bot_instance.replies = []
+    bot_instance.handlers = {handler["function"].__name__: handler["function"]
+                             for handler in bot_instance.bot.message_handlers}
+
+    async def reply(chat_id, text, *args, **kwargs):
+        with get_sql_manager().get_session() as session:
+            state = session.get(UserState, "Acie").state
+            workspaces = [workspace.name for workspace in session.query(Workspace)]
+        bot_instance.replies.append((text, current_unit(get_sql_manager()), state, workspaces))
+    bot_instance.bot = MagicMock()
+    bot_instance.bot.send_message.side_effect = reply
+    yield bot_instance
+    bot_instance.database.delete(User, "Acie")
+    get_redis_manager().get_connection().flushdb()
+    use_managers()
+
+
+def create_message(text):
+    message = MagicMock()
+    message.text = text
+    message.chat.username = "Acie"
+    message.chat.id = 42
+    return message
+
+
+async def test_state_is_committed_before_the_reply(bot):
+    await bot.handlers["create_something_handler"](create_message("/create_Task"))
+
+    [(_, unit, state, _)] = bot.replies
+    assert unit is None
+    assert state == "/create_Task"
+
+
+async def test_created_record_is_committed_before_the_reply(bot):
+    bot.database.create(Workspace, {"name": "Home", "owner_name": "Acie"})
+    bot.set_state("Acie", "/create_Task")
+
+    await bot.handlers["process_something_with_state"](create_message("Name - Paint\nWorkspace Name - Home"))
+
+    [(text, unit, state, _)] = bot.replies
+    assert text.startswith("Successfully created Task named: Paint")
+    assert unit is None
+    assert state is None
+
+
+async def test_view_renders_and_replies_after_its_unit(bot, mocker):
+    bot.database.create(Workspace, {"name": "Home", "owner_name": "Acie", "description": None})
+    units = []
+
+    async def run(func, *args, size):
+        units.append(current_unit(get_sql_manager()))
+        return func(*args)
+    mocker.patch.object(bot.offloader, "run", side_effect=run)
+
+    await bot.handlers["view_something"](create_message("/view Workspace Home"))
+
+    assert units == [None]
+    [(text, unit, _, _)] = bot.replies
+    assert text.startswith("[░░░░░░░░░░] 0.0%\nHome")
+    assert unit is None
+
+
+def test_rolled_back_unit_forgets_the_cached_state(bot):
+    with pytest.raises(SQLAlchemyError), bot.unit(create_message("Home")):
+        bot.set_state("Acie", "creating workspace")
+        raise SQLAlchemyError("Workspace already exists")
+
+    assert "Acie" not in bot.cached_state
+    assert bot.check_state_and_create("Acie") is None
+
+
+@pytest.mark.parametrize("document", [
+    '{"workspace": {"name": "Imported"}, "tasks": [{"id": 1, "name": "Huge", "weight": 500}]}',
+    '{"workspace": {"name": "Imported"}, "tasks": ["not a task"]}',
+])
+async def test_invalid_import_is_answered_and_stores_nothing(bot, document):
+    message = create_message(None)
+    message.document.file_name = "Imported.json"
+    bot.bot.get_file = AsyncMock()
+    bot.bot.download_file = AsyncMock(return_value=document.encode("utf-8"))
+    bot.bot.reply_to = AsyncMock()
+
+    await bot.handlers["import_something"](message)
+
+    [(_, text), _] = bot.bot.reply_to.call_args
+    assert text.startswith("There was an error with your request\nRecord 1 of the import isn't a")
+    assert bot.database.get_by_custom_fields(Workspace, name="Imported", owner_name="Acie") == []
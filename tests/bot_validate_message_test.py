@@ -48,9 +48,9 @@ def test_validate_task_success(bot):
     assert task.name == "My Task"
     assert task.workspace_name == "My Workspace"
     assert task.description == "Some Description"
-    assert task.completed == True
+    assert task.completed is True
     assert task.parent_name == "Parent Task"
-    assert task.weight == 50.0 # Test Weight
+    assert task.weight == pytest.approx(50) # Test Weight
 
 def test_validate_task_invalid_weight(bot):
     """Test validation failure due to an invalid weight value."""
@@ -79,7 +79,7 @@ def test_baseobject_name_too_long(bot):
     with pytest.raises(ValidationError) as excinfo:
         bot.validate_message(message_mock, Task)
 
-    assert "Name" in str(excinfo.value)  # check the errors contain the string "Name"
+    assert "name" in str(excinfo.value)  # errors are reported by field name
     assert "string" in str(excinfo.value) #check type of exception
 
 def test_task_valid_completed_false(bot):
@@ -96,4 +96,4 @@ def test_task_valid_completed_true(bot):
     message_mock = create_message_mock(message_text)
     task = bot.validate_message(message_mock, Task)
     assert isinstance(task, Task)
-    assert task.completed is True # Check completed bool
\ No newline at end of file
+    assert task.completed is True # Check completed bool
@@ -1,3 +1,4 @@
+import io
 import os
 from unittest.mock import AsyncMock, MagicMock
 
@@ -7,9 +8,9 @@ from telebot import types
 
 from core.models_sql_alchemy.models import Task as BDTask
 from core.models_sql_alchemy.models import Workspace as BDWorkspace
-from database.database_manager import DatabaseService
+from database.database_service import DatabaseService
 from resources.statics import Statics
-from telegram_bot.bot import Bot
+from telegram_bot.bot import IMPORT_FORMATS, Bot
 
 
 @pytest.fixture
@@ -19,7 +20,7 @@ def bot(mocker):
     token = os.getenv('TOKEN')
     bot_instance = Bot(token)
     bot_instance.bot = AsyncMock()  # Mock the telebot instance
-    bot_instance.database = AsyncMock(spec=DatabaseService)
+    bot_instance.database = MagicMock(spec=DatabaseService)
     mocker.patch.object(bot_instance.bot, "_calculate_progress", new_callable=AsyncMock)
     return bot_instance
 
@@ -48,7 +49,7 @@ async def test_view_something_component_not_found(bot, message):
     await bot._view_something(message)
     bot.bot.send_message.assert_called_with(message.chat.id,
                                          "Component not found, please check the spelling"
-                                         f"it should be one of dict_keys(['Workspace', 'Task'])")
+                                         "it should be one of dict_keys(['Workspace', 'Task'])")
 
 
 async def test_view_something_record_not_found(bot, message):
@@ -57,18 +58,16 @@ async def test_view_something_record_not_found(bot, message):
     bot.database.get_by_custom_fields.return_value = []
     await bot._view_something(message)
     bot.bot.send_message.assert_called_with(message.chat.id,
-                                             f"Record with name NonExistentWorkspace in component Workspace doesn't exist")
+                                             "Record with name NonExistentWorkspace in component Workspace doesn't exist")
 
 
 
 async def test_view_something_success(bot, message):
     """Test case when the view command is successful and a record is found."""
     message.text = "/view Workspace MyWorkspace"
-    mock_workspace = MagicMock(spec=BDWorkspace)
-    mock_workspace.name = "MyWorkspace"
-    mock_workspace.description = "My workspace description"
-    mock_workspace.child_tasks = []
-    bot.database.get_by_custom_fields.return_value = [mock_workspace]
+    workspace = {"id": 1, "name": "MyWorkspace", "description": "My workspace description"}
+    bot.database.get_by_custom_fields.return_value = [workspace]
+    bot.database.get_subtree.return_value = []
     bot._calculate_progress = MagicMock(return_value=75.0)
 
     await bot._view_something(message)
@@ -76,7 +75,8 @@ async def test_view_something_success(bot, message):
     bot.database.get_by_custom_fields.assert_called_with(BDWorkspace,
                                                name="MyWorkspace",
                                                owner_name="testuser")
-    bot._calculate_progress.assert_called_with(mock_workspace)
+    bot.database.get_subtree.assert_called_with(BDWorkspace, 1)
+    bot._calculate_progress.assert_called_with(BDWorkspace, workspace, [])
 
     expected_message = "[███████░░░] 75.0%\n" \
                        "MyWorkspace\n" \
@@ -87,11 +87,9 @@ async def test_view_something_success(bot, message):
 async def test_view_something_with_separate_name_success(bot, message):
     """Test case when the view command is successful and a record is found."""
     message.text = "/view Workspace My Work space"
-    mock_workspace = MagicMock(spec=BDWorkspace)
-    mock_workspace.name = "My Work space"
-    mock_workspace.description = "My workspace description"
-    mock_workspace.child_tasks = []
-    bot.database.get_by_custom_fields.return_value = [mock_workspace]
+    workspace = {"id": 1, "name": "My Work space", "description": "My workspace description"}
+    bot.database.get_by_custom_fields.return_value = [workspace]
+    bot.database.get_subtree.return_value = []
     bot._calculate_progress = MagicMock(return_value=75.0)
 
     await bot._view_something(message)
@@ -99,7 +97,7 @@ async def test_view_something_with_separate_name_success(bot, message):
     bot.database.get_by_custom_fields.assert_called_with(BDWorkspace,
                                                name="My Work space",
                                                owner_name="testuser")
-    bot._calculate_progress.assert_called_with(mock_workspace)
+    bot._calculate_progress.assert_called_with(BDWorkspace, workspace, [])
 
     expected_message = "[███████░░░] 75.0%\n" \
                        "My Work space\n" \
@@ -111,14 +109,15 @@ async def test_view_something_with_separate_name_success(bot, message):
 async def test_view_something_success_with_child_task(bot, message):
     """Test case when the view command is successful and a record is found."""
     message.text = "/view Task MyTask"
-    mock_task = MagicMock(spec=BDTask)
-    mock_task.name = "MyTask"
-    mock_task.description = "My task description"
-    mock_task.child_tasks = [BDTask(name="ChildTask1", id=1), BDTask(name="ChildTask2", id=2)]
-    Statics.COMPONENTS_PROGRESS[(1,BDTask)] = 50.0
-    Statics.COMPONENTS_PROGRESS[(2,BDTask)] = 25.0
-
-    bot.database.get_by_custom_fields.return_value = [mock_task]
+    task = {"id": 10, "name": "MyTask", "description": "My task description", "parent_id": None}
+    subtree = [task,
+               {"id": 11, "name": "ChildTask1", "description": None, "parent_id": 10},
+               {"id": 12, "name": "ChildTask2", "description": None, "parent_id": 10}]
+    Statics.COMPONENTS_PROGRESS[(11,BDTask)] = 50.0
+    Statics.COMPONENTS_PROGRESS[(12,BDTask)] = 25.0
+
+    bot.database.get_by_custom_fields.return_value = [task]
+    bot.database.get_subtree.return_value = subtree
     bot._calculate_progress = MagicMock(return_value=75.0)
 
     await bot._view_something(message)
@@ -126,7 +125,8 @@ async def test_view_something_success_with_child_task(bot, message):
     bot.database.get_by_custom_fields.assert_called_with(BDTask,
                                                name="MyTask",
                                                owner_name="testuser")
-    bot._calculate_progress.assert_called_with(mock_task)
+    bot.database.get_subtree.assert_called_with(BDTask, 10)
+    bot._calculate_progress.assert_called_with(BDTask, task, subtree)
 
     child1 = f"    {'ChildTask1':<{50}} {'[█████░░░░░] 50.0%'}\n"
     child2 = f"    {'ChildTask2':<{50}} {'[██░░░░░░░░] 25.0%'}\n"
@@ -137,6 +137,77 @@ async def test_view_something_success_with_child_task(bot, message):
 
     bot.bot.send_message.assert_called_with(message.chat.id, expected_message)
 
+
+async def test_view_something_renders_nested_tasks_depth_first(bot, message):
+    """Subtasks follow their parent, indented by their depth, computed from the workspace's rows."""
+    Statics.COMPONENTS_PROGRESS.clear()
+    message.text = "/view Workspace Home"
+    workspace = {"id": 1, "name": "Home", "description": None}
+    subtree = [{"id": 1, "name": "Kitchen", "parent_id": None, "completed": False, "weight": 1},
+               {"id": 2, "name": "Garden", "parent_id": None, "completed": True, "weight": 1},
+               {"id": 3, "name": "Paint", "parent_id": 1, "completed": True, "weight": 1},
+               {"id": 4, "name": "Tiles", "parent_id": 1, "completed": False, "weight": 1}]
+    bot.database.get_by_custom_fields.return_value = [workspace]
+    bot.database.get_subtree.return_value = subtree
+
+    await bot._view_something(message)
+
+    # Only completed children count towards their parent, Kitchen isn't
+    expected_message = "[█████░░░░░] 50.0%\n" \
+                       "Home\n" \
+                       f"    {'Kitchen':<{50}} {'[█████░░░░░] 50.0%'}\n" \
+                       f"        {'Paint':<{50}} {'[██████████] 100.0%'}\n" \
+                       f"        {'Tiles':<{50}} {'[░░░░░░░░░░] 0.0%'}\n" \
+                       f"    {'Garden':<{50}} {'[██████████] 100.0%'}\n"
+    bot.bot.send_message.assert_called_with(message.chat.id, expected_message)
+    assert Statics.COMPONENTS_PROGRESS[(1, BDWorkspace)] == pytest.approx(50)
+
+
+async def test_export_something_invalid_arguments(bot, message):
+    """Only workspaces can be exported."""
+    message.text = "/export Task MyTask"
+    await bot._export_something(message)
+    bot.bot.send_message.assert_called_with(message.chat.id,
+                                            "Please specify what you want to export\n"
+                                            "Example: /export Workspace Workspace_Name csv")
+    bot.database.get_by_custom_fields.assert_not_called()
+
+
+async def test_export_something_record_not_found(bot, message):
+    message.text = "/export Workspace Missing"
+    bot.database.get_by_custom_fields.return_value = []
+    await bot._export_something(message)
+    bot.bot.send_message.assert_called_with(message.chat.id,
+                                            "Record with name Missing in component Workspace doesn't exist")
+
+
+@pytest.mark.parametrize("file_format", ["json", "csv"])
+async def test_export_something_sends_the_workspace_tree(bot, message, file_format):
+    """The workspace found by name is exported with the tasks the repository streams."""
+    message.text = f"/export Workspace My Home {file_format}"
+    workspace = {"id": 7, "name": "My Home", "description": "Rooms"}
+    tasks = [{"id": 1, "name": "Kitchen", "description": None, "completed": False, "weight": 2, "parent_id": None},
+             {"id": 2, "name": "Paint", "description": None, "completed": True, "weight": 1, "parent_id": 1}]
+    bot.database.get_by_custom_fields.return_value = [workspace]
+    bot.database.iter_workspace_tree.return_value = iter(tasks)
+    sent = {}
+
+    async def send_document(chat_id, document, visible_file_name):
+        sent.update(chat_id=chat_id, content=document.read().decode("utf-8"), file_name=visible_file_name)
+    bot.bot.send_document.side_effect = send_document
+
+    await bot._export_something(message)
+
+    bot.database.get_by_custom_fields.assert_called_with(BDWorkspace, name="My Home", owner_name="testuser")
+    bot.database.iter_workspace_tree.assert_called_with(7)
+    assert sent["chat_id"] == message.chat.id
+    assert sent["file_name"] == f"My Home.{file_format}"
+    import_format = IMPORT_FORMATS[file_format]
+    records = list(import_format(io.StringIO(sent["content"], newline="")))
+    assert records[0] == ("workspace", {"name": "My Home", "description": "Rooms"})
+    assert [(fields["id"], fields["name"], fields["parent_id"]) for _, fields in records[1:]] == [
+        (1, "Kitchen", None), (2, "Paint", 1)]
+
 # async def test_view_something_no_child_error(bot, message):
 #     """Test case when the view command is successful and a record is found."""
 #     message.text = "/view Workspace MyWorkspace"
@@ -157,4 +228,4 @@ async def test_view_something_success_with_child_task(bot, message):
 #                        "MyWorkspace\n" \
 #                        "My workspace description\n"  # Wrap returns a list
 #
-#     bot.bot.send_message.assert_called_with(message.chat.id, expected_message)
\ No newline at end of file
+#     bot.bot.send_message.assert_called_with(message.chat.id, expected_message)
@@ -0,0 +1,74 @@
+import pytest
+
+from database.database_manager import RedisDatabaseManager, SQLDatabaseManager
+from resources.config import Settings, get_settings
+
+
+@pytest.fixture
+def clean_env(monkeypatch, tmp_path):
+    """Settings read from the environment only, not from a developer's .env file."""
+    monkeypatch.chdir(tmp_path)
+    get_settings.cache_clear()
+    yield monkeypatch
+    get_settings.cache_clear()
+
+
+def test_settings_defaults(clean_env):
+    clean_env.delenv("DATABASE_URL", raising=False)
+    clean_env.delenv("CACHE_TTL", raising=False)
+    settings = Settings()
+
+    assert settings.database_url == "sqlite:///database/progresser.db"
+    assert settings.cache_ttl is None
+    assert settings.log_json is False
+
+
+def test_settings_from_environment(clean_env):
+    clean_env.setenv("DATABASE_URL", "postgresql://bot@db/progresser")
+    clean_env.setenv("DB_POOL_SIZE", "20")
+    clean_env.setenv("db_prepare_threshold", "none")
+    clean_env.setenv("CACHE_TTL", "60")
+    clean_env.setenv("LOG_JSON", "1")
+
+    settings = Settings()
+
+    assert settings.model_dump(include={"database_url", "db_pool_size", "db_prepare_threshold",
+                                        "cache_ttl", "log_json"}) == {
+        "database_url": "postgresql://bot@db/progresser",
+        "db_pool_size": 20,
+        "db_prepare_threshold": None,
+        "cache_ttl": 60,
+        "log_json": True,
+    }
+
+
+def test_settings_from_env_file(clean_env, tmp_path):
+    clean_env.delenv("REDIS_PORT", raising=False)
+    (tmp_path / ".env").write_text("REDIS_PORT=6380\n", encoding="utf-8")
+
+    assert Settings().model_dump(include={"redis_port"}) == {"redis_port": 6380}
+
+
+def test_get_settings_is_cached(clean_env):
+    assert get_settings() is get_settings()
+
+
+def test_managers_from_settings():
+    settings = Settings(database_url="postgresql://bot@db/progresser", db_pool_size=7, cache_ttl=30)
+
+    sql_manager = SQLDatabaseManager.from_settings(settings, create_schema=False)
+    redis_manager = RedisDatabaseManager.from_settings(settings)
+
+    assert sql_manager.engine.dialect.driver == "psycopg"
+    assert sql_manager.engine.pool.size() == settings.db_pool_size
+    assert redis_manager.cache_ttl == settings.cache_ttl
+
+
+def test_replicas_from_settings(clean_env):
+    clean_env.setenv("DATABASE_REPLICA_URLS", '["postgresql://bot@replica1/progresser", "postgresql://bot@replica2/progresser"]')
+    settings = Settings(database_url="postgresql://bot@db/progresser", replica_sticky_seconds=2)
+
+    sql_manager = SQLDatabaseManager.from_settings(settings)
+
+    assert [engine.url.host for engine in sql_manager.replica_engines] == ["replica1", "replica2"]
+    assert sql_manager.replica_sticky_seconds == settings.replica_sticky_seconds
@@ -0,0 +1,89 @@
+import asyncio
+from collections import Counter
+
+import pytest
+from telebot import asyncio_helper
+from telebot.async_telebot import AsyncTeleBot
+
+from benchmarks.e2e import Sample, Step, replay, summarize, tree_text, user_script
+from benchmarks.fake_telegram import FakeTelegramServer
+from core.services.task_batch import parse_task_blocks
+
+
+@pytest.fixture
+async def server(monkeypatch):
+    server = FakeTelegramServer()
+    await server.start()
+    monkeypatch.setattr(asyncio_helper, "API_URL", server.api_url)
+    yield server
+    await server.stop()
+
+
+@pytest.fixture
+async def echo_bot(server):
+    """A bot answering every message with its text, twice for /twice."""
+    bot = AsyncTeleBot("123456:TEST")
+
+    @bot.message_handler(func=lambda message: True)
+    async def echo(message):
+        await bot.reply_to(message, message.text)
+        if message.text == "/twice":
+            await bot.send_message(message.chat.id, "again")
+
+    yield bot
+    await bot.close_session()
+
+
+async def test_fake_server_serves_updates_and_collects_replies(server, echo_bot):
+    polling = asyncio.create_task(echo_bot.polling(timeout=1))
+    try:
+        [reply] = await server.send(7, "alice", "hello")
+        replies = await server.send(7, "alice", "/twice", replies=2)
+    finally:
+        polling.cancel()
+        await asyncio.gather(polling, return_exceptions=True)
+
+    assert (reply["chat"]["id"], reply["text"]) == (7, "hello")
+    assert [message["text"] for message in replies] == ["/twice", "again"]
+    assert server.requests["sendMessage"] == len([reply, *replies])
+    assert server.requests["getMe"] == 1
+
+
+async def test_fake_server_times_out_without_reply(server):
+    with pytest.raises(TimeoutError):
+        await server.send(7, "alice", "nobody listens", timeout=0.05)
+
+
+async def test_replay_and_summarize(server, echo_bot):
+    polling = asyncio.create_task(echo_bot.polling(timeout=1))
+    try:
+        scripts = {f"user{index}": [Step("greet", "hi"), Step("double", "/twice", replies=2)] for index in range(4)}
+        samples = await replay(server, scripts, timeout=5)
+    finally:
+        polling.cancel()
+        await asyncio.gather(polling, return_exceptions=True)
+
+    report = summarize(samples, seconds=2.0, counters=Counter(sql_statements=16))
+    assert (report["messages"], report["messages_per_second"]) == (8, 4.0)
+    assert report["scenarios"]["greet"]["messages"] == len(scripts)
+    assert report["latency"]["errors"] == 0
+    assert report["per_message"] == {"sql_statements": 2.0}
+
+
+def test_summarize_counts_errors_apart_from_latency():
+    samples = [Sample("view", 0.010, True), Sample("view", 0.020, True), Sample("view", 30.0, False)]
+
+    stats = summarize(samples, seconds=1.0)["scenarios"]["view"]
+
+    assert stats["errors"] == 1
+    assert stats["p99_ms"] <= samples[1].seconds * 1000
+
+
+def test_user_script_tree_is_a_valid_create_tasks_message():
+    rows = parse_task_blocks(tree_text(depth=3, fanout=2))
+
+    assert len(rows) == 1 + 2 + 4 + 8
+    assert rows[0]["name"] == "Root" and rows[0]["parent_index"] is None
+    assert [step.scenario for step in user_script(tasks=1, tree_depth=1, tree_fanout=1, views=2)] == [
+        "registration", "create_workspace", "create_workspace", "create_task", "create_task",
+        "create_tree", "create_tree", "view", "view"]
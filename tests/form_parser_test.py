@@ -0,0 +1,82 @@
+import random
+
+import pytest
+
+from core.schemas_pydantic.schemas import Task
+from core.services.form_parser import GENERIC_FORM, FormParseError, compile_form_schema
+
+CYRILLIC = "абвгдеёжзийклмнопрстуфхцчшщъыьэюяАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ"
+LATIN = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+# Shares of generated fields followed by a line without a separator, by an empty line
+NOISE_LINE_SHARE = 0.2
+EMPTY_LINE_SHARE = 0.1
+
+
+def test_task_schema_maps_aliases_to_field_names():
+    text = ("Name - My Task\n"
+            "Workspace Name - My Workspace\n"
+            "Parent Name - Parent Task\n"
+            "Weight - 50\n"
+            "Completed - Да")
+    assert compile_form_schema(Task).parse(text) == {
+        "name": "My Task",
+        "workspace_name": "My Workspace",
+        "parent_name": "Parent Task",
+        "weight": "50",
+        "completed": True,
+    }
+
+
+def test_task_schema_is_compiled_once():
+    assert compile_form_schema(Task) is compile_form_schema(Task)
+
+
+def test_task_schema_value_with_hyphens():
+    parsed = compile_form_schema(Task).parse("Description - step one - step two")
+    assert parsed == {"description": "step one - step two"}
+
+
+def test_task_schema_reports_line_of_invalid_boolean():
+    text = "Name - My Task\n\nCompleted - Может быть"
+    with pytest.raises(FormParseError) as excinfo:
+        compile_form_schema(Task).parse(text)
+
+    [error] = excinfo.value.errors
+    assert (error.line_number, error.line) == (3, "Completed - Может быть")
+
+
+def test_strict_schema_reports_every_invalid_line():
+    text = "Name - My Task\nnot a field\nColour - red\nName - Again"
+    with pytest.raises(FormParseError) as excinfo:
+        compile_form_schema(Task, strict=True).parse(text)
+
+    assert [error.line_number for error in excinfo.value.errors] == [2, 3, 4]
+
+
+def test_lenient_schema_skips_unknown_lines():
+    text = "Name - My Task\nnot a field\nColour - red"
+    assert compile_form_schema(Task).parse(text) == {"name": "My Task"}
+
+
+def test_generic_form_keeps_labels():
+    assert GENERIC_FORM.parse("Поле - Значение\nCompleted - No") == {"Поле": "Значение", "Completed": False}
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_generic_form_fuzz(seed):
+    """Random forms with Cyrillic text, padding, hyphenated values and noise lines."""
+    rng = random.Random(seed)
+    alphabet = CYRILLIC + LATIN + " "
+    expected = {}
+    lines = []
+    for i in range(rng.randint(1, 500)):
+        label = f"{rng.choice(CYRILLIC)}{''.join(rng.choices(alphabet, k=rng.randint(0, 20)))}{i}"
+        value = "".join(rng.choices(alphabet + "-!@#", k=rng.randint(0, 80))).lstrip("- ").rstrip()
+        expected[label] = value
+        lines.append(f"{' ' * rng.randint(0, 3)}{label}{' ' * rng.randint(0, 3)}-{' ' * rng.randint(0, 3)}{value}")
+        if rng.random() < NOISE_LINE_SHARE:
+            lines.append("".join(rng.choices(alphabet, k=rng.randint(0, 40))))
+        if rng.random() < EMPTY_LINE_SHARE:
+            lines.append("")
+
+    assert GENERIC_FORM.parse("\n".join(lines)) == expected
@@ -0,0 +1,34 @@
+import json
+
+import pytest
+
+from benchmarks.hot_paths import BASELINE, best_of, compare, regressions, run
+from database.database_manager import RedisDatabaseManager
+
+
+def report(**normalized):
+    return {"cases": {name: {"seconds": value / 1000, "normalized": value} for name, value in normalized.items()}}
+
+
+def test_compare_and_regressions():
+    changes = compare(report(create=1.5, get=0.9, new=1.0), report(create=1.0, get=1.0, gone=1.0))
+
+    assert changes == pytest.approx({"create": 0.5, "get": -0.1})
+    assert regressions(changes, threshold=0.25) == ["create"]
+    assert regressions(changes, threshold=0.6) == []
+
+
+def test_best_of_keeps_fastest_run_per_case():
+    best = best_of([report(create=2.0, get=1.0), report(create=1.0, get=3.0)])
+
+    assert {name: stats["normalized"] for name, stats in best["cases"].items()} == {"create": 1.0, "get": 1.0}
+
+
+def test_run_covers_the_baseline_cases():
+    fakeredis = pytest.importorskip("fakeredis")
+
+    current = run(RedisDatabaseManager(client=fakeredis.FakeRedis(decode_responses=True)), calls=3)
+
+    with open(BASELINE, encoding="utf-8") as file:
+        assert current["cases"].keys() == json.load(file)["cases"].keys()
+    assert all(stats["seconds"] > 0 for stats in current["cases"].values())
@@ -0,0 +1,39 @@
+import subprocess
+import sys
+
+import pytest
+
+# What a replica imports before it can poll
+STARTUP_MODULES = ["telegram_bot.bot"]
+# Only needed by rarely used commands or by maintenance tasks
+LAZY_MODULES = ["numpy", "alembic", "core.services.progress_engine", "sqlalchemy.dialects.postgresql"]
+# Seconds, about three times a warm local run, so only real regressions fail
+IMPORT_BUDGET = 3.0
+
+
+def import_times(modules):
+    """Returns {module: self time in seconds} of a fresh interpreter importing `modules`."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_time, _, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = int(self_time) / 1_000_000
+    return times
+
+
+@pytest.fixture(scope="module")
+def startup_imports():
+    return import_times(STARTUP_MODULES)
+
+
+def test_startup_skips_lazy_modules(startup_imports):
+    assert not set(LAZY_MODULES) & startup_imports.keys()
+
+
+def test_startup_import_budget(startup_imports):
+    total = sum(startup_imports.values())
+    slowest = sorted(startup_imports.items(), key=lambda item: item[1], reverse=True)[:10]
+    assert total < IMPORT_BUDGET, f"Imports took {total:.2f}s, slowest: {slowest}"
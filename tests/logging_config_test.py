@@ -0,0 +1,65 @@
+import json
+import logging
+
+import pytest
+
+from resources.logging_config import setup_logging
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    """Configures logging into a temporary file and restores the root logger afterwards."""
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield tmp_path / "bot.log"
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+def test_setup_logging_writes_through_queue(log_file):
+    listener = setup_logging(filename=str(log_file))
+    logging.getLogger("bot_test").info("User %s triggered %s", "test_user", "/view")
+    listener.stop()
+
+    assert "User test_user triggered /view" in log_file.read_text(encoding="utf-8")
+
+
+def test_setup_logging_json_output(log_file):
+    listener = setup_logging(filename=str(log_file), json_output=True)
+    logging.getLogger("bot_test").info("Создан %s", "Workspace", extra={"chat_id": 1})
+    listener.stop()
+
+    record = json.loads(log_file.read_text(encoding="utf-8").splitlines()[0])
+    assert record["message"] == "Создан Workspace"
+    assert record["logger"] == "bot_test"
+    assert record["chat_id"] == 1
+
+
+def test_setup_logging_module_levels(log_file):
+    listener = setup_logging(filename=str(log_file), module_levels={"noisy": logging.WARNING})
+    logging.getLogger("noisy").info("dropped")
+    logging.getLogger("noisy").warning("kept")
+    listener.stop()
+
+    content = log_file.read_text(encoding="utf-8")
+    assert "dropped" not in content
+    assert "kept" in content
+
+
+def test_setup_logging_freezes_messages_and_tracebacks(log_file):
+    listener = setup_logging(filename=str(log_file), json_output=True)
+    pending = ["Home"]
+    logging.getLogger("bot_test").info("Pending %s", pending)
+    pending.append("Work")
+    try:
+        raise ValueError("broken form")
+    except ValueError:
+        logging.getLogger("bot_test").exception("Failed")
+    listener.stop()
+
+    first, second = (json.loads(line) for line in log_file.read_text(encoding="utf-8").splitlines())
+    assert first["message"] == "Pending ['Home']"
+    assert "ValueError: broken form" in second["exc_info"]
@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import time
+from types import SimpleNamespace
+
+from telegram_bot.monitor import LoopMonitor
+
+BLOCKED_SECONDS = 0.3
+UPDATE_AGE_SECONDS = 30
+
+
+def blocking_handler():
+    time.sleep(BLOCKED_SECONDS)
+
+
+async def test_monitor_measures_lag_and_samples_blocked_stack(caplog):
+    monitor = LoopMonitor(interval=0.01, block_threshold=0.1, report_seconds=3600)
+    monitor.start()
+    await asyncio.sleep(0.05)
+
+    with caplog.at_level(logging.WARNING, logger="telegram_bot.monitor"):
+        blocking_handler()
+        await asyncio.sleep(0.05)
+    await monitor.stop()
+
+    stats = monitor.snapshot()
+    # Allows 0.1 s of slack for when the samples fall
+    assert stats["max_loop_lag_ms"] >= (BLOCKED_SECONDS - 0.1) * 1000
+    assert stats["blocked_samples"] == 1
+    [record] = caplog.records
+    assert "blocking_handler" in record.getMessage()
+
+
+async def test_monitor_reports_stats_as_extra_fields(caplog):
+    monitor = LoopMonitor(interval=0.01, block_threshold=0, report_seconds=0.02)
+
+    with caplog.at_level(logging.INFO, logger="telegram_bot.monitor"):
+        monitor.start()
+        await asyncio.sleep(0.1)
+        await monitor.stop()
+
+    assert caplog.records
+    assert {"loop_lag_ms", "handlers_waiting", "max_update_age_s"} <= vars(caplog.records[0]).keys()
+
+
+async def test_monitor_counts_waiting_and_running_handlers():
+    monitor = LoopMonitor()
+    slots = asyncio.Semaphore(1)
+    release = asyncio.Event()
+
+    async def handler(message):
+        with monitor.queued(message):
+            await slots.acquire()
+        try:
+            with monitor.running():
+                await release.wait()
+        finally:
+            slots.release()
+
+    tasks = [asyncio.create_task(handler(SimpleNamespace(date=int(time.time()) - UPDATE_AGE_SECONDS))) for _ in range(3)]
+    await asyncio.sleep(0)
+
+    stats = monitor.snapshot()
+    assert (stats["handlers_in_flight"], stats["handlers_waiting"]) == (1, 2)
+    assert stats["max_update_age_s"] >= UPDATE_AGE_SECONDS - 1
+
+    release.set()
+    await asyncio.gather(*tasks)
+    stats = monitor.snapshot(reset=True)
+    assert (stats["handlers_in_flight"], stats["handlers_waiting"], stats["handled"]) == (0, 0, 3)
+    assert stats["max_handlers_in_flight"] == 1
+    assert monitor.snapshot()["handled"] == 0
+    assert monitor.snapshot()["max_update_age_s"] == 0
+
+
+async def test_cancelled_waiting_handler_leaves_the_backlog():
+    monitor = LoopMonitor()
+    slots = asyncio.Semaphore(0)
+
+    async def handler():
+        with monitor.queued(SimpleNamespace(date=None)):
+            await slots.acquire()
+
+    task = asyncio.create_task(handler())
+    await asyncio.sleep(0)
+    assert monitor.waiting == 1
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert monitor.waiting == 0
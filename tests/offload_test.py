@@ -0,0 +1,84 @@
+import pickle
+
+import pytest
+
+from core.services.form_parser import FormParseError
+from core.services.offload import Offloader, Timing
+from core.services.task_batch import parse_task_blocks
+from core.services.view_render import render_view
+
+TASKS = "Workspace Name - Home\nName - Renovation\n\n    Name - Paint walls\n    Weight - 5"
+
+
+@pytest.fixture
+def offloader():
+    offloader = Offloader(max_workers=1, initial_threshold=100)
+    yield offloader
+    offloader.shutdown()
+
+
+async def test_small_input_runs_inline(offloader):
+    rows = await offloader.run(parse_task_blocks, TASKS, size=len(TASKS))
+
+    assert [row["name"] for row in rows] == ["Renovation", "Paint walls"]
+    assert offloader._pool is None
+    assert offloader.timings[parse_task_blocks].seconds_per_unit > 0
+    assert offloader.timings[parse_task_blocks].overhead is None
+
+
+async def test_big_input_runs_in_pool(offloader):
+    text = "\n\n".join([TASKS] * 50)
+
+    rows = await offloader.run(parse_task_blocks, text, size=len(text))
+
+    assert len(rows) == 50 * len(parse_task_blocks(TASKS))
+    assert offloader._pool is not None
+    timing = offloader.timings[parse_task_blocks]
+    assert timing.seconds_per_unit > 0 and timing.overhead >= 0
+
+
+async def test_pool_errors_reach_the_caller(offloader):
+    text = "Name - No workspace\n" + "Weight - 1\n" * 200
+
+    with pytest.raises(FormParseError) as error:
+        await offloader.run(parse_task_blocks, text, size=len(text))
+
+    assert offloader._pool is not None
+    assert error.value.errors[0].reason == "field 'Weight' is repeated"
+
+
+async def test_disabled_pool_always_runs_inline():
+    offloader = Offloader(max_workers=0, initial_threshold=0)
+
+    assert await offloader.run(sum, [1, 2, 3], size=10**6) == sum([1, 2, 3])
+    assert offloader._pool is None
+
+
+def test_threshold_follows_measured_cost():
+    offloader = Offloader(inline_budget=0.005, initial_threshold=2000)
+    assert offloader.threshold(render_view) == offloader.initial_threshold
+
+    offloader.timings[render_view] = Timing(seconds_per_unit=1e-5)
+    assert offloader.threshold(render_view) == pytest.approx(500)
+
+    # Offloading slower than the budget moves the threshold up
+    offloader.timings[render_view].record(0, 0.0, overhead=0.02)
+    assert offloader.threshold(render_view) == pytest.approx(2000)
+
+
+def test_timing_moving_average():
+    timing = Timing()
+    timing.record(100, 0.1)
+    timing.record(100, 0.2)
+
+    assert timing.seconds_per_unit == pytest.approx(0.001 + 0.2 * 0.001)
+
+
+def test_form_parse_error_survives_pickling():
+    with pytest.raises(FormParseError) as error:
+        parse_task_blocks("Name - No workspace")
+
+    restored = pickle.loads(pickle.dumps(error.value))
+
+    assert restored.errors == error.value.errors
+    assert str(restored) == str(error.value)
@@ -0,0 +1,154 @@
+import random
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from core.models_sql_alchemy.models import Base, Task, User, Workspace
+from core.services.progress_engine import NO_PARENT, compute_progress, load_progress, progress_of_rows
+
+# Shares of generated tasks with a parent, of completed ones
+CHILD_SHARE = 0.8
+COMPLETED_SHARE = 0.6
+
+
+def _recursive_progress(task_id, children, weights, completed):
+    """The original recursive rules, used as the reference."""
+    if not children.get(task_id):
+        return completed[task_id] * 100.0
+    sum_completed = 0
+    sum_all = 0
+    for child in children[task_id]:
+        sum_all += weights[child]
+        if completed[child]:
+            sum_completed += _recursive_progress(child, children, weights, completed) / 100 * weights[child]
+    return sum_completed / sum_all * 100 if sum_all > 0 else 0
+
+
+def _flat_progress(task_ids, progress, weights, completed):
+    """The original workspace rule, every task of the workspace counted with its own progress."""
+    sum_all = sum(weights[task_id] for task_id in task_ids)
+    sum_completed = sum(progress[task_id] / 100 * weights[task_id] for task_id in task_ids if completed[task_id])
+    return sum_completed / sum_all * 100 if sum_all > 0 else 0
+
+
+def _random_forest(seed, size):
+    rng = random.Random(seed)
+    ids = rng.sample(range(1, size * 10), size)
+    parent_ids, workspace_ids = [], []
+    for position, task_id in enumerate(ids):
+        parent = rng.choice(ids[:position]) if position and rng.random() < CHILD_SHARE else None
+        parent_ids.append(parent if parent is not None else NO_PARENT)
+        workspace_ids.append(workspace_ids[ids.index(parent)] if parent is not None else rng.randint(1, 3))
+    weights = [rng.choice([0, 0.5, 1, 5, 10]) for _ in ids]
+    completed = [rng.random() < COMPLETED_SHARE for _ in ids]
+    return ids, parent_ids, workspace_ids, weights, completed
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_compute_progress_matches_recursive_rules(seed):
+    ids, parent_ids, workspace_ids, weights, completed = _random_forest(seed, 200)
+    children = {}
+    for task_id, parent_id, workspace_id in zip(ids, parent_ids, workspace_ids):
+        key = parent_id if parent_id != NO_PARENT else ("workspace", workspace_id)
+        children.setdefault(key, []).append(task_id)
+    weight_of = dict(zip(ids, weights))
+    completed_of = dict(zip(ids, completed))
+
+    result = compute_progress(np.array(ids), np.array(parent_ids), np.array(workspace_ids),
+                              np.array(weights), np.array(completed))
+
+    progress_of = {task_id: _recursive_progress(task_id, children, weight_of, completed_of) for task_id in ids}
+    for task_id in ids:
+        assert result.task(task_id) == pytest.approx(progress_of[task_id])
+    for workspace_id in set(workspace_ids):
+        tasks = [task_id for task_id, task_workspace in zip(ids, workspace_ids) if task_workspace == workspace_id]
+        expected = _flat_progress(tasks, progress_of, weight_of, completed_of)
+        assert result.workspace(workspace_id) == pytest.approx(expected)
+
+
+def test_compute_progress_cycles_and_missing_parents_are_zero():
+    # 1 is a top level task, 2 <-> 3 form a cycle, 4 points to a task that doesn't exist
+    result = compute_progress(np.array([1, 2, 3, 4]), np.array([NO_PARENT, 3, 2, 99]),
+                              np.array([7, 7, 7, 7]), np.ones(4), np.ones(4, dtype=bool))
+
+    assert result.task(1) == pytest.approx(100)
+    assert result.task(2) == result.task(3) == result.task(4) == 0.0
+    assert result.workspace(7) == pytest.approx(25)
+
+
+def test_compute_progress_empty():
+    result = compute_progress(np.array([]), np.array([]), np.array([]), np.array([]), np.array([]))
+
+    assert result.workspace(1) == 0.0
+    assert result.task(1) == 0.0
+
+
+def _row(task_id, parent_id=None, completed=True, weight=1):
+    return {"id": task_id, "parent_id": parent_id, "completed": completed, "weight": weight}
+
+
+def test_progress_of_rows_deep_chain():
+    # Deep enough for the recursive version to hit the recursion limit
+    rows = [_row(1)] + [_row(task_id, parent_id=task_id - 1) for task_id in range(2, 5002)]
+
+    progress, tasks = progress_of_rows(rows, root_id=1)
+
+    assert progress == pytest.approx(100)
+    assert len(tasks) == len(rows)
+
+
+def test_progress_of_rows_subtree_of_a_task():
+    # The root's own parent is outside the subtree
+    rows = [_row(5, parent_id=4, completed=False), _row(6, parent_id=5, weight=3), _row(7, parent_id=5, completed=False, weight=1)]
+
+    progress, tasks = progress_of_rows(rows, root_id=5)
+
+    assert progress == pytest.approx(75)
+    assert tasks == {5: 75.0, 6: 100.0, 7: 0.0}
+
+
+def test_progress_of_rows_workspace():
+    rows = [_row(2, weight=3), _row(3, completed=False, weight=1)]
+
+    progress, tasks = progress_of_rows(rows)
+
+    assert progress == pytest.approx(75)
+    assert tasks == {2: 100.0, 3: 0.0}
+    assert progress_of_rows([]) == (0.0, {})
+
+
+def test_progress_of_rows_workspace_counts_nested_tasks():
+    # 1 is half done, top level only would give (0.5 * 1 + 2) / 3
+    rows = [_row(1), _row(2, parent_id=1), _row(3, parent_id=1, completed=False), _row(4, weight=2)]
+
+    progress, tasks = progress_of_rows(rows)
+
+    assert progress == pytest.approx(70.0)
+    assert tasks == {1: 50.0, 2: 100.0, 3: 0.0, 4: 100.0}
+
+
+def test_load_progress():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(User(username="Acie"))
+        session.add_all([Workspace(id=1, name="Home", owner_name="Acie"),
+                         Workspace(id=2, name="Work", owner_name="Acie")])
+        session.add_all([Task(id=1, name="Renovation", owner_name="Acie", workspace_id=1, completed=True, weight=1),
+                         Task(id=2, name="Paint", owner_name="Acie", workspace_id=1, parent_id=1,
+                              completed=True, weight=1),
+                         Task(id=3, name="Floor", owner_name="Acie", workspace_id=1, parent_id=1,
+                              completed=False, weight=1),
+                         Task(id=4, name="Report", owner_name="Acie", workspace_id=2, completed=True, weight=1)])
+        session.commit()
+
+        result = load_progress(session)
+        only_work = load_progress(session, [2])
+
+    assert result.task(1) == pytest.approx(50)
+    assert result.workspace(1) == pytest.approx(50)
+    assert result.workspace(2) == pytest.approx(100)
+    assert only_work.workspace(2) == pytest.approx(100)
+    assert only_work.workspace(1) == 0.0
@@ -0,0 +1,39 @@
+from sqlalchemy import inspect
+
+from database.database_manager import SQLDatabaseManager
+from resources.config import Settings
+from resources.readiness import clear_ready, signal_ready
+
+
+def test_signal_and_clear_ready(tmp_path):
+    ready_file = tmp_path / "ready"
+
+    signal_ready(str(ready_file))
+    assert ready_file.read_text(encoding="utf-8").isdigit()
+    assert list(tmp_path.iterdir()) == [ready_file]
+
+    clear_ready(str(ready_file))
+    clear_ready(str(ready_file))
+    assert not ready_file.exists()
+
+
+def test_signal_ready_without_file():
+    signal_ready(None)
+    clear_ready(None)
+
+
+def test_sql_warm_up_fills_pool(tmp_path):
+    manager = SQLDatabaseManager(f"sqlite:///{tmp_path / 'progresser.db'}", echo=False)
+
+    connections = 3
+    manager.warm_up(connections)
+
+    assert manager.engine.pool.checkedin() == connections
+
+
+def test_from_settings_leaves_schema_to_migrations(tmp_path):
+    settings = Settings(database_url=f"sqlite:///{tmp_path / 'progresser.db'}")
+
+    manager = SQLDatabaseManager.from_settings(settings)
+
+    assert inspect(manager.engine).get_table_names() == []
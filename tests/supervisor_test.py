@@ -0,0 +1,156 @@
+import asyncio
+import functools
+import multiprocessing
+import queue
+from collections import Counter
+
+import pytest
+
+from resources.config import Settings
+from telegram_bot.supervisor import STOP, HashRing, Supervisor, chat_id_of, consume, routing_key
+
+CHATS = 10_000
+
+
+def message(update_id, chat_id):
+    return {"update_id": update_id, "message": {"message_id": update_id, "chat": {"id": chat_id}, "text": "/view"}}
+
+
+def echo_worker(results, index, updates, ready, settings):
+    """Worker target reporting which worker got which update."""
+    ready.set()
+    while (update := updates.get()) is not STOP:
+        results.put((index, update["update_id"], chat_id_of(update)))
+
+
+@pytest.fixture
+def fork_context():
+    if "fork" not in multiprocessing.get_all_start_methods():
+        pytest.skip("Needs the fork start method for a worker target defined in a test")
+    return multiprocessing.get_context("fork")
+
+
+def test_hash_ring_is_stable_and_balanced():
+    ring = HashRing(range(4))
+
+    assignment = {chat_id: ring.node_for(chat_id) for chat_id in range(CHATS)}
+
+    rebuilt = HashRing(range(4))
+    assert assignment == {chat_id: rebuilt.node_for(chat_id) for chat_id in range(CHATS)}
+    even_share = CHATS / 4
+    assert all(0.6 * even_share < count < 1.4 * even_share for count in Counter(assignment.values()).values())
+
+
+def test_hash_ring_moves_few_chats_when_growing():
+    before, after = HashRing(range(4)), HashRing(range(5))
+
+    moved = [chat_id for chat_id in range(CHATS) if before.node_for(chat_id) != after.node_for(chat_id)]
+
+    # Ideally 1/5 of the chats, and only to the new worker
+    assert len(moved) < 1.5 * CHATS / 5
+    assert {after.node_for(chat_id) for chat_id in moved} == {4}
+
+
+def test_hash_ring_without_nodes():
+    with pytest.raises(ValueError):
+        HashRing([])
+
+
+@pytest.mark.parametrize("update, expected", [
+    (message(1, 42), 42),
+    ({"update_id": 2, "edited_message": {"chat": {"id": -7}}}, -7),
+    ({"update_id": 3, "callback_query": {"id": "1", "message": {"chat": {"id": 5}}}}, 5),
+    ({"update_id": 4, "callback_query": {"id": "1", "inline_message_id": "x"}}, None),
+    ({"update_id": 5, "inline_query": {"id": "1", "query": ""}}, None),
+])
+def test_chat_id_of(update, expected):
+    assert chat_id_of(update) == expected
+
+
+def test_routing_key_without_chat_uses_update_id():
+    assert routing_key({"update_id": 9, "inline_query": {}}) == "update:9"
+    assert routing_key(message(9, 3)) == chat_id_of(message(9, 3))
+
+
+def test_consume_keeps_chat_order_and_runs_chats_concurrently():
+    updates = queue.Queue()
+    for update in [message(1, 1), message(2, 2), message(3, 1), message(4, 2), message(5, 1)]:
+        updates.put(update)
+    updates.put(STOP)
+    handled = []
+    running = Counter()
+    overlapped = []
+
+    async def handle(update):
+        chat_id = chat_id_of(update)
+        running[chat_id] += 1
+        overlapped.append(sum(running.values()) > 1)
+        # Earlier updates take longer, a chat's order must still hold
+        await asyncio.sleep(0.01 * (6 - update["update_id"]))
+        handled.append((chat_id, update["update_id"]))
+        running[chat_id] -= 1
+
+    count = asyncio.run(consume(updates, handle))
+    assert count == len(handled)
+    by_chat = {chat: [update_id for chat_id, update_id in handled if chat_id == chat] for chat in (1, 2)}
+    assert by_chat == {1: [1, 3, 5], 2: [2, 4]}
+    assert any(overlapped)
+
+
+def test_consume_survives_failing_handler():
+    updates = queue.Queue()
+    sent = [message(1, 1), message(2, 1)]
+    for update in [*sent, STOP]:
+        updates.put(update)
+    handled = []
+
+    async def handle(update):
+        if update["update_id"] == 1:
+            raise RuntimeError("boom")
+        handled.append(update["update_id"])
+
+    assert asyncio.run(consume(updates, handle)) == len(sent)
+    assert handled == [2]
+
+
+def test_supervisor_routes_chats_to_one_worker_and_restarts(fork_context):
+    results = fork_context.Queue()
+    supervisor = Supervisor(3, Settings(), target=functools.partial(echo_worker, results), context=fork_context)
+    supervisor.start(timeout=10)
+    try:
+        updates = [message(update_id, update_id % 7) for update_id in range(60)]
+        expected = {update["update_id"]: supervisor.dispatch(update) for update in updates[:30]}
+        old_pid = supervisor.processes[1].pid
+        supervisor.restart(1, timeout=10)
+        expected.update({update["update_id"]: supervisor.dispatch(update) for update in updates[30:]})
+        got = [results.get(timeout=10) for _ in updates]
+    finally:
+        supervisor.stop(timeout=10)
+
+    assert supervisor.processes[1].pid != old_pid
+    assert {update_id: index for index, update_id, _ in got} == expected
+    workers_per_chat = {}
+    for index, _, chat_id in got:
+        workers_per_chat.setdefault(chat_id, set()).add(index)
+    assert all(len(workers) == 1 for workers in workers_per_chat.values())
+    assert all(not process.is_alive() for process in supervisor.processes)
+
+
+def test_supervisor_revives_crashed_worker(fork_context):
+    results = fork_context.Queue()
+    supervisor = Supervisor(2, Settings(), target=functools.partial(echo_worker, results), context=fork_context)
+    supervisor.start(timeout=10)
+    try:
+        supervisor.processes[0].kill()
+        supervisor.processes[0].join()
+
+        assert supervisor.check_workers() == [0]
+        # A rolling restart waits for its own worker, not for the revived one
+        supervisor.restart(1, timeout=10)
+        assert supervisor.ready[1].is_set()
+        assert supervisor.ready[0].wait(10)
+        chat_id = next(chat_id for chat_id in range(100) if supervisor.ring.node_for(chat_id) == 0)
+        supervisor.dispatch(message(1, chat_id))
+        assert results.get(timeout=10) == (0, 1, chat_id)
+    finally:
+        supervisor.stop(timeout=10)
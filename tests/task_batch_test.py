@@ -0,0 +1,51 @@
+import pytest
+
+from core.services.form_parser import FormParseError
+from core.services.task_batch import parse_task_blocks
+
+
+def test_parse_task_blocks_nesting():
+    text = ("Workspace Name - Дом\n"
+            "Name - Ремонт\n"
+            "\n"
+            "    Name - Покрасить стены\n"
+            "    Weight - 5\n"
+            "\n"
+            "        Name - Купить краску\n"
+            "        Completed - Да\n"
+            "\n"
+            "    Name - Пол\n"
+            "\n"
+            "Name - Сад\n")
+    rows = parse_task_blocks(text)
+
+    assert [row["name"] for row in rows] == ["Ремонт", "Покрасить стены", "Купить краску", "Пол", "Сад"]
+    assert [row["parent_index"] for row in rows] == [None, 0, 1, 0, None]
+    assert {row["workspace_name"] for row in rows} == {"Дом"}
+    assert rows[1]["weight"] == pytest.approx(5)
+    assert rows[2]["completed"] is True
+
+
+def test_parse_task_blocks_top_level_parent_name():
+    text = ("Workspace Name - Home\nName - First\nParent Name - Existing\n"
+            "\n"
+            "Workspace Name - Work\nName - Second")
+    rows = parse_task_blocks(text)
+
+    assert rows[0]["parent_name"] == "Existing"
+    assert [row["workspace_name"] for row in rows] == ["Home", "Work"]
+
+
+def test_parse_task_blocks_reports_errors_of_all_blocks():
+    text = ("Name - No workspace\n"
+            "\n"
+            "Workspace Name - Home\n"
+            "Name - Bad\n"
+            "Completed - Maybe\n"
+            "\n"
+            "    Name - Child\n"
+            "    Parent Name - Other\n")
+    with pytest.raises(FormParseError) as excinfo:
+        parse_task_blocks(text)
+
+    assert [error.line_number for error in excinfo.value.errors] == [1, 5, 7]
@@ -0,0 +1,133 @@
+import random
+
+import pytest
+
+from core.services.task_tree import AncestorIndex, TaskCycleError, iter_bfs, iter_dfs, iter_levels
+
+TREE = {1: [2, 3], 2: [4, 5], 3: [6], 4: [], 5: [], 6: []}
+# Share of randomly generated nodes with a parent
+CHILD_SHARE = 0.9
+
+
+def children(node):
+    return TREE[node]
+
+
+def test_iter_dfs_order():
+    visits = list(iter_dfs([1], children))
+
+    assert [visit.node for visit in visits] == [1, 2, 4, 5, 3, 6]
+    assert [visit.depth for visit in visits] == [0, 1, 2, 2, 1, 2]
+    assert [visit.parent for visit in visits] == [None, 1, 2, 2, 1, 3]
+
+
+def test_iter_bfs_order():
+    assert [visit.node for visit in iter_bfs([1], children)] == [1, 2, 3, 4, 5, 6]
+
+
+def test_iter_dfs_max_depth():
+    assert [visit.node for visit in iter_dfs([1], children, max_depth=1)] == [1, 2, 3]
+
+
+def test_iter_levels():
+    def children_of(keys):
+        return [{"id": child} for key in keys for child in TREE[key]]
+
+    rows = list(iter_levels([{"id": 1}], children_of, key=lambda row: row["id"]))
+
+    assert [row["id"] for row in rows] == [1, 2, 3, 4, 5, 6]
+
+
+@pytest.mark.parametrize("walk", [iter_dfs, iter_bfs])
+def test_walk_cycle_raises(walk):
+    cyclic = {1: [2], 2: [3], 3: [1]}
+
+    with pytest.raises(TaskCycleError):
+        list(walk([1], cyclic.__getitem__))
+
+
+def test_walks_100k_deep_chain():
+    depth = 100_000
+    chain = {node: [node + 1] for node in range(depth - 1)}
+    chain[depth - 1] = []
+
+    assert sum(1 for _ in iter_dfs([0], chain.__getitem__)) == depth
+    assert sum(1 for _ in iter_bfs([0], chain.__getitem__)) == depth
+    assert sum(1 for _ in iter_levels([0], lambda keys: [child for key in keys for child in chain[key]])) == depth
+
+
+def _loader(parents, calls=None):
+    def load(task_id):
+        if calls is not None:
+            calls.append(task_id)
+        node, seen = task_id, set()
+        # Returns the whole ancestor path, like the recursive query of the repository
+        while node in parents and node not in seen:
+            seen.add(node)
+            yield node, parents[node]
+            node = parents[node]
+    return load
+
+
+def test_ancestor_index_100k_deep_chain():
+    depth = 100_000
+    parents = {node: (node - 1 if node else None) for node in range(depth)}
+    calls = []
+    index = AncestorIndex(_loader(parents, calls))
+
+    assert index.depth(depth - 1) == depth - 1
+    assert index.is_ancestor(0, depth - 1)
+    assert not index.is_ancestor(depth - 1, 0)
+    with pytest.raises(TaskCycleError):
+        index.check_parent(0, depth - 1)
+    index.check_parent(depth - 1, 0)
+    assert index.path(3) == [0, 1, 2, 3]
+    # The whole chain was loaded at once
+    assert calls == [depth - 1]
+
+
+def _is_ancestor_brute_force(parents, ancestor_id, task_id):
+    node = task_id
+    for _ in range(len(parents) + 1):
+        if node == ancestor_id:
+            return True
+        if node is None:
+            return False
+        node = parents.get(node)
+    raise AssertionError("cycle")
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_ancestor_index_randomized_moves(seed):
+    rng = random.Random(seed)
+    size = 300
+    parents = {node: (rng.randrange(node) if node and rng.random() < CHILD_SHARE else None) for node in range(size)}
+    index = AncestorIndex(_loader(parents))
+
+    for _ in range(2000):
+        task_id, parent_id = rng.randrange(size), rng.randrange(size)
+        would_cycle = _is_ancestor_brute_force(parents, task_id, parent_id)
+        if would_cycle:
+            with pytest.raises(TaskCycleError):
+                index.check_parent(task_id, parent_id)
+        else:
+            index.check_parent(task_id, parent_id)
+            index.set_parent(task_id, parent_id)
+            parents[task_id] = parent_id
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_ancestor_index_detects_stored_cycles(seed):
+    rng = random.Random(seed)
+    size = 200
+    parents = {node: (node - 1 if node else None) for node in range(size)}
+    # Close a random part of the chain into a cycle
+    end = rng.randrange(1, size)
+    start = rng.randrange(end + 1)
+    parents[start] = end
+    index = AncestorIndex(_loader(parents))
+
+    with pytest.raises(TaskCycleError):
+        index.depth(rng.randrange(start, size))
+    with pytest.raises(TaskCycleError):
+        index.check_parent(None, end)
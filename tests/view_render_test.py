@@ -0,0 +1,38 @@
+import pytest
+
+from core.services.view_render import create_progress_bar, create_telegram_progress_bar, render_view
+
+
+def test_create_progress_bar():
+    assert create_progress_bar(0) == "░" * 10
+    assert create_progress_bar(55.5) == "█" * 5 + "░" * 5
+    assert create_progress_bar(100, total_length=4, filled_char="#") == "####"
+
+
+@pytest.mark.parametrize("progress, error", [(-1, ValueError), (100.5, ValueError), ("50", TypeError)])
+def test_create_progress_bar_invalid(progress, error):
+    with pytest.raises(error):
+        create_progress_bar(progress)
+
+
+def test_create_telegram_progress_bar():
+    assert create_telegram_progress_bar(75) == "[███████░░░] 75.0%"
+
+
+def test_render_view():
+    description = "word " * 30
+
+    msg = render_view("Home", 50.0, description, [(0, "Renovation", 100.0), (1, "Paint walls", 0.0)])
+
+    lines = msg.split("\n")
+    assert lines[0] == "[█████░░░░░] 50.0%"
+    assert lines[1] == "Home"
+    assert lines[2] == ("word " * 20).strip()
+    assert lines[3] == ("word " * 10).strip()
+    assert lines[4] == f"    {'Renovation':<50} [██████████] 100.0%"
+    assert lines[5] == f"        {'Paint walls':<50} [░░░░░░░░░░] 0.0%"
+    assert lines[6:] == [""]
+
+
+def test_render_view_without_description_and_children():
+    assert render_view("Home", 0.0, None, []) == "[░░░░░░░░░░] 0.0%\nHome\n"
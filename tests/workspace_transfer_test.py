@@ -0,0 +1,45 @@
+import io
+
+import pytest
+
+from core.services import workspace_transfer
+from core.services.workspace_transfer import (
+    iter_csv_export,
+    iter_csv_import,
+    iter_json_export,
+    iter_json_import,
+)
+
+WORKSPACE = {"id": 7, "name": "Дом", "description": "Всё про дом"}
+TASKS = [
+    {"id": 10, "parent_id": None, "name": "Ремонт", "description": None, "completed": False, "weight": 5.0},
+    {"id": 12, "parent_id": 10, "name": "Стены, потолок", "description": 'say "hi"', "completed": True, "weight": 1.0},
+    {"id": 11, "parent_id": 12, "name": "Краска", "description": "a\nb", "completed": False, "weight": 12.5},
+]
+
+
+@pytest.mark.parametrize("export, read", [(iter_json_export, iter_json_import), (iter_csv_export, iter_csv_import)])
+def test_export_import_round_trip(export, read, monkeypatch):
+    # Tiny chunks make the readers cross chunk boundaries inside values
+    monkeypatch.setattr(workspace_transfer, "CHUNK_SIZE", 3)
+    document = "".join(export(WORKSPACE, iter(TASKS)))
+
+    records = list(read(io.StringIO(document, newline="")))
+
+    assert records[0] == ("workspace", {"name": "Дом", "description": "Всё про дом"})
+    assert records[1:] == [("task", task) for task in TASKS]
+
+
+def test_json_export_without_tasks():
+    document = "".join(iter_json_export(WORKSPACE, []))
+
+    assert list(iter_json_import(io.StringIO(document))) == [
+        ("workspace", {"name": "Дом", "description": "Всё про дом"})
+    ]
+
+
+def test_json_import_truncated_document():
+    document = "".join(iter_json_export(WORKSPACE, TASKS))[:-10]
+
+    with pytest.raises(ValueError):
+        list(iter_json_import(io.StringIO(document)))